@@ -5,23 +5,39 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables.base import Runnable
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferMemory
 from langchain_core.chat_history import BaseChatMessageHistory 
-from langchain_community.chat_message_histories import ChatMessageHistory
+import atexit
 import os
 from dotenv import load_dotenv
+from data.diagnosis_cache import request_hash
+from data.single_flight import SingleFlight
+from data.resilience import Resilience
+from data.llm_backend import create_chat_model
+from data.chat_sessions import ChatSessionStore, SQLiteChatSessionStore
 
 # Load environment
 load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("❌ GOOGLE_API_KEY not found in .env")
-
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-pro",
-    google_api_key=GOOGLE_API_KEY
+
+# Whole chat LLM call, retries included; past it the user gets CHAT_FALLBACK_MESSAGE
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "20"))
+CHAT_FALLBACK_MESSAGE = (
+    "I'm having trouble reaching the medical assistant right now. "
+    "Please try again in a moment. If your symptoms are severe or getting worse, contact a doctor or emergency services."
+)
+
+CHAT_MODEL = "models/gemini-2.5-pro"
+
+# Initialize LLM: Gemini, or the offline fake with LLM_BACKEND=fake
+# (retries and timeouts are handled by chat_guard)
+llm = create_chat_model(CHAT_MODEL, timeout=CHAT_DEADLINE, max_retries=0)
+
+# Deadline, jittered retries and a circuit breaker around the chat LLM
+chat_guard = Resilience(
+    "chat",
+    deadline=CHAT_DEADLINE,
+    retries=int(os.getenv("LLM_RETRIES", "1")),
+    failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
 )
 
 # Prompt
@@ -33,44 +49,120 @@ prompt = ChatPromptTemplate.from_messages([
 chain: Runnable = prompt | llm
 
 # 🧠 Store chat history objects per session
-# Changed to store the BaseChatMessageHistory directly, not ConversationBufferMemory
-session_store: Dict[str, BaseChatMessageHistory] = {}
+# memory: in this process only, so every turn of a chat must reach the same
+# worker and a restart forgets it. sqlite: one WAL-mode file at
+# CHAT_SESSION_DB shared by all workers on the host, written behind the turn
+# in batches every CHAT_SESSION_FLUSH_INTERVAL seconds. Until its batch is
+# written a turn is only known to the worker that served it: a next turn
+# routed to another worker within that interval is answered without it. Set
+# CHAT_SESSION_FLUSH_INTERVAL=0 to commit every turn before replying instead.
+CHAT_SESSION_BACKENDS = ("memory", "sqlite")
+CHAT_SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory")
+if CHAT_SESSION_BACKEND not in CHAT_SESSION_BACKENDS:
+    raise ValueError(f"❌ CHAT_SESSION_BACKEND must be one of {CHAT_SESSION_BACKENDS}, got '{CHAT_SESSION_BACKEND}'.")
+CHAT_SESSION_DB = os.getenv(
+    "CHAT_SESSION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "chat_sessions.db")
+)
+
+# At most CHAT_SESSION_LIMIT sessions (least recently used dropped first), each
+# forgotten after CHAT_SESSION_TTL idle seconds and keeping its last
+# CHAT_SESSION_MAX_MESSAGES messages
+session_limits = dict(
+    max_sessions=int(os.getenv("CHAT_SESSION_LIMIT", "1024")),
+    ttl=float(os.getenv("CHAT_SESSION_TTL", "3600")),
+    max_messages=int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "40")),
+    sweep_interval=float(os.getenv("CHAT_SESSION_SWEEP_INTERVAL", "60"))
+)
+if CHAT_SESSION_BACKEND == "sqlite":
+    session_store = SQLiteChatSessionStore(
+        CHAT_SESSION_DB,
+        flush_interval=float(os.getenv("CHAT_SESSION_FLUSH_INTERVAL", "0.05")),
+        batch_size=int(os.getenv("CHAT_SESSION_BATCH_SIZE", "256")),
+        **session_limits
+    )
+    # Don't lose the last turns on shutdown
+    atexit.register(session_store.flush)
+else:
+    session_store = ChatSessionStore(**session_limits)
 
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
     """
     Returns the chat history object for a given session ID.
-    If no history exists, it creates a new InMemoryChatMessageHistory.
+    If no history exists (or it has expired), a new empty one is created.
     """
-    if session_id not in session_store:
-        session_store[session_id] = ChatMessageHistory() # Use ChatMessageHistory directly
-    return session_store[session_id]
+    return session_store.get(session_id)
 
 # Wrap chain with memory
-chat_chain = RunnableWithMessageHistory(
-    chain,
-    # This lambda now returns BaseChatMessageHistory, which is what RunnableWithMessageHistory expects
-    lambda session_id: get_session_history(session_id),
-    input_messages_key="input",
-    history_messages_key="chat_history"
-)
+def build_chat_chain(chain: Runnable) -> RunnableWithMessageHistory:
+    return RunnableWithMessageHistory(
+        chain,
+        # This lambda now returns BaseChatMessageHistory, which is what RunnableWithMessageHistory expects
+        lambda session_id: get_session_history(session_id),
+        input_messages_key="input",
+        history_messages_key="chat_history"
+    )
 
-def query_gemini_from_messages(messages: List[Dict[str, str]], session_id: str) -> str:
+chat_chain = build_chat_chain(chain)
+
+def reopen_after_fork():
+    """
+    Re-create the LLM client in a worker forked after this module was
+    imported (see gunicorn_conf.py); its connections belong to the master.
+    """
+    global llm, chain, chat_chain
+    llm = create_chat_model(CHAT_MODEL, timeout=CHAT_DEADLINE, max_retries=0)
+    chain = prompt | llm
+    chat_chain = build_chat_chain(chain)
+
+def _last_user_message(messages: List[Dict[str, str]]) -> str:
     # Ensure the messages list always ends with a user message for the current turn.
     # The `RunnableWithMessageHistory` will handle storing these in the session history.
     last_user_message_content = next((msg["content"] for msg in reversed(messages) if msg["role"] == "user"), None)
     if not last_user_message_content:
         raise ValueError("No user message found in payload for current turn.")
+    return last_user_message_content
 
-    result = chat_chain.invoke(
-        {"input": last_user_message_content},
-        config={"configurable": {"session_id": session_id}}
-    )
+def query_gemini_from_messages(messages: List[Dict[str, str]], session_id: str) -> str:
+    user_message = _last_user_message(messages)
+    try:
+        result = chat_guard.call(
+            chat_chain.invoke,
+            {"input": user_message},
+            config={"configurable": {"session_id": session_id}}
+        )
+    except Exception as e:
+        print("⚠️ Chat LLM unavailable, sending fallback reply:", e)
+        return CHAT_FALLBACK_MESSAGE
+
+    return result.content
+
+# The same message re-sent for a session while the first copy is still being
+# answered shares that answer (and is stored in the history only once)
+chat_flights = SingleFlight("chat")
+
+async def aquery_gemini_from_messages(messages: List[Dict[str, str]], session_id: str) -> str:
+    """
+    Async version of query_gemini_from_messages for the FastAPI endpoints
+    """
+    user_message = _last_user_message(messages)
+    key = request_hash({"session_id": session_id, "input": " ".join(user_message.split())})
+    return await chat_flights.run(key, _aquery_chat, user_message, session_id)
+
+async def _aquery_chat(user_message: str, session_id: str) -> str:
+    try:
+        result = await chat_guard.acall(
+            chat_chain.ainvoke,
+            {"input": user_message},
+            config={"configurable": {"session_id": session_id}}
+        )
+    except Exception as e:
+        print("⚠️ Chat LLM unavailable, sending fallback reply:", e)
+        return CHAT_FALLBACK_MESSAGE
 
     return result.content
 
 def reset_session_memory(session_id: str):
     """
-    Resets the chat history for a given session.
+    Resets the chat history for a given session by dropping it from the store.
     """
-    if session_id in session_store:
-        session_store[session_id].clear() # Call clear on the BaseChatMessageHistory object
\ No newline at end of file
+    session_store.delete(session_id)
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from embedding_backend import EMBEDDING_BACKENDS, create_embeddings
+from index_sync import DATA_PATH, EMBED_MODEL, load_rows
+
+# Query-embedding latency and retrieval recall of each EMBEDDING_BACKEND on
+# CPU. Every backend embeds the knowledge base and the inputs of
+# testing_v2.csv; recall@k is the share of the PyTorch backend's top-k
+# documents a backend retrieves for the same query (exact search, so only
+# the embeddings differ). Thread settings come from the environment, e.g.
+#
+#   EMBEDDING_INTRA_OP_THREADS=1 python benchmark_embeddings.py torch onnx-int8
+
+warnings.simplefilter("ignore")
+
+K = 4
+REPEATS = 3
+BACKENDS = sys.argv[1:] or list(EMBEDDING_BACKENDS)
+
+queries = [text for text in pd.read_csv("testing_v2.csv")["Input"] if isinstance(text, str)]
+documents = [text for _, text, _ in load_rows(DATA_PATH)]
+
+
+def top_k(doc_vectors, query_vectors):
+    doc_vectors = doc_vectors / np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    query_vectors = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return [set(np.argsort(-scores)[:K].tolist()) for scores in query_vectors @ doc_vectors.T]
+
+
+results = {}
+for backend in BACKENDS:
+    os.environ["EMBEDDING_BACKEND"] = backend
+    start = time.perf_counter()
+    embeddings = create_embeddings(EMBED_MODEL)
+    embeddings.embed_query("warm-up")
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc_vectors = np.asarray(embeddings.embed_documents(documents))
+    index_s = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(REPEATS):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    query_vectors = np.asarray(embeddings.embed_documents(queries))
+    results[backend] = {
+        "load_s": load_s,
+        "index_s": index_s,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "top_k": top_k(doc_vectors, query_vectors),
+    }
+
+reference = results.get("torch") or next(iter(results.values()))
+print(f"\n==== ⚙️ Embedding backends: {len(queries)} queries x {REPEATS}, {len(documents)} documents ====")
+for backend, r in results.items():
+    recall = np.mean([len(a & b) / K for a, b in zip(r["top_k"], reference["top_k"])])
+    print(
+        f"{backend:<10} | load {r['load_s']:6.2f} s | index {r['index_s']:6.2f} s"
+        f" | query mean {r['mean_ms']:7.2f} ms | p95 {r['p95_ms']:7.2f} ms | recall@{K} vs torch {recall:.3f}"
+    )
@@ -0,0 +1,79 @@
+import time
+import pandas as pd
+from rapidfuzz import process, fuzz
+from diagnosis_assistant import synonym_map, symptom_matcher, extract_symptoms, extraction_cache, EXTRACTION_MODES
+
+# Compares the compiled SymptomMatcher (exact automaton + typo index) against
+# the original brute-force lexicon scan (one rapidfuzz call per synonym_map
+# entry) on testing_v2.csv, then reports latency and recall of
+# extract_symptoms in each extraction mode.
+
+REPEATS = 20
+SCORE_CUTOFF = 93
+
+df = pd.read_csv("testing_v2.csv")
+inputs = [text.lower() for text in df["Input"]]
+
+def legacy_lexicon_scan(text_lower, score_cutoff=SCORE_CUTOFF):
+    extracted = set()
+    all_possible_symptoms = list(set(list(synonym_map.keys()) + list(synonym_map.values())))
+    for symptom in all_possible_symptoms:
+        if process.extractOne(symptom, [text_lower], scorer=fuzz.partial_ratio, score_cutoff=score_cutoff):
+            extracted.add(synonym_map.get(symptom, symptom))
+    return extracted
+
+def normalize(sym_str):
+    if pd.isna(sym_str):
+        return []
+    return sorted([s.strip().lower() for s in sym_str.split(",") if s.strip()])
+
+def time_per_call(fn):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for text in inputs:
+            fn(text)
+    return (time.perf_counter() - start) / (REPEATS * len(inputs))
+
+# === Differences ===
+differences = []
+for text in inputs:
+    expected = legacy_lexicon_scan(text)
+    actual = symptom_matcher.match(text)
+    if expected != actual:
+        differences.append((text, expected - actual, actual - expected))
+
+print(f"\n📄 Compared {len(inputs)} test cases")
+print(f"Cases that differ from the brute-force scan: {len(differences)}")
+for text, lost, gained in differences:
+    print(f"- {text[:40]}... | lost {sorted(lost)} | gained {sorted(gained)}")
+
+# === Latency ===
+legacy_time = time_per_call(legacy_lexicon_scan)
+compiled_time = time_per_call(symptom_matcher.match)
+
+print("\n==== ⏱ Lexicon matching latency per call ====")
+print(f"Brute-force scan: {legacy_time * 1000:.3f} ms")
+print(f"Compiled matcher: {compiled_time * 1000:.3f} ms")
+print(f"Speed-up:         {legacy_time / compiled_time:.1f}x")
+
+# === Extraction modes ===
+print("\n==== 🧠 extract_symptoms per extraction mode ====")
+for mode in EXTRACTION_MODES:
+    extraction_cache.clear()
+    latencies = []
+    tp_total, fp_total, fn_total = 0, 0, 0
+    for _, row in df.iterrows():
+        expected = set(normalize(row["Expected_Symptoms"]))
+        start = time.perf_counter()
+        extracted = set(extract_symptoms(row["Input"], mode=mode))
+        latencies.append(time.perf_counter() - start)
+        tp_total += len(expected & extracted)
+        fp_total += len(extracted - expected)
+        fn_total += len(expected - extracted)
+
+    latencies.sort()
+    mean_ms = sum(latencies) / len(latencies) * 1000
+    p95_ms = latencies[int(0.95 * (len(latencies) - 1))] * 1000
+    recall = tp_total / (tp_total + fn_total) if tp_total + fn_total else 0.0
+    precision = tp_total / (tp_total + fp_total) if tp_total + fp_total else 0.0
+    print(f"{mode:<16} | mean {mean_ms:7.2f} ms | p95 {p95_ms:7.2f} ms | Recall: {recall:.2f} | Precision: {precision:.2f}")
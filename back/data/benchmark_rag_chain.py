@@ -0,0 +1,98 @@
+import argparse
+import time
+import warnings
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.vectorstores import InMemoryVectorStore
+from diagnosis_chain import build_diagnosis_chain
+
+# Sends the same stream of /diagnose-style requests through the stateless
+# diagnosis chain and through the original ConversationalRetrievalChain with a
+# process-global ConversationBufferMemory. A fake chat model and a fake
+# embedding replace Gemini and MiniLM, so what is measured is the chain itself:
+# its latency and prompt size per window of requests. The fake model answers
+# in constant time, so the prompt size column is what a real model's latency
+# and token cost follow.
+
+FAKE_ANSWER = (
+    "1. Condition Name: influenza\nReason: fever, cough and body aches.\n"
+    "2. Condition Name: common cold\nReason: runny nose and sore throat."
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--requests", type=int, default=10000)
+parser.add_argument("--legacy-requests", type=int, default=2000,
+                    help="the legacy prompt grows with every request, so it gets fewer of them")
+parser.add_argument("--window", type=int, default=1000)
+args = parser.parse_args()
+
+
+class PromptSize(BaseCallbackHandler):
+    """Characters sent to the chat model, summed over every call of a request"""
+
+    def __init__(self):
+        self.chars = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.chars += sum(len(str(m.content)) for batch in messages for m in batch)
+
+
+df = pd.read_csv("medical_knowledge_clean.csv")
+docs = [
+    Document(page_content="\n".join(f"{col}: {row[col]}" for col in df.columns), metadata={"row": i})
+    for i, row in df.iterrows()
+]
+questions = [f"Symptoms: {s}. Identify the two most likely conditions." for s in df["Symptoms"].dropna()]
+warnings.simplefilter(action="ignore")
+
+retriever = InMemoryVectorStore.from_documents(docs, DeterministicFakeEmbedding(size=384)).as_retriever()
+
+
+def legacy_chain():
+    try:
+        from langchain.chains import ConversationalRetrievalChain
+        from langchain.memory import ConversationBufferMemory
+    except ImportError:
+        # langchain >= 1.0 moved the legacy chains to langchain-classic
+        from langchain_classic.chains import ConversationalRetrievalChain
+        from langchain_classic.memory import ConversationBufferMemory
+    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    chain = ConversationalRetrievalChain.from_llm(
+        llm=FakeListChatModel(responses=[FAKE_ANSWER]), retriever=retriever, memory=memory
+    )
+    return lambda q, config: chain.invoke({"question": q}, config=config)
+
+
+def stateless_chain():
+    chain = build_diagnosis_chain(FakeListChatModel(responses=[FAKE_ANSWER]), retriever)
+    return lambda q, config: chain.invoke({"question": q, "retrieval_query": q, "history": []}, config=config)
+
+
+def run(name, invoke, n_requests):
+    print(f"\n==== {name}: {n_requests} sequential requests ====")
+    print(f"{'requests':>13} | {'mean ms':>8} | {'p95 ms':>8} | {'prompt chars':>12}")
+    latencies, prompt_chars = [], []
+    for i in range(n_requests):
+        size = PromptSize()
+        start = time.perf_counter()
+        invoke(questions[i % len(questions)], {"callbacks": [size]})
+        latencies.append(time.perf_counter() - start)
+        prompt_chars.append(size.chars)
+        if (i + 1) % args.window == 0 or i + 1 == n_requests:
+            window = sorted(latencies[-args.window:])
+            chars = prompt_chars[-args.window:]
+            print(f"{i + 2 - len(window):>6}-{i + 1:<6} | {sum(window) / len(window) * 1000:8.2f} | "
+                  f"{window[int(0.95 * (len(window) - 1))] * 1000:8.2f} | {sum(chars) // len(chars):12d}")
+    return latencies
+
+
+stateless = run("Stateless diagnosis chain", stateless_chain(), args.requests)
+legacy = run("Legacy chain with global memory", legacy_chain(), args.legacy_requests)
+
+first, last = stateless[:args.window], stateless[-args.window:]
+print(f"\nStateless chain, last window vs first window: {sum(last) / sum(first):.2f}x")
+first, last = legacy[:args.window], legacy[-args.window:]
+print(f"Legacy chain, last window vs first window:    {sum(last) / sum(first):.2f}x")
@@ -0,0 +1,58 @@
+import time
+import pandas as pd
+from diagnosis_assistant import (
+    vectordb, retriever, embedding, extract_symptoms, DIAGNOSIS_PROMPT_TEMPLATE, RETRIEVAL_K
+)
+from diagnosis_chain import format_docs
+from retrieval import TopKCache, symptom_query
+
+# Compares the original retrieval (default top-k over whole CSV rows, queried
+# with the full diagnosis prompt) against the symptom-aware retriever on the
+# inputs of testing_v2.csv: retrieval time and size of the context that ends
+# up in the prompt. The last row repeats the symptom-aware run with the
+# top-k ID cache; the embedding cache is on for every row.
+
+REPEATS = 5
+
+df = pd.read_csv("testing_v2.csv")
+cases = []
+for text in df["Input"]:
+    symptoms = extract_symptoms(text)
+    symptom_str = ", ".join(symptoms) if symptoms else "Not specified"
+    context = "No additional context provided."
+    cases.append((
+        symptoms,
+        DIAGNOSIS_PROMPT_TEMPLATE.format(symptom_str=symptom_str, context=context),
+        symptom_query(symptoms) or context,
+    ))
+
+legacy_retriever = vectordb.as_retriever()
+
+def measure(retrieve):
+    latencies, chars = [], []
+    for _ in range(REPEATS):
+        for case in cases:
+            start = time.perf_counter()
+            docs = retrieve(case)
+            latencies.append(time.perf_counter() - start)
+            chars.append(len(format_docs(docs)))
+    latencies.sort()
+    return (
+        sum(latencies) / len(latencies) * 1000,
+        latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        sum(chars) / len(chars),
+    )
+
+results = {"Default top-k, full prompt": measure(lambda case: legacy_retriever.invoke(case[1]))}
+retriever.cache = None
+results[f"Symptom-aware, k={RETRIEVAL_K}"] = measure(lambda case: retriever.invoke(case[2], symptoms=case[0]))
+retriever.cache = TopKCache(maxsize=len(cases))
+results["Symptom-aware, ID cache"] = measure(lambda case: retriever.invoke(case[2], symptoms=case[0]))
+
+print(f"\n==== 🔎 Retrieval over {len(cases)} test cases ====")
+for name, (mean_ms, p95_ms, chars) in results.items():
+    # ~4 characters per token for English text
+    print(f"{name:<28} | mean {mean_ms:7.2f} ms | p95 {p95_ms:7.2f} ms | context {chars:7.0f} chars (~{chars / 4:.0f} tokens)")
+
+print(f"\nEmbedding cache: {embedding.stats()}")
+print(f"Top-k ID cache:  {retriever.cache.stats()}")
@@ -0,0 +1,109 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+import numpy as np
+from langchain_chroma import Chroma
+from numpy_store import NumpyVectorStore
+
+# Chroma vs. the exact NumPy store on synthetic, clustered 384-d embeddings
+# (the size of all-MiniLM-L6-v2), so no model is needed. For each corpus size
+# both stores get the same vectors; queries are searched unfiltered and with
+# the retriever's {"row": {"$in": [...]}} filter. Recall@k is measured
+# against brute-force ground truth.
+#
+#   python benchmark_vector_store.py [sizes...]     (default 100 10000 100000)
+
+warnings.simplefilter("ignore")
+
+DIM = 384
+K = 4
+QUERIES = 200
+FILTER_ROWS = 100
+SIZES = [int(n) for n in sys.argv[1:]] or [100, 10_000, 100_000]
+
+rng = np.random.default_rng(0)
+
+
+def normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def corpus(n):
+    centers = rng.normal(size=(max(1, n // 50), DIM))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(size=(n, DIM))
+    return normalized(vectors).astype(np.float32)
+
+
+def ground_truth(vectors, query, rows=None):
+    scores = vectors @ query
+    if rows is not None:
+        masked = np.full_like(scores, -np.inf)
+        masked[rows] = scores[rows]
+        scores = masked
+    return set(np.argsort(-scores)[:K].tolist())
+
+
+def measure(search, queries, filters, truths):
+    latencies, hits = [], 0
+    for query, where, truth in zip(queries, filters, truths):
+        start = time.perf_counter()
+        docs = search(query.tolist(), where)
+        latencies.append(time.perf_counter() - start)
+        hits += len({doc.metadata["row"] for doc in docs} & truth)
+    latencies.sort()
+    return (
+        sum(latencies) / len(latencies) * 1000,
+        latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        hits / (len(truths) * K),
+    )
+
+
+def build_chroma(path, vectors, ids, texts, metadatas):
+    store = Chroma(collection_name="bench", persist_directory=path)
+    batch = store._client.get_max_batch_size()
+    for i in range(0, len(ids), batch):
+        store._collection.add(
+            ids=ids[i:i + batch], embeddings=vectors[i:i + batch].tolist(),
+            documents=texts[i:i + batch], metadatas=metadatas[i:i + batch]
+        )
+    return store
+
+
+def build_numpy(path, vectors, ids, texts, metadatas):
+    store = NumpyVectorStore(path, embedding=None)
+    store.upsert(ids, vectors, texts, metadatas)
+    return store
+
+
+print(f"==== 📐 Vector store benchmark: k={K}, {QUERIES} queries, filter over {FILTER_ROWS} rows ====")
+for n in SIZES:
+    vectors = corpus(n)
+    ids = [f"doc-{i}" for i in range(n)]
+    texts = [f"Disease: synthetic {i}" for i in range(n)]
+    metadatas = [{"row": i} for i in range(n)]
+    queries = normalized(vectors[rng.integers(n, size=QUERIES)] + 0.3 * rng.normal(size=(QUERIES, DIM))).astype(np.float32)
+    row_sets = [np.sort(rng.choice(n, size=min(n, FILTER_ROWS), replace=False)) for _ in range(QUERIES)]
+
+    for name, build in (("chroma", build_chroma), ("numpy", build_numpy)):
+        path = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            store = build(path, vectors, ids, texts, metadatas)
+            build_s = time.perf_counter() - start
+            search = lambda query, where: store.similarity_search_by_vector(query, k=K, filter=where)
+            plain = measure(search, queries, [None] * QUERIES, [ground_truth(vectors, q) for q in queries])
+            filtered = measure(
+                search, queries, [{"row": {"$in": rows.tolist()}} for rows in row_sets],
+                [ground_truth(vectors, q, rows) for q, rows in zip(queries, row_sets)]
+            )
+            print(
+                f"n={n:<7} {name:<6} | build {build_s:7.2f} s"
+                f" | search {plain[0]:7.2f} ms (p95 {plain[1]:7.2f}) recall {plain[2]:.3f}"
+                f" | filtered {filtered[0]:7.2f} ms (p95 {filtered[1]:7.2f}) recall {filtered[2]:.3f}"
+            )
+            del store
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
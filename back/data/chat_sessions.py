@@ -0,0 +1,544 @@
+# back/data/chat_sessions.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+
+
+def _message_bytes(message: BaseMessage) -> int:
+    content = message.content
+    if isinstance(content, str):
+        return len(content.encode("utf-8"))
+    return len(str(content).encode("utf-8"))
+
+
+def _trim(messages: tuple, max_messages: int) -> Tuple[tuple, int]:
+    """
+    The last `max_messages` messages, starting at a user message, and how
+    many were dropped
+    """
+    if max_messages <= 0 or len(messages) <= max_messages:
+        return messages, 0
+    start = len(messages) - max_messages
+    while start < len(messages) and not isinstance(messages[start], HumanMessage):
+        start += 1
+    return messages[start:], start
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    In-memory chat history that keeps only the last `max_messages` messages.
+    Older turns are dropped from the front, together with any reply left
+    without its question, so the history always starts with a user message.
+    """
+
+    def __init__(self, max_messages: int = 40, on_trim: Optional[Callable[[int], None]] = None):
+        self.max_messages = max_messages
+        self._on_trim = on_trim
+        # Replaced, never mutated, so readers need no lock
+        self._messages: tuple = ()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            kept, dropped = _trim(self._messages + tuple(messages), self.max_messages)
+            if dropped and self._on_trim:
+                self._on_trim(dropped)
+            self._messages = kept
+            self.size_bytes = sum(_message_bytes(m) for m in kept)
+            self.last_used = time.monotonic()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._messages = ()
+            self.size_bytes = 0
+
+
+class ChatSessionStore:
+    """
+    Chat histories by session id, bounded three ways: at most `max_sessions`
+    sessions (least recently used evicted first), sessions idle for `ttl`
+    seconds expire, and each history keeps `max_messages` messages.
+
+    Expired sessions are also removed by a daemon thread every
+    `sweep_interval` seconds, so memory is returned even when no new session
+    arrives. The thread is started on first use in each process, which keeps
+    the store usable in workers forked after it was created.
+    """
+
+    def __init__(self, max_sessions: int = 1024, ttl: float = 3600, max_messages: int = 40,
+                 sweep_interval: float = 60):
+        self.max_sessions = max_sessions
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_messages = max_messages
+        self.sweep_interval = sweep_interval
+        self._sessions: "OrderedDict[str, BoundedChatMessageHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper_pid = None
+        self.created = 0
+        self.deleted = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.sweeps = 0
+        self.trimmed = 0
+
+    def _count_trimmed(self, count: int):
+        self.trimmed += count
+
+    def _expired(self, history: BoundedChatMessageHistory, now: float) -> bool:
+        return self.ttl is not None and now - history.last_used > self.ttl
+
+    def get(self, session_id: str) -> BoundedChatMessageHistory:
+        """
+        History of `session_id`, created empty if it is new or has expired
+        """
+        self._ensure_sweeper()
+        now = time.monotonic()
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None and self._expired(history, now):
+                del self._sessions[session_id]
+                self.expirations += 1
+                history = None
+            if history is None:
+                history = BoundedChatMessageHistory(self.max_messages, on_trim=self._count_trimmed)
+                self._sessions[session_id] = history
+                self.created += 1
+                while len(self._sessions) > max(1, self.max_sessions):
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            history.last_used = now
+            return history
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            history = self._sessions.pop(session_id, None)
+            if history is not None:
+                self.deleted += 1
+        return history is not None
+
+    def sweep(self) -> int:
+        """
+        Remove the sessions idle for longer than the TTL
+        """
+        if self.ttl is None:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, history in self._sessions.items() if self._expired(history, now)]
+            for session_id in expired:
+                del self._sessions[session_id]
+            self.expirations += len(expired)
+            self.sweeps += 1
+        return len(expired)
+
+    def _ensure_sweeper(self):
+        if self._sweeper_pid == os.getpid() or self.ttl is None or self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+        threading.Thread(target=self._sweep_forever, name="chat-session-sweeper", daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Chat session sweep failed: {e}")
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str):
+        return session_id in self._sessions
+
+    def stats(self) -> dict:
+        with self._lock:
+            histories = list(self._sessions.values())
+            counters = {
+                "created": self.created,
+                "deleted": self.deleted,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "sweeps": self.sweeps,
+                "trimmed_messages": self.trimmed,
+            }
+        return {
+            "backend": "memory",
+            "sessions": len(histories),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "max_messages": self.max_messages,
+            "messages": sum(len(h._messages) for h in histories),
+            "message_bytes": sum(h.size_bytes for h in histories),
+            **counters,
+        }
+
+
+# -------------------- SQLite Backend --------------------
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, last_used REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS chat_messages ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS chat_messages_session ON chat_messages (session_id, id)",
+)
+
+
+def _weak_call(method):
+    # Fork hooks can't be unregistered; a weak reference lets the store go
+    ref = weakref.WeakMethod(method)
+
+    def call():
+        bound = ref()
+        if bound is not None:
+            bound()
+    return call
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """
+    One session of a SQLiteChatSessionStore
+    """
+
+    def __init__(self, store: "SQLiteChatSessionStore", session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.store.messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.add(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.delete(self.session_id)
+
+
+class SQLiteChatSessionStore:
+    """
+    Chat histories in a SQLite file in WAL mode, shared by every worker on
+    the host and kept across restarts. Same interface as ChatSessionStore.
+
+    Writes are write-behind: `add` queues the messages and returns, and a
+    background thread commits everything queued in one transaction every
+    `flush_interval` seconds, sooner once `batch_size` writes are waiting.
+    Until then this process serves them from its queue, so a turn never
+    waits for the disk. Other workers only see them after the flush: a turn
+    that reaches another worker within `flush_interval` of the previous one
+    is answered without it. A `flush_interval` of 0 commits every write
+    before `add` returns instead. `delete` is always flushed at once, and
+    queued writes are committed before the process forks.
+
+    Sessions idle for `ttl` seconds expire, the least recently used beyond
+    `max_sessions` are removed by the periodic sweep, and each session keeps
+    its last `max_messages` messages.
+    """
+
+    def __init__(self, db_path: str, max_sessions: int = 1024, ttl: float = 3600, max_messages: int = 40,
+                 flush_interval: float = 0.05, batch_size: int = 256, sweep_interval: float = 60):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_messages = max_messages
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        # _lock guards the write queue and unflushed messages, _db_lock the
+        # connection; adding a message never waits for a commit
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._queue: List[tuple] = []
+        self._unflushed: Dict[str, List[Tuple[int, BaseMessage]]] = {}
+        self._seq = 0
+        self._db = None
+        self._db_pid = None
+        self._writer_pid = None
+        self.flushes = 0
+        self.written = 0
+        self.largest_batch = 0
+        self.last_flush_ms = None
+        self.flush_errors = 0
+        self.deleted = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.sweeps = 0
+        with self._db_lock:
+            self._connection()
+        os.register_at_fork(
+            before=_weak_call(self._before_fork),
+            after_in_parent=_weak_call(self._after_fork_in_parent),
+            after_in_child=_weak_call(self._after_fork_in_child),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not be used by two processes, so a worker forked
+        # after the store was created opens its own
+        if self._db is None or self._db_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl if self.ttl else 0
+
+    def get(self, session_id: str) -> SQLiteChatMessageHistory:
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def messages(self, session_id: str) -> List[BaseMessage]:
+        self._ensure_writer()
+        with self._db_lock:
+            db = self._connection()
+            row = db.execute("SELECT last_used FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            rows = []
+            if row is not None and row[0] >= self._expired_before():
+                rows = db.execute(
+                    "SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                    (session_id, self.max_messages if self.max_messages > 0 else -1)
+                ).fetchall()
+            # Read under _db_lock so a flush can't move messages from the
+            # queue to the database in between
+            with self._lock:
+                pending = [message for _, message in self._unflushed.get(session_id, ())]
+        stored = messages_from_dict([json.loads(r[0]) for r in reversed(rows)])
+        kept, _ = _trim(tuple(stored + pending), self.max_messages)
+        return list(kept)
+
+    def add(self, session_id: str, messages: Sequence[BaseMessage]):
+        self._ensure_writer()
+        now = time.time()
+        with self._lock:
+            unflushed = self._unflushed.setdefault(session_id, [])
+            for message in messages:
+                self._seq += 1
+                unflushed.append((self._seq, message))
+                self._queue.append(("add", session_id, self._seq, json.dumps(message_to_dict(message)), now))
+            waiting = len(self._queue)
+        if self.flush_interval <= 0:
+            self.flush()
+        elif waiting >= self.batch_size:
+            self._wake.set()
+
+    def delete(self, session_id: str) -> bool:
+        with self._db_lock:
+            # Checked under _db_lock so no flush moves the session's messages
+            # between the queue and the database meanwhile
+            stored = self._connection().execute(
+                "SELECT 1 FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone() is not None
+            with self._lock:
+                self._seq += 1
+                pending = self._unflushed.pop(session_id, None) is not None
+                self._queue.append(("delete", session_id, self._seq))
+        self.flush()
+        existed = stored or pending
+        if existed:
+            self.deleted += 1
+        return existed
+
+    # -------------------- Writes --------------------
+    def flush(self) -> int:
+        """
+        Commit the queued writes in one transaction. Returns how many
+        """
+        with self._db_lock:
+            with self._lock:
+                ops, self._queue = self._queue, []
+            committed = self._commit(ops)
+            with self._lock:
+                self._settle(ops, committed)
+            return len(ops) if committed else 0
+
+    def _commit(self, ops: List[tuple]) -> bool:
+        """
+        Write `ops` in one transaction; called under _db_lock
+        """
+        if not ops:
+            return True
+        start = time.perf_counter()
+        db = self._connection()
+        try:
+            with db:
+                self._write(db, ops)
+        except sqlite3.Error as e:
+            self.flush_errors += 1
+            print(f"⚠️ Chat history flush failed, will retry: {e}")
+            return False
+        self.flushes += 1
+        self.written += len(ops)
+        self.largest_batch = max(self.largest_batch, len(ops))
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+        return True
+
+    def _settle(self, ops: List[tuple], committed: bool):
+        """
+        Drop committed messages from the unflushed ones, or queue failed
+        writes again in front of newer ones; called under _lock
+        """
+        if not committed:
+            self._queue[:0] = ops
+            return
+        flushed = {op[1]: op[2] for op in ops if op[0] == "add"}
+        for session_id, seq in flushed.items():
+            unflushed = [entry for entry in self._unflushed.get(session_id, ()) if entry[0] > seq]
+            if unflushed:
+                self._unflushed[session_id] = unflushed
+            else:
+                self._unflushed.pop(session_id, None)
+
+    def _before_fork(self):
+        # Commit everything queued and hold both locks across the fork, so
+        # the child starts with an empty queue and no lock held by a thread
+        # that only exists in the parent
+        self._db_lock.acquire()
+        self._lock.acquire()
+        ops, self._queue = self._queue, []
+        self._settle(ops, self._commit(ops))
+
+    def _after_fork_in_parent(self):
+        self._lock.release()
+        self._db_lock.release()
+
+    def _after_fork_in_child(self):
+        if self._queue:
+            # Only left when the commit above failed; the parent retries them
+            print(f"⚠️ {len(self._queue)} chat history writes left to the parent process")
+            self._queue, self._unflushed = [], {}
+        self._wake = threading.Event()
+        self._lock.release()
+        self._db_lock.release()
+
+    def _write(self, db: sqlite3.Connection, ops: List[tuple]):
+        expired_before = self._expired_before()
+        touched = {}
+        for op in ops:
+            session_id = op[1]
+            if op[0] == "delete":
+                db.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+                db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                touched.pop(session_id, None)
+                continue
+            if session_id not in touched:
+                # A session that expired starts over
+                db.execute(
+                    "DELETE FROM chat_messages WHERE session_id = ? AND EXISTS ("
+                    "SELECT 1 FROM chat_sessions WHERE session_id = ? AND last_used < ?)",
+                    (session_id, session_id, expired_before)
+                )
+            db.execute("INSERT INTO chat_messages (session_id, message) VALUES (?, ?)", (session_id, op[3]))
+            touched[session_id] = op[4]
+        db.executemany(
+            "INSERT INTO chat_sessions (session_id, last_used) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET last_used = excluded.last_used",
+            touched.items()
+        )
+        if self.max_messages > 0:
+            db.executemany(
+                "DELETE FROM chat_messages WHERE session_id = ? AND id <= ("
+                "SELECT id FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                [(session_id, session_id, self.max_messages) for session_id in touched]
+            )
+
+    def sweep(self) -> int:
+        """
+        Remove expired sessions and the least recently used beyond
+        max_sessions
+        """
+        with self._db_lock:
+            db = self._connection()
+            with db:
+                expired = [r[0] for r in db.execute(
+                    "SELECT session_id FROM chat_sessions WHERE last_used < ?", (self._expired_before(),)
+                )] if self.ttl else []
+                evicted = [r[0] for r in db.execute(
+                    "SELECT session_id FROM chat_sessions WHERE last_used >= ? "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                    (self._expired_before(), self.max_sessions)
+                )] if self.max_sessions > 0 else []
+                removed = [(session_id,) for session_id in expired + evicted]
+                db.executemany("DELETE FROM chat_messages WHERE session_id = ?", removed)
+                db.executemany("DELETE FROM chat_sessions WHERE session_id = ?", removed)
+            self.expirations += len(expired)
+            self.evictions += len(evicted)
+            self.sweeps += 1
+        return len(removed)
+
+    def _ensure_writer(self):
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        threading.Thread(target=self._write_forever, name="chat-history-writer", daemon=True).start()
+
+    def _write_forever(self):
+        next_sweep = time.monotonic() + self.sweep_interval
+        # With write-through adds only the sweep is left to do
+        interval = self.flush_interval if self.flush_interval > 0 else self.sweep_interval
+        while True:
+            self._wake.wait(interval if interval > 0 else None)
+            self._wake.clear()
+            try:
+                self.flush()
+                if self.sweep_interval > 0 and time.monotonic() >= next_sweep:
+                    self.sweep()
+                    next_sweep = time.monotonic() + self.sweep_interval
+            except Exception as e:
+                print(f"⚠️ Chat history writer failed: {e}")
+
+    def stats(self) -> dict:
+        with self._db_lock:
+            db = self._connection()
+            sessions = db.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+            messages = db.execute("SELECT COUNT(*) FROM chat_messages").fetchone()[0]
+        with self._lock:
+            pending = len(self._queue)
+        db_bytes = sum(os.path.getsize(p) for p in (self.db_path, self.db_path + "-wal") if os.path.exists(p))
+        return {
+            "backend": "sqlite",
+            "path": self.db_path,
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "max_messages": self.max_messages,
+            "messages": messages,
+            "db_bytes": db_bytes,
+            "pending_writes": pending,
+            "flush_interval": self.flush_interval,
+            "flushes": self.flushes,
+            "written": self.written,
+            "largest_batch": self.largest_batch,
+            "last_flush_ms": self.last_flush_ms,
+            "flush_errors": self.flush_errors,
+            "deleted": self.deleted,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "sweeps": self.sweeps,
+        }
@@ -2,6 +2,8 @@
 
 import os
 import csv
+import re
+from typing import Dict, List
 
 # -------------------- Configs --------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,5 +21,38 @@ with open(DATA_PATH, newline="", encoding="utf-8") as f:
             "symptoms": [x.strip() for x in row.get("Symptoms", "").split(",") if x.strip()],
             "treatments": [x.strip() for x in row.get("Treatment", "").split(",") if x.strip()],
             "risks": [x.strip() for x in (row.get("Risk_Factors") or "").split(",") if x.strip()],
+        }
+
+_PARENTHETICAL_RE = re.compile(r"\s*\([^)]*\)")
+
 
+def condition_info(name: str) -> dict:
+    """
+    Description, symptoms, treatments and risks of a condition, or
+    placeholders when it is not in the database. The LLM sometimes adds an
+    alias in brackets ("Influenza (flu)"), so that is tried without it too.
+    """
+    key = name.lower().strip()
+    data = condition_database.get(key) or condition_database.get(_PARENTHETICAL_RE.sub("", key).strip())
+    if data is None:
+        return {
+            "name": name,
+            "description": "No information available.",
+            "symptoms": [],
+            "treatments": ["Information not available."],
+            "risks": ["Information not available."],
         }
+    return {
+        "name": name,
+        "description": data.get("description", ""),
+        "symptoms": data.get("symptoms", []),
+        "treatments": data.get("treatments", []),
+        "risks": data.get("risks", []),
+    }
+
+
+def enrich_conditions(conditions: List[Dict[str, str]]) -> List[dict]:
+    """
+    Join parsed {"name", "reason"} conditions with their condition_info
+    """
+    return [dict(condition_info(c["name"]), reason=c.get("reason", "")) for c in conditions]
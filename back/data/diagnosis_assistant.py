@@ -1,17 +1,54 @@
+import asyncio
+import atexit
 import os
 import re
 import time
+from collections import namedtuple
 from typing import List
 import warnings
 import pandas as pd
 import spacy
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain_huggingface import HuggingFaceEmbeddings
+from spacy.lang.en.stop_words import STOP_WORDS
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import CSVLoader
-from langchain_google_genai import ChatGoogleGenerativeAI
+from chromadb.api.client import SharedSystemClient
 from dotenv import load_dotenv
+from rapidfuzz import process, fuzz
+try:
+    from .symptom_matcher import SymptomMatcher
+    from .symptom_lexicon import synonym_map, build_symptom_vocab
+    from .lru_cache import LRUCache
+    from .stage_timing import span, StageTimingCallback
+    from .diagnosis_cache import DiagnosisCache, cache_version
+    from .disease_scorer import DiseaseScorer
+    from .diagnosis_chain import build_diagnosis_chain, astream_answer, SessionHistory
+    from .retrieval import SymptomAwareRetriever, TopKCache, symptom_query
+    from .embedding_cache import CachedEmbeddings
+    from .embedding_backend import create_embeddings, embedding_id, embedding_backend, apply_thread_settings
+    from .index_sync import sync_index
+    from .numpy_store import NumpyVectorStore
+    from .token_budget import TokenCounter, PromptBudget, PromptParts, render_context
+    from .single_flight import SingleFlight
+    from .resilience import Resilience
+    from .llm_backend import create_chat_model, llm_backend
+    from .startup import startup
+except ImportError:
+    from symptom_matcher import SymptomMatcher
+    from symptom_lexicon import synonym_map, build_symptom_vocab
+    from lru_cache import LRUCache
+    from stage_timing import span, StageTimingCallback
+    from diagnosis_cache import DiagnosisCache, cache_version
+    from disease_scorer import DiseaseScorer
+    from diagnosis_chain import build_diagnosis_chain, astream_answer, SessionHistory
+    from retrieval import SymptomAwareRetriever, TopKCache, symptom_query
+    from embedding_cache import CachedEmbeddings
+    from embedding_backend import create_embeddings, embedding_id, embedding_backend, apply_thread_settings
+    from index_sync import sync_index
+    from numpy_store import NumpyVectorStore
+    from token_budget import TokenCounter, PromptBudget, PromptParts, render_context
+    from single_flight import SingleFlight
+    from resilience import Resilience
+    from llm_backend import create_chat_model, llm_backend
+    from startup import startup
 
 # -------------------- Load Environment --------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,460 +59,269 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 # -------------------- Configs --------------------
 DATA_PATH = os.path.join(BASE_DIR, "medical_knowledge_clean.csv")
 SYMPTOM_QA_PATH = os.path.join(BASE_DIR, "symptom_follow_up_questions.csv")
-PERSIST_DIR = os.path.join(BASE_DIR, "rag_index")
+# Both indexes are built from DATA_PATH by the sync below and not kept in git
+PERSIST_DIR = os.getenv("CHROMA_INDEX_DIR", os.path.join(BASE_DIR, "cache", "rag_index"))
+NUMPY_INDEX_DIR = os.path.join(BASE_DIR, "numpy_index")
 EMBED_MODEL = "all-MiniLM-L6-v2"
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("❌ Please set your GOOGLE_API_KEY environment variable in a .env file.")
-
-# -------------------- Load spaCy NLP Model --------------------
-print("🔁 Loading spaCy model...")
-nlp = spacy.load("en_ner_bc5cdr_md")
+LLM_MODEL = "models/gemini-2.5-pro"
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "64"))
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", "1"))
+NER_EXCLUDED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer", "parser"]
+
+# lexicon-only: never run NER; ner-when-needed: run NER only when the lexicon finds
+# nothing or covers less than NER_COVERAGE_THRESHOLD of the content words; full: always
+EXTRACTION_MODES = ("lexicon-only", "ner-when-needed", "full")
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "full")
+NER_COVERAGE_THRESHOLD = float(os.getenv("NER_COVERAGE_THRESHOLD", "0.5"))
+TYPO_MAX_EDIT_DISTANCE = int(os.getenv("TYPO_MAX_EDIT_DISTANCE", "2"))
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "2048"))
+EXTRACTION_CACHE_TTL = float(os.getenv("EXTRACTION_CACHE_TTL", "3600"))
+DIAGNOSIS_CACHE_SIZE = int(os.getenv("DIAGNOSIS_CACHE_SIZE", "1024"))
+DIAGNOSIS_CACHE_TTL = float(os.getenv("DIAGNOSIS_CACHE_TTL", "86400"))
+# Path of the shared SQLite tier; leave empty to keep the cache in memory only
+DIAGNOSIS_CACHE_DB = os.getenv("DIAGNOSIS_CACHE_DB", "")
+# Bump to invalidate every cached diagnosis by hand
+DIAGNOSIS_CACHE_VERSION = os.getenv("DIAGNOSIS_CACHE_VERSION", "1")
+# Answer from the local disease scorer, without the LLM, when its top-2 are
+# clear (opt-in): the leader must beat the runner-up by LEAD_MARGIN and the
+# runner-up the third disease by THIRD_MARGIN, both relative to their scores
+LOCAL_DIAGNOSIS_FAST_PATH = os.getenv("LOCAL_DIAGNOSIS_FAST_PATH", "0") == "1"
+LOCAL_DIAGNOSIS_LEAD_MARGIN = float(os.getenv("LOCAL_DIAGNOSIS_LEAD_MARGIN", "0.15"))
+LOCAL_DIAGNOSIS_THIRD_MARGIN = float(os.getenv("LOCAL_DIAGNOSIS_THIRD_MARGIN", "0.3"))
+LOCAL_DIAGNOSIS_MIN_MATCHES = int(os.getenv("LOCAL_DIAGNOSIS_MIN_MATCHES", "2"))
+# Documents put in each diagnosis prompt
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+# Vector search only looks at the rows of the best-matching diseases (by symptom)
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+# Knowledge-base columns kept in retrieved documents
+RETRIEVAL_FIELDS = [f.strip() for f in os.getenv("RETRIEVAL_FIELDS", "Disease,Symptoms,Description").split(",") if f.strip()]
+# Earlier turns of the same session_id replayed in the prompt (0 disables)
+DIAGNOSIS_HISTORY_TURNS = int(os.getenv("DIAGNOSIS_HISTORY_TURNS", "2"))
+DIAGNOSIS_SESSION_LIMIT = int(os.getenv("DIAGNOSIS_SESSION_LIMIT", "1024"))
+DIAGNOSIS_SESSION_TTL = float(os.getenv("DIAGNOSIS_SESSION_TTL", "3600"))
+# Whole diagnosis LLM call, retries included; past it the local fallback answers
+DIAGNOSIS_DEADLINE = float(os.getenv("DIAGNOSIS_DEADLINE", "25"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "1"))
+# Consecutive LLM failures that open the circuit, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+# Upper bound on the diagnosis prompt, counted with the embedding model's tokenizer (0 disables)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+# Embeddings by text hash, memory-mapped on disk (0 disables)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(BASE_DIR, "cache", "embeddings.npy"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Retrieved document IDs by canonical symptom set (0 disables)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "86400"))
+# chroma: persistent HNSW index in PERSIST_DIR; numpy: exact search over a
+# memory-mapped matrix in NUMPY_INDEX_DIR (faster for a knowledge base this small)
+VECTOR_STORES = ("chroma", "numpy")
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+# Re-embed changed knowledge-base rows at startup (see index_sync.py for the CLI)
+INDEX_SYNC_ON_STARTUP = os.getenv("INDEX_SYNC_ON_STARTUP", "1") == "1"
+
+if EXTRACTION_MODE not in EXTRACTION_MODES:
+    raise ValueError(f"❌ EXTRACTION_MODE must be one of {EXTRACTION_MODES}, got '{EXTRACTION_MODE}'.")
+if VECTOR_STORE not in VECTOR_STORES:
+    raise ValueError(f"❌ VECTOR_STORE must be one of {VECTOR_STORES}, got '{VECTOR_STORE}'.")
+
+# -------------------- Background Loading --------------------
+# The slow loads run in parallel with the CSV and lexicon setup below and are
+# joined where first needed: the embedding model and LLM client further down
+# this module, spaCy only when NER first runs (or in warm_up)
+print("🔁 Loading spaCy, embedding model and LLM client in the background...")
+# Only doc.ents is read, so skip the components that feed nothing into NER
+startup.submit("spacy", spacy.load, "en_ner_bc5cdr_md", exclude=NER_EXCLUDED_COMPONENTS)
+startup.submit("embedding_model", create_embeddings, EMBED_MODEL)
+# LLM_BACKEND=gemini (default) or fake for offline load testing. Retries and
+# timeouts are handled by diagnosis_guard, not inside the client
+startup.submit("diagnosis_llm", create_chat_model, LLM_MODEL, timeout=DIAGNOSIS_DEADLINE, max_retries=0)
+
+def get_nlp():
+    """
+    The spaCy pipeline, waiting for it if it is still loading
+    """
+    return startup.result("spacy")
 
 print("📄 Reading medical dataset...")
-df = pd.read_csv(DATA_PATH)
+with startup.timed("knowledge_base"):
+    df = pd.read_csv(DATA_PATH)
 
 # -------------------- Symptom Vocabulary --------------------
-def build_symptom_vocab(df):
-    symptoms = set()
-    for s in df["Symptoms"].dropna():
-        symptoms.update([sym.strip().lower() for sym in s.split(",")])
-    return sorted(symptoms)
-
 symptom_vocab = build_symptom_vocab(df)
 
-# -------------------- Synonym Map --------------------
-
-synonym_map = {
-    # ==================== General ====================
-    "tired": "fatigue",
-    "exhausted": "fatigue",
-    "burned out": "fatigue",
-    "worn out": "fatigue",
-    "lethargic": "fatigue",
-    "groggy": "fatigue",
-    "lack of energy": "fatigue",
-    "feeling weak": "fatigue",
-    "fatigued": "fatigue",
-    "drained":"fatigue",
-    
-    # ==================== Vision ====================
-    "blurry vision": "blurred vision",
-    "can't see clearly": "blurred vision",
-    "dim vision": "blurred vision",
-    "spots in vision": "blurred vision",
-    "seeing spots": "blurred vision",
-    "floaters": "blurred vision",
-    "flashes of light": "photopsia",
-    "vision fades": "blurred vision",
-    "vision problems": "blurred vision",
-    "seeing double": "diplopia",
-    "double vision": "diplopia",
-    "crossed eyes": "strabismus",
-    "eye misalignment": "strabismus",
-    "sensitive to light": "photophobia",
-    "light sensitivity": "photophobia",
-
-    # ==================== Headache / Nausea ====================
-    "head pain": "headache",
-    "hurting head": "headache",
-    "pounding head": "headache",
-    "aching head": "headache",
-    "migraine": "headache",
-    "feel nauseous": "nausea",
-    "queasy": "nausea",
-    "sick to stomach": "nausea",
-    "want to throw up": "nausea",
-    "puke": "nausea",
-    "vomit": "nausea",
-    "throwing up": "nausea",
-    "retching": "nausea",
-    "green around the gills": "nausea",
-    "turned stomach": "nausea",
-
-    # ==================== Fever ====================
-    "feverish": "fever",
-    "burning up": "fever",
-    "high temperature": "fever",
-    "hot body": "fever",
-    "hot flush": "fever",
-    "temperature": "fever",
-    "chills": "fever",
-
-    # ==================== Chest ====================
-    "chest tightness": "chest pain",
-    "chest discomfort": "chest pain",
-    "burning in chest": "chest pain",
-    "tight chest": "chest pain",
-    "pressure in chest": "chest pain",
-    "pain in chest when breathing": "chest pain",
-    "squeezing chest": "chest pain",
-    "heart racing": "palpitations",
-    "pounding heart": "palpitations",
-
-    # ==================== Cold Symptoms ====================
-    "sneezing": "sneezing",
-    "sniffles": "rhinorrhea",
-    "drippy nose": "rhinorrhea",
-    "stuffy nose": "nasal congestion",
-    "congested": "nasal congestion",
-    "blocked nose": "nasal congestion",
-    "sore throat": "throat pain",
-    "scratchy throat": "throat pain",
-    "throat hurts":"throat pain",
-    "hoarse voice": "hoarseness",
-    "hoarseness": "hoarseness",
-    "coughing": "cough",
-    "cough with phlegm": "productive cough",
-    "green mucus": "productive cough",
-    "phlegm": "productive cough",
-
-    # ==================== Skin ====================
-    "red spots": "rash",
-    "itchy skin": "rash",
-    "itchy spots": "rash",
-    "hives": "rash",
-    "skin bumps": "rash",
-    "skin irritation": "rash",
-    "redness on skin": "rash",
-    "peeling skin": "rash",
-
-    # ==================== Breathing ====================
-    "short of breath": "shortness of breath",
-    "can't breathe": "shortness of breath",
-    "can't catch breath": "shortness of breath",
-    "breathlessness": "shortness of breath",
-    "wheezing": "shortness of breath",
-    "trouble breathing": "shortness of breath",
-    "breathless":"shortness of breath",
-
-    # ==================== Dizziness ====================
-    "feel dizzy": "dizziness",
-    "feeling dizzy": "dizziness",
-    "spinning sensation": "dizziness",
-    "lightheaded": "dizziness",
-    "feel faint": "dizziness",
-    "loss of balance": "dizziness",
-
-    # ==================== GI / Stomach ====================
-    "stomach ache": "abdominal pain",
-    "tummy pain": "abdominal pain",
-    "belly pain": "abdominal pain",
-    "pain after eating": "abdominal pain",
-    "diarrhea": "diarrhea",
-    "loose motion": "diarrhea",
-    "constipated": "constipation",
-    "bloated": "bloating",
-    "gas": "bloating",
-    "acid reflux": "heartburn",
-    "burning in stomach": "heartburn",
-    "loss of appetite": "anorexia",
-    "can’t eat": "anorexia",
-    "skipped meals": "anorexia",
-
-    # ==================== Urinary ====================
-    "frequent urination": "polyuria",
-    "urinating often": "polyuria",
-    "excessive urination": "polyuria",
-    "always thirsty": "polydipsia",
-    "very thirsty": "polydipsia",
-    "excessive thirst": "polydipsia",
-    "painful urination": "dysuria",
-    "burning urination": "dysuria",
-    "burning when peeing": "dysuria",
-    "cloudy urine": "urinary tract infection",
-    "getting up to pee at night": "nocturia",
-
-    # ==================== Neurological ====================
-    "numbness": "paresthesia",
-    "tingling": "paresthesia",
-    "pins and needles": "paresthesia",
-    "hand numbness": "paresthesia",
-    "shaky": "tremors",
-    "trembling": "tremors",
-    "trembling hands": "tremors",
-    "hand tremors": "tremors",
-    "shaking hands": "tremors",
-    "muscle weakness": "weakness",
-    "feeling weak": "weakness",
-    "weak limbs": "weakness",
-    "unsteady": "balance issues",
-
-    # ==================== Psychological ====================
-    "anxious": "anxiety",
-    "nervous": "anxiety",
-    "panic attacks": "anxiety",
-    "low mood": "depression",
-    "sad": "depression",
-    "disoriented": "confusion",
-    "confused": "confusion",
-    "mental fog": "confusion",
-    "forgetfulness": "memory loss",
-    "can't concentrate": "concentration difficulty",
-    "sleep issues": "insomnia",
-    "trouble sleeping": "insomnia",
-
-    # ==================== Cardiovascular ====================
-    "swollen feet": "edema",
-    "ankle swelling": "edema",
-    "leg swelling": "edema",
-    "fluid retention": "edema",
-    "pounding heart": "palpitations",
-    "heart fluttering": "palpitations",
-
-    # ==================== Musculoskeletal ====================
-    "knee pain": "joint pain",
-    "shoulder pain": "joint pain",
-    "muscle pain": "myalgia",
-    "body ache": "myalgia",
-    "sore muscles": "myalgia",
-    "stiff joints": "joint stiffness",
-
-    # ==================== Reproductive / Urinary ====================
-    "irregular periods": "menstrual irregularity",
-    "heavy periods": "menorrhagia",
-    "painful periods": "dysmenorrhea",
-    "burning while urinating": "dysuria",
-
-    # Muscle Strain
-    "pulled muscle": "muscle strain",
-    "muscle tear": "muscle strain",
-    "strained muscle": "muscle strain",
-    "muscle injury": "muscle strain",
-    "muscle soreness": "muscle strain",
-
-    # Tendonitis
-    "tendon pain": "tendonitis",
-    "joint tendon pain": "tendonitis",
-    "tendinitis": "tendonitis",  # spelling variant
-    "tendon inflammation": "tendonitis",
-
-    # Myositis
-    "muscle inflammation": "myositis",
-    "muscle tenderness": "myositis",
-    "muscle fatigue": "myositis",
-    "difficulty climbing stairs": "myositis",
-
-    # Fibromyalgia
-    "chronic muscle pain": "fibromyalgia",
-    "widespread pain": "fibromyalgia",
-    "muscle ache all over": "fibromyalgia",
-    "fibro pain": "fibromyalgia",
-    "tender points": "fibromyalgia",
-    "body pain with fatigue": "fibromyalgia",
-
-    # Rhabdomyolysis
-    "dark urine after exercise": "rhabdomyolysis",
-    "muscle breakdown": "rhabdomyolysis",
-    "severe muscle pain": "rhabdomyolysis",
-    "muscle swelling": "rhabdomyolysis",
-    "rhabdo": "rhabdomyolysis",
-
-    # Muscle Cramp
-    "charley horse": "muscle cramp",
-    "leg cramp": "muscle cramp",
-    "sudden muscle pain": "muscle cramp",
-    "tight muscle": "muscle cramp",
-    "cramping": "muscle cramp",
-    "muscle spasm": "muscle cramp",
-
-    # Sinusitis
-    "facial pain": "facial pain",
-    "nasal congestion": "nasal congestion",
-    "stuffed nose": "nasal congestion",
-    "postnasal drip": "postnasal drip",
-
-    # Conjunctivitis
-    "red eyes": "red eyes",
-    "eye redness": "red eyes",
-    "eye discharge": "discharge",
-    "watery eyes": "tearing",
-    "itchy eyes": "itching",
-
-    # Otitis Media
-    "ear pain": "ear pain",
-    "earache": "ear pain",
-    "hearing loss": "hearing loss",
-    "irritability": "irritability",
-
-    # Anemia
-    "pallor": "pallor",
-    "dizziness": "dizziness",
-    "lightheadedness": "dizziness",
-    "tiredness": "fatigue",
-    "shortness of breath": "shortness of breath",
-
-    # Gallstones
-    "upper abdominal pain": "upper abdominal pain",
-    "gallbladder pain": "upper abdominal pain",
-
-    # Bacterial Vaginosis
-    "vaginal discharge": "vaginal discharge",
-    "vaginal odor": "odor",
-    "vaginal burning": "burning",
-
-    # Tension Headache
-    "tight scalp": "scalp tightness",
-    "neck stiffness": "neck stiffness",
-
-    # Plantar Fasciitis
-    "heel pain": "heel pain",
-    "morning foot pain": "worse in morning",
-
-    # Scabies
-    "intense itching": "intense itching",
-    "mite rash": "rash",
-    "burrow marks": "burrow tracks",
-
-    # Eczema
-    "red patches": "red patches",
-    "skin dryness": "dry skin",
-    "cracked skin": "cracking",
-
-    # Bronchitis
-    "cough": "cough",
-    "wheezing": "wheezing",
-    "mucus": "mucus",
-
-    # Influenza
-    "muscle aches": "muscle aches",
-    "body ache": "muscle aches",
-
-    # Heat Stroke
-    "high temperature": "high body temp",
-    "dry skin": "dry skin",
-    "rapid heartbeat": "rapid pulse",
-
-    # Food Poisoning
-    "stomach cramps": "abdominal cramps",
-
-    # Lactose Intolerance
-    "milk allergy": "lactose intolerance",
-    
-
-    # IBS
-    "constipation": "constipation",
-    "gut pain": "abdominal pain",
-
-    # Seasonal Allergies
-    "hay fever": "seasonal allergies",
-    "runny nose": "runny nose",
-
-    # Depression
-    "low mood": "low mood",
-    "loss of interest": "low mood",
-    "sadness": "low mood",
-    "appetite loss": "appetite changes",
-
-    # Anxiety
-    "worry": "worry",
-    "nervousness": "restlessness",
-    "tight chest": "muscle tension",
-
-    # Menstrual Cramps
-    "period pain": "lower abdominal pain",
-    "cramps": "lower abdominal pain",
-
-    # Dyspepsia
-    "indigestion": "upper abdominal discomfort",
-    "burping": "burping",
-    "early fullness": "early satiety",
-
-    # Sciatica
-    "leg pain": "leg tingling",
-    "back pain": "lower back pain",
-    "nerve pain": "leg tingling",
-
-    # Constipation
-    "hard stools": "hard stools",
-    "difficulty pooping": "straining",
-
-    # Tonsillitis
-    "pain swallowing": "difficulty swallowing",
-    "swollen tonsils": "swollen tonsils",
-
-    # Ringworm
-    "fungal rash": "itchy ring-shaped rash",
-    "scaly rash": "scaling",
-    "red ring": "redness",
-
-    # ==================== Others ====================
-    "passed out": "syncope",
-    "fainting": "syncope",
-    "night sweats": "sweating",
-    "sweating a lot": "sweating",
-    "sun exposure": "heat exhaustion",
-    "heatstroke": "heat exhaustion",
-    "overheated": "heat exhaustion",
-
-}
-
+# synonym_map (lay term -> symptom name) lives in symptom_lexicon.py
 
 modifiers = [
     "constant", "throbbing", "sharp", "mild", "severe", "intermittent",
     "on and off", "persistent", "sudden", "gradual", "spinning", "dull"
 ]
 
+# Conversational words that never describe a symptom on their own
+filler_words = {
+    "feel", "feels", "feeling", "felt", "lately", "recently", "days", "weeks",
+    "getting", "got", "having", "started", "since", "little", "bit", "lot"
+}
+
 # -------------------- Symptom Extraction --------------------
-from typing import List
-from rapidfuzz import process, fuzz
+# Compiled once at startup; finds every synonym_map key/value in one pass and
+# resolves misspellings of them (and of the knowledge-base symptom vocabulary)
+with startup.timed("lexicon"):
+    symptom_matcher = SymptomMatcher(synonym_map, symptom_vocab, max_edit_distance=TYPO_MAX_EDIT_DISTANCE)
 
-def extract_symptoms(text: str, score_cutoff: int = 93) -> List[str]:
+# Extraction results keyed on normalized text, cutoff, mode and lexicon fingerprint
+extraction_cache = LRUCache(maxsize=EXTRACTION_CACHE_SIZE, ttl=EXTRACTION_CACHE_TTL)
 
-    text_lower = text.lower()
-    extracted_symptoms = set()
-
-    # Step 1: Create a unique list of all possible symptoms from the synonym_map
-    all_possible_symptoms = list(set(list(synonym_map.keys()) + list(synonym_map.values())))
-    
-    # Step 2: For each known symptom, search for it within the user's text
-    for symptom in all_possible_symptoms:
-        # process.extractOne finds the best matching substring for the symptom.
-        # We use fuzz.partial_ratio, which is ideal for this task.
-        match = process.extractOne(
-            symptom, 
-            [text_lower], # The text to search within
-            scorer=fuzz.partial_ratio, 
-            score_cutoff=score_cutoff
-        )
-        
-        # Step 3: If a high-quality match is found, normalize it to the standard term
-        if match:
-            standard_term = synonym_map.get(symptom, symptom)
-            extracted_symptoms.add(standard_term)
+def update_lexicon(entries: dict):
+    """
+    Add or override synonym_map entries and recompile the matcher and the
+    disease scorer. Cached extractions from the previous lexicon are dropped.
+    """
+    global symptom_matcher, disease_scorer
+    synonym_map.update({k.strip().lower(): v.strip().lower() for k, v in entries.items()})
+    symptom_matcher = SymptomMatcher(synonym_map, symptom_vocab, max_edit_distance=TYPO_MAX_EDIT_DISTANCE)
+    disease_scorer = DiseaseScorer(df, synonym_map, symptom_matcher)
+    retriever.scorer = disease_scorer
+    # The candidate rows of a symptom set may have changed
+    if retriever.cache is not None:
+        retriever.cache.clear()
+    extraction_cache.clear()
+
+# Overlapping general/specific terms; the general one is dropped when both are found
+specific_to_general_map = {
+    "throat pain": "throat",
+    "joint pain": "joint",
+    "muscle pain": "muscle",
+    "abdominal pain": "stomach",
+    "chest pain": "chest"
+    # Add any other pairs we notice in the future
+}
 
-    # Step 4: Use NER as a fallback to catch any symptoms missed by the map
-    doc = nlp(text)
+def _ner_symptoms(doc, text_lower, score_cutoff):
+    """
+    DISEASE entities from a spaCy doc that are credible matches in the text
+    """
+    found = set()
     for ent in doc.ents:
         if ent.label_ == "DISEASE":
             ner_symptom = ent.text.lower()
             # Check if this NER-found symptom is credible before adding
             if process.extractOne(ner_symptom, [text_lower], scorer=fuzz.partial_ratio, score_cutoff=score_cutoff):
-                standard_term = synonym_map.get(ner_symptom, ner_symptom)
-                extracted_symptoms.add(standard_term)
-            
-    # Step 5: Clean up overlapping general/specific terms for a cleaner output
-    specific_to_general_map = {
-        "throat pain": "throat",
-        "joint pain": "joint",
-        "muscle pain": "muscle",
-        "abdominal pain": "stomach",
-        "chest pain": "chest"
-        # Add any other pairs we notice in the future
-    }
+                found.add(synonym_map.get(ner_symptom, ner_symptom))
+    return found
 
+def _clean_overlaps(extracted_symptoms):
     final_symptoms = set(extracted_symptoms)
-    
     for specific, general in specific_to_general_map.items():
         if specific in final_symptoms and general in final_symptoms:
             # If the specific term exists, remove the more general one
             final_symptoms.remove(general)
-
     return list(final_symptoms)
+
+_WORD_RE = re.compile(r"[a-z]+")
+_NON_CONTENT_WORDS = (
+    set(STOP_WORDS)
+    | {word for modifier in modifiers for word in modifier.split()}
+    | filler_words
+)
+
+def lexicon_coverage(text_lower, hits):
+    """
+    Share of the content words in the text that fall inside a lexicon match
+    """
+    content = covered = 0
+    for word in _WORD_RE.finditer(text_lower):
+        if len(word.group()) < 3 or word.group() in _NON_CONTENT_WORDS:
+            continue
+        content += 1
+        if any(hit.start < word.end() and word.start() < hit.end for hit in hits):
+            covered += 1
+    return covered / content if content else 1.0
+
+def _needs_ner(mode, text_lower, hits):
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{mode}', expected one of {EXTRACTION_MODES}")
+    if mode == "full":
+        return True
+    if mode == "lexicon-only":
+        return False
+    return not hits or lexicon_coverage(text_lower, hits) < NER_COVERAGE_THRESHOLD
+
+def _extract_symptoms_uncached(text, score_cutoff, mode):
+
+    text_lower = text.lower()
+
+    # Step 1-3: Find every known symptom (synonym_map keys and values) within the
+    # user's text, correct misspelled ones through the typo index, and normalize
+    # them to the standard term.
+    with span("extract.lexicon"):
+        hits = symptom_matcher.find(text_lower)
+    extracted_symptoms = {hit.symptom for hit in hits}
+
+    # Step 4: Use NER as a fallback to catch any symptoms missed by the map
+    if _needs_ner(mode, text_lower, hits):
+        with span("extract.ner"):
+            extracted_symptoms |= _ner_symptoms(get_nlp()(text), text_lower, score_cutoff)
+
+    # Step 5: Clean up overlapping general/specific terms for a cleaner output
+    return _clean_overlaps(extracted_symptoms)
+
+def _cache_key(text, score_cutoff, mode):
+    normalized = " ".join(text.lower().split())
+    # The cutoff only filters NER entities, so lexicon-only results don't depend on it
+    if mode == "lexicon-only":
+        score_cutoff = None
+    return (normalized, score_cutoff, mode, symptom_matcher.fingerprint)
+
+def extract_symptoms(text: str, score_cutoff: int = 93, mode: str = None) -> List[str]:
+    """
+    Symptoms found in `text` with the given EXTRACTION_MODE (default the
+    configured one). `score_cutoff` is the fuzzy-match score an NER entity
+    needs against the text to be kept; it has no effect in lexicon-only mode,
+    where NER never runs.
+    """
+    with span("extract_symptoms"):
+        mode = mode or EXTRACTION_MODE
+        key = _cache_key(text, score_cutoff, mode)
+        cached = extraction_cache.get(key)
+        if cached is None:
+            cached = tuple(_extract_symptoms_uncached(text, score_cutoff, mode))
+            extraction_cache.set(key, cached)
+        return list(cached)
+
+def extract_symptoms_batch(texts: List[str], score_cutoff: int = 93, mode: str = None,
+                           batch_size: int = NER_BATCH_SIZE, n_process: int = NER_N_PROCESS) -> List[List[str]]:
+    """
+    Same as calling extract_symptoms on each text, but cached texts are skipped
+    and NER runs through spaCy's nlp.pipe. Results keep input order.
+    `score_cutoff` only applies to NER entities, as in extract_symptoms.
+    """
+    texts = list(texts)
+    mode = mode or EXTRACTION_MODE
+    keys = [_cache_key(text, score_cutoff, mode) for text in texts]
+    results = [extraction_cache.get(key) for key in keys]
+
+    pending = [i for i, cached in enumerate(results) if cached is None]
+    lowered = [texts[i].lower() for i in pending]
+    with span("extract.lexicon"):
+        batch_hits = symptom_matcher.find_many(lowered)
+    extracted = [{hit.symptom for hit in hits} for hits in batch_hits]
+
+    ner_rows = [j for j, hits in enumerate(batch_hits) if _needs_ner(mode, lowered[j], hits)]
+    with span("extract.ner"):
+        docs = get_nlp().pipe((texts[pending[j]] for j in ner_rows), batch_size=batch_size, n_process=n_process) if ner_rows else []
+        for j, doc in zip(ner_rows, docs):
+            extracted[j] |= _ner_symptoms(doc, lowered[j], score_cutoff)
+
+    for i, symptoms in zip(pending, extracted):
+        results[i] = tuple(_clean_overlaps(symptoms))
+        extraction_cache.set(keys[i], results[i])
+    return [list(symptoms) for symptoms in results]
+
 # -------------------- Follow-Up Questions --------------------
 print("📥 Loading follow-up question map...")
-follow_up_df = pd.read_csv(SYMPTOM_QA_PATH)
+with startup.timed("follow_up_map"):
+    follow_up_df = pd.read_csv(SYMPTOM_QA_PATH)
 follow_up_map = {
     row["Symptom"].strip().lower(): [
         row["Follow_Up_1"], row["Follow_Up_2"], row["Follow_Up_3"], row["Follow_Up_4"]
@@ -483,32 +329,78 @@ follow_up_map = {
     for _, row in follow_up_df.iterrows()
 }
 
+# -------------------- Local Disease Scoring --------------------
+# BM25 over the knowledge-base symptoms; answers clear-cut cases without the LLM
+# and replaces the old hard-coded fallback table
+with startup.timed("disease_scorer"):
+    disease_scorer = DiseaseScorer(df, synonym_map, symptom_matcher)
+
 # -------------------- Vector Store Setup --------------------
 print("🧠 Setting up vector index...")
-embedding = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-
-if os.path.exists(PERSIST_DIR):
-    vectordb = Chroma(persist_directory=PERSIST_DIR, embedding_function=embedding)
-else:
-    print("📌 Creating new vector index...")
-    loader = CSVLoader(file_path=DATA_PATH)
-    docs = loader.load()
-    vectordb = Chroma.from_documents(docs, embedding=embedding, persist_directory=PERSIST_DIR)
-
-retriever = vectordb.as_retriever()
-
-# -------------------- Gemini LLM Setup --------------------
-llm = ChatGoogleGenerativeAI(model="models/gemini-2.5-pro", google_api_key=GOOGLE_API_KEY)
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-
-rag_chain = ConversationalRetrievalChain.from_llm(
-    llm=llm,
-    retriever=retriever,
-    memory=memory,
-    verbose=False
+# The model (and int8 backend) is part of every key, so switching never serves stale vectors
+# EMBEDDING_BACKEND=torch (default), onnx or onnx-int8, see embedding_backend.py
+embedding = CachedEmbeddings(
+    startup.result("embedding_model"),
+    path=EMBEDDING_CACHE_PATH,
+    capacity=EMBEDDING_CACHE_SIZE,
+    namespace=embedding_id(EMBED_MODEL)
+)
+atexit.register(embedding.flush)
+
+# A missing index directory is created empty and filled by the sync below
+with startup.timed("vector_index"):
+    if VECTOR_STORE == "numpy":
+        vectordb = NumpyVectorStore(NUMPY_INDEX_DIR, embedding)
+        index_collection = vectordb
+    else:
+        vectordb = Chroma(persist_directory=PERSIST_DIR, embedding_function=embedding)
+        index_collection = vectordb._collection
+    if INDEX_SYNC_ON_STARTUP:
+        # Only rows added or changed since the last sync are embedded
+        index_report = sync_index(index_collection, DATA_PATH, EMBED_MODEL, embeddings=embedding)
+        print(f"📌 Vector index in sync with {os.path.basename(DATA_PATH)}: {index_report}")
+
+# Narrow the search to diseases sharing a symptom with the request, and keep
+# only the columns the prompt needs
+retriever = SymptomAwareRetriever(
+    vectorstore=vectordb,
+    scorer=disease_scorer,
+    k=RETRIEVAL_K,
+    candidates=RETRIEVAL_CANDIDATES,
+    fields=RETRIEVAL_FIELDS,
+    cache=TopKCache(maxsize=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL) if RETRIEVAL_CACHE_SIZE > 0 else None
+)
+
+# -------------------- LLM Setup --------------------
+llm = startup.result("diagnosis_llm")
+
+# Deadline, jittered retries and a circuit breaker around the diagnosis LLM;
+# while the circuit is open requests go straight to the local fallback
+diagnosis_guard = Resilience(
+    "diagnosis",
+    deadline=DIAGNOSIS_DEADLINE,
+    retries=LLM_RETRIES,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_TIMEOUT
+)
+
+# Opt-in per-session context for follow-up diagnoses from the same user
+diagnosis_sessions = SessionHistory(
+    max_turns=DIAGNOSIS_HISTORY_TURNS,
+    max_sessions=DIAGNOSIS_SESSION_LIMIT,
+    ttl=DIAGNOSIS_SESSION_TTL
 )
 
 # -------------------- Response Optimizer --------------------
+_SUMMARY_PATTERNS = [
+    re.compile(r"\d\.\s*Condition Name:\s*(.+)", re.IGNORECASE),
+    re.compile(r"\d\.\s*(.+?)(?:\s*Reason:|$)", re.IGNORECASE),
+    re.compile(r"Condition Name:\s*(.+)", re.IGNORECASE),
+    re.compile(r"\d\.\s*(.+?)(?:\n|$)", re.IGNORECASE),
+]
+_REASON_SUFFIX_RE = re.compile(r"\s*reason:.*$", re.IGNORECASE)
+
+
 def summarize_response(response, max_lines=10):
     """
     Extract condition names from response with better parsing
@@ -518,18 +410,12 @@ def summarize_response(response, max_lines=10):
     for line in lines:
         line = line.strip()
         # Try multiple patterns to extract condition names
-        patterns = [
-            r"\d\.\s*Condition Name:\s*(.+)",
-            r"\d\.\s*(.+?)(?:\s*Reason:|$)",
-            r"Condition Name:\s*(.+)",
-            r"\d\.\s*(.+?)(?:\n|$)"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, line, re.IGNORECASE)
+        for pattern in _SUMMARY_PATTERNS:
+            match = pattern.search(line)
             if match:
                 condition = match.group(1).strip().lower()
                 # Clean up the condition name
-                condition = re.sub(r'\s*reason:.*$', '', condition, flags=re.IGNORECASE)
+                condition = _REASON_SUFFIX_RE.sub("", condition)
                 conditions.append(condition)
                 break
 
@@ -545,73 +431,37 @@ def summarize_response(response, max_lines=10):
  
 
 # --------------------Fallback  --------------------
+def format_conditions(ranked):
+    """
+    Render (disease, score, matched symptoms) results in the same
+    "Condition Name / Reason" format the LLM is asked to use
+    """
+    lines = []
+    for i, (disease, score, matched) in enumerate(ranked, start=1):
+        if matched:
+            reason = f"Matches reported symptoms: {', '.join(matched)} (knowledge-base score {score:.2f})."
+        else:
+            reason = "Based on symptom pattern and clinical presentation."
+        lines.append(f"{i}. Condition Name: {disease}\nReason: {reason}")
+    return "\n".join(lines)
+
 def apply_fallback_diagnosis(symptoms, context=""):
     """
     Provide reasonable diagnoses when main system fails
     """
-    # Common symptom-to-condition mappings
-    fallback_mappings = {
-        "fever": ["influenza", "viral infection"],
-        "headache": ["migraine", "tension headache"],
-        "chest pain": ["asthma", "heart condition"],
-        "nausea": ["gastroenteritis", "food poisoning"],
-        "joint pain": ["arthritis", "rheumatoid arthritis"],
-        "fatigue": ["anemia", "hypothyroidism"],
-        "shortness of breath": ["asthma", "heart failure"],
-        "blurred vision": ["diabetes", "eye strain"],
-        "dizziness": ["low blood pressure", "dehydration"],
-        "frequent urination": ["diabetes", "urinary tract infection"],
-        "rash": ["allergic reaction", "dermatitis"],
-        "cough": ["bronchitis", "pneumonia"],
-        "abdominal pain": ["gastritis", "irritable bowel syndrome"]
-    }
-    # Find matching conditions
-    suggested_conditions = []
-    for symptom in symptoms:
-        if symptom in fallback_mappings:
-            suggested_conditions.extend(fallback_mappings[symptom])
+    # Rank the knowledge base locally for the reported symptoms
+    ranked = disease_scorer.rank(symptoms, k=2)
     # If no matches, provide general conditions
-    if not suggested_conditions:
-        suggested_conditions = ["viral infection", "stress-related symptoms"]
-    # Take first two unique conditions
-    unique_conditions = list(dict.fromkeys(suggested_conditions))[:2]
-    # Ensure we have exactly 2 conditions
-    if len(unique_conditions) < 2:
-        unique_conditions.append("general medical condition")
-    return f"1. Condition Name: {unique_conditions[0]}\nReason: Based on symptom pattern and clinical presentation.\n2. Condition Name: {unique_conditions[1]}\nReason: Alternative diagnosis considering patient symptoms."
+    for generic in ["viral infection", "stress-related symptoms", "general medical condition"]:
+        if len(ranked) >= 2:
+            break
+        if all(generic != disease for disease, _, _ in ranked):
+            ranked.append((generic, 0.0, []))
+    return format_conditions(ranked[:2])
 
 
 # -------------------- Diagnosis Generator --------------------
-def generate_diagnosis(symptoms, followup_answers, extra_input="", age=None, gender=None, country=None):
-    # Step 1: Normalize and structure follow-up input
-    if isinstance(followup_answers, dict):
-        all_answers = []
-        for answers in followup_answers.values():
-            all_answers.extend(answers)
-    else:
-        all_answers = [followup_answers.strip()] if followup_answers else []
- 
-    # Step 2: Add extra user input if available
-    if extra_input:
-        all_answers.append(f"Additional Notes: {extra_input}")
- 
-    # Step 3: Include demographic information
-    demographics = []
-    if age:
-        demographics.append(f"Age: {age}")
-    if gender:
-        demographics.append(f"Gender: {gender}")
-    if country:
-        demographics.append(f"Country: {country}")
-    if demographics:
-        all_answers.insert(0, ". ".join(demographics))
- 
-    # Step 4: Join everything into a single context string
-    context = ". ".join(all_answers) if all_answers else "No additional context provided."
-    symptom_str = ", ".join(symptoms) if symptoms else "Not specified"
- 
-    # Step 5: IMPROVED PROMPT - More directive and specific
-    query = f"""
+DIAGNOSIS_PROMPT_TEMPLATE = """
     You are an expert medical diagnostic assistant with access to comprehensive medical knowledge.
     PATIENT PRESENTATION:
     Primary Symptoms: {symptom_str}
@@ -634,18 +484,265 @@ def generate_diagnosis(symptoms, followup_answers, extra_input="", age=None, gen
     - "migraine" not "headache disorder"
     Always provide your best medical assessment. If uncertain, provide the most probable conditions based on symptom presentation.
     """
+
+# Diagnoses are reused for requests with the same canonical form; the version
+# changes (and old entries stop being served) when the knowledge CSV, the
+# prompt template or the model changes
+# Prompts are kept under PROMPT_TOKEN_BUDGET tokens: duplicate answers are
+# dropped first, then low-ranked documents, then verbose notes are shortened
+token_counter = TokenCounter(f"sentence-transformers/{EMBED_MODEL}")
+prompt_budget = PromptBudget(token_counter, DIAGNOSIS_PROMPT_TEMPLATE, max_tokens=PROMPT_TOKEN_BUDGET)
+
+# Every diagnosis retrieves and prompts on its own: no process-wide memory, so
+# the prompt stays the same size and one patient's case never reaches another's
+rag_chain = build_diagnosis_chain(
+    llm, retriever, max_docs=RETRIEVAL_K, budget=prompt_budget if PROMPT_TOKEN_BUDGET > 0 else None
+)
+
+diagnosis_cache = DiagnosisCache(
+    version=cache_version(
+        DIAGNOSIS_PROMPT_TEMPLATE, llm_backend(), LLM_MODEL, DIAGNOSIS_CACHE_VERSION,
+        RETRIEVAL_K, RETRIEVAL_FIELDS, PROMPT_TOKEN_BUDGET, embedding_id(EMBED_MODEL), files=[DATA_PATH]
+    ),
+    maxsize=DIAGNOSIS_CACHE_SIZE,
+    ttl=DIAGNOSIS_CACHE_TTL,
+    db_path=DIAGNOSIS_CACHE_DB
+)
+
+DiagnosisPlan = namedtuple(
+    "DiagnosisPlan",
+    ["answer", "cache_key", "context", "query", "retrieval_query", "symptoms", "history", "session_id", "summary", "parts"],
+    defaults=[None] * 10
+)
+
+UNHELPFUL_ANSWER_PHRASES = ["i don't know", "cannot find", "cannot answer", "not enough information"]
+
+def generate_diagnosis(symptoms, followup_answers, extra_input="", age=None, gender=None, country=None, session_id=None):
+    with span("generate_diagnosis"):
+        plan = _plan_diagnosis(symptoms, followup_answers, extra_input, age, gender, country, session_id)
+        if plan.answer is not None:
+            return _remember(plan, plan.answer)
+        try:
+            with span("diagnosis.rag_chain"):
+                result = diagnosis_guard.call(
+                    rag_chain.invoke, _chain_input(plan), config={"callbacks": [StageTimingCallback()]}
+                )
+            return _remember(plan, _finish_diagnosis(plan, symptoms, result))
+        except Exception as e:
+            print(f"Error in diagnosis generation: {e}")
+            with span("diagnosis.fallback"):
+                return apply_fallback_diagnosis(symptoms, plan.context)
+
+# Double clicks and retries send the same request several times at once; the
+# copies wait for the first one instead of each calling the LLM
+diagnosis_flights = SingleFlight("diagnosis")
+
+async def agenerate_diagnosis(symptoms, followup_answers, extra_input="", age=None, gender=None, country=None, session_id=None):
+    """
+    Async twin of generate_diagnosis: the LLM round trip is awaited with
+    ainvoke, so the event loop keeps serving other requests meanwhile.
+    Concurrent identical requests share one diagnosis.
+    """
+    key = (diagnosis_cache.key_for(symptoms, followup_answers, extra_input, age, gender, country), session_id)
+    return await diagnosis_flights.run(
+        key, _agenerate_diagnosis, symptoms, followup_answers, extra_input, age, gender, country, session_id
+    )
+
+async def _agenerate_diagnosis(symptoms, followup_answers, extra_input, age, gender, country, session_id):
+    with span("generate_diagnosis"):
+        # The SQLite cache tier and the local scorer block, so they run in a
+        # worker thread; to_thread carries the stage-timing context along
+        plan = await asyncio.to_thread(
+            _plan_diagnosis, symptoms, followup_answers, extra_input, age, gender, country, session_id
+        )
+        if plan.answer is not None:
+            return _remember(plan, plan.answer)
+        try:
+            with span("diagnosis.rag_chain"):
+                result = await diagnosis_guard.acall(
+                    rag_chain.ainvoke, _chain_input(plan), config={"callbacks": [StageTimingCallback()]}
+                )
+            return _remember(plan, await asyncio.to_thread(_finish_diagnosis, plan, symptoms, result))
+        except Exception as e:
+            print(f"Error in diagnosis generation: {e}")
+            with span("diagnosis.fallback"):
+                return await asyncio.to_thread(apply_fallback_diagnosis, symptoms, plan.context)
+
+async def astream_diagnosis(symptoms, followup_answers, extra_input="", age=None, gender=None, country=None, session_id=None):
+    """
+    Streaming variant of agenerate_diagnosis. Yields ("token", text) pieces
+    while the LLM writes, then a single ("result", diagnosis). The result is
+    authoritative: it is the fallback diagnosis when the streamed answer turns
+    out unusable, and the only event when the cache or local scorer answered.
+    """
+    with span("generate_diagnosis"):
+        plan = await asyncio.to_thread(
+            _plan_diagnosis, symptoms, followup_answers, extra_input, age, gender, country, session_id
+        )
+        if plan.answer is not None:
+            yield "result", _remember(plan, plan.answer)
+            return
+        try:
+            with span("diagnosis.rag_chain"):
+                stream = astream_answer(rag_chain, _chain_input(plan), config={"callbacks": [StageTimingCallback()]})
+                async for kind, value in diagnosis_guard.astream(stream):
+                    if kind == "token":
+                        yield kind, value
+                    else:
+                        result = value
+            answer = _remember(plan, await asyncio.to_thread(_finish_diagnosis, plan, symptoms, result))
+        except Exception as e:
+            print(f"Error in diagnosis generation: {e}")
+            with span("diagnosis.fallback"):
+                answer = await asyncio.to_thread(apply_fallback_diagnosis, symptoms, plan.context)
+        yield "result", answer
+
+def _plan_diagnosis(symptoms, followup_answers, extra_input, age, gender, country, session_id=None):
+    """
+    Everything before the LLM call. `answer` is set when the cache or the
+    local scorer already answered and the LLM is not needed.
+    """
+    symptom_str = ", ".join(symptoms) if symptoms else "Not specified"
+    history = diagnosis_sessions.turns(session_id)
+    # A diagnosis that builds on earlier turns of a session depends on more
+    # than the request itself, so it is neither served from nor stored in the cache
+    cache_key = None if history else diagnosis_cache.key_for(symptoms, followup_answers, extra_input, age, gender, country)
+    if cache_key is not None:
+        with span("diagnosis.cache"):
+            cached = diagnosis_cache.get(cache_key)
+        if cached is not None:
+            return DiagnosisPlan(answer=cached, cache_key=cache_key, session_id=session_id, summary=symptom_str)
+
+    # Clear-cut symptom sets can be answered locally in microseconds
+    if LOCAL_DIAGNOSIS_FAST_PATH:
+        with span("diagnosis.local"):
+            confident = disease_scorer.confident_top2(
+                symptoms,
+                lead_margin=LOCAL_DIAGNOSIS_LEAD_MARGIN,
+                third_margin=LOCAL_DIAGNOSIS_THIRD_MARGIN,
+                min_matches=LOCAL_DIAGNOSIS_MIN_MATCHES
+            )
+        if confident:
+            return DiagnosisPlan(
+                answer=format_conditions(confident), cache_key=cache_key, session_id=session_id, summary=symptom_str
+            )
+
+    # Step 1: Normalize and structure follow-up input
+    if isinstance(followup_answers, dict):
+        all_answers = []
+        for answers in followup_answers.values():
+            all_answers.extend(answers)
+    else:
+        all_answers = [followup_answers.strip()] if followup_answers else []
  
-    # Step 6: Get response from LLM with fallback
-    try:
-        result = rag_chain.invoke({"question": query})
-        response = result["answer"]
-        # If response contains "I don't know" or similar, apply fallback
-        if any(phrase in response.lower() for phrase in ["i don't know", "cannot find", "cannot answer", "not enough information"]):
-            response = apply_fallback_diagnosis(symptoms, context)
-        return response.strip()
-    except Exception as e:
-        print(f"Error in diagnosis generation: {e}")
-        return apply_fallback_diagnosis(symptoms, context)
+    # Step 2: Include demographic information
+    demographics = []
+    if age:
+        demographics.append(f"Age: {age}")
+    if gender:
+        demographics.append(f"Gender: {gender}")
+    if country:
+        demographics.append(f"Country: {country}")
+ 
+    # Step 3: Join everything (demographics, answers, extra user input) into a single context string
+    parts = PromptParts(symptom_str, ". ".join(demographics), all_answers, extra_input or "")
+    context = render_context(parts)
+ 
+    # Step 4: IMPROVED PROMPT - More directive and specific
+    query = DIAGNOSIS_PROMPT_TEMPLATE.format(symptom_str=symptom_str, context=context)
+    # Retrieve on the symptom set alone: the rest of the request only goes
+    # into the prompt, so the same symptoms reuse the cached query embedding
+    # and top-k IDs
+    retrieval_query = symptom_query(symptoms) or context
+    return DiagnosisPlan(
+        cache_key=cache_key, context=context, query=query, retrieval_query=retrieval_query,
+        symptoms=list(symptoms or []), history=history, session_id=session_id, summary=symptom_str, parts=parts
+    )
+
+def _chain_input(plan):
+    return {
+        "question": plan.query,
+        "retrieval_query": plan.retrieval_query,
+        "symptoms": plan.symptoms,
+        "history": plan.history,
+        "prompt_parts": plan.parts,
+    }
+
+def _finish_diagnosis(plan, symptoms, result):
+    log_budget(result.get("budget"))
+    response = result["answer"]
+    # If response contains "I don't know" or similar, apply fallback
+    if any(phrase in response.lower() for phrase in UNHELPFUL_ANSWER_PHRASES):
+        with span("diagnosis.fallback"):
+            return apply_fallback_diagnosis(symptoms, plan.context).strip()
+    # Only real LLM answers are cached, never the fallback
+    if plan.cache_key is not None:
+        diagnosis_cache.set(plan.cache_key, response.strip())
+    return response.strip()
+
+def log_budget(report):
+    if not report:
+        return
+    trimmed = []
+    if report["duplicates_removed"]:
+        trimmed.append(f"{report['duplicates_removed']} duplicate answers")
+    if report["docs_dropped"]:
+        trimmed.append(f"{report['docs_dropped']} documents")
+    if report["items_shortened"]:
+        trimmed.append(f"{report['items_shortened']} notes shortened")
+    print(
+        f"🧮 Prompt budget: {report['after']}/{report['budget']} tokens"
+        + (f" (was {report['before']}; trimmed {', '.join(trimmed)})" if trimmed else "")
+        + (" ⚠️ still over budget" if report["over_budget"] else "")
+    )
+
+def _remember(plan, answer):
+    diagnosis_sessions.append(plan.session_id, f"Symptoms: {plan.summary}", answer)
+    return answer
+
+# -------------------- Pre-fork Workers --------------------
+def reopen_after_fork():
+    """
+    Called in each worker forked from a process that already imported this
+    module (gunicorn --preload, see gunicorn_conf.py). The spaCy pipeline,
+    dataframes, lexicon and index pages stay shared with the master
+    copy-on-write; clients holding sockets, threads or SQLite handles are
+    re-created, since those cannot be used from two processes.
+    """
+    global vectordb, index_collection, llm, rag_chain
+    apply_thread_settings()
+    if embedding_backend() != "torch":
+        # ONNX Runtime's thread pool does not survive the fork
+        embedding.inner = create_embeddings(EMBED_MODEL)
+    if VECTOR_STORE == "chroma":
+        # Chroma caches one client per path; drop the master's
+        SharedSystemClient.clear_system_cache()
+        vectordb = Chroma(persist_directory=PERSIST_DIR, embedding_function=embedding)
+        index_collection = vectordb._collection
+        retriever.vectorstore = vectordb
+    diagnosis_cache.reopen()
+    llm = create_chat_model(LLM_MODEL, timeout=DIAGNOSIS_DEADLINE, max_retries=0)
+    rag_chain = build_diagnosis_chain(
+        llm, retriever, max_docs=RETRIEVAL_K, budget=prompt_budget if PROMPT_TOKEN_BUDGET > 0 else None
+    )
+
+# -------------------- Warm-up --------------------
+WARMUP_TEXT = "I have had a fever, a dry cough and a headache for two days"
+
+def warm_up():
+    """
+    Run every local model once so the first request does not pay for lazy
+    initialisation (spaCy pipeline, embedding session, index pages, tokenizer).
+    Nothing is cached and the LLM is not called.
+    """
+    with startup.timed("warmup.ner"):
+        get_nlp()(WARMUP_TEXT)
+    with startup.timed("warmup.embedding"):
+        vector = embedding.inner.embed_query(WARMUP_TEXT)
+    with startup.timed("warmup.vector_search"):
+        vectordb.similarity_search_by_vector(vector, k=RETRIEVAL_K)
+    with startup.timed("warmup.tokenizer"):
+        token_counter.count(WARMUP_TEXT)
 
 # -------------------- CLI Interactive Mode --------------------
 def main():
@@ -0,0 +1,178 @@
+# back/data/diagnosis_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from .lru_cache import LRUCache
+except ImportError:
+    from lru_cache import LRUCache
+
+# (upper bound inclusive, label); ages above the last bound fall in "senior"
+AGE_BUCKETS = [(1, "infant"), (12, "child"), (17, "adolescent"), (39, "adult"), (64, "middle-aged")]
+
+
+def age_bucket(age):
+    if age is None or age == "":
+        return None
+    age = int(age)
+    for upper, label in AGE_BUCKETS:
+        if age <= upper:
+            return label
+    return "senior"
+
+
+def _norm(text):
+    return " ".join(str(text).lower().split()) if text else ""
+
+
+def canonical_request(symptoms, followup_answers, extra_input="", age=None, gender=None, country=None) -> dict:
+    """
+    Order-, case- and whitespace-insensitive form of a diagnosis request.
+    Two requests with the same canonical form get the same diagnosis.
+    """
+    if isinstance(followup_answers, dict):
+        answers = {
+            _norm(symptom): [_norm(a) for a in values if _norm(a)]
+            for symptom, values in followup_answers.items()
+        }
+        answers = {symptom: values for symptom, values in sorted(answers.items()) if values}
+    else:
+        answers = _norm(followup_answers)
+
+    return {
+        "symptoms": sorted({_norm(s) for s in symptoms or [] if _norm(s)}),
+        "followup_answers": answers,
+        "extra_input": _norm(extra_input),
+        "age": age_bucket(age),
+        "gender": _norm(gender) or None,
+        "country": _norm(country) or None,
+    }
+
+
+def request_hash(canonical: dict) -> str:
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_version(*parts, files=()) -> str:
+    """
+    Hash of the prompt template, model name, knowledge files etc. Cached
+    diagnoses made under another version are never served.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    for path in files:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class DiagnosisCache:
+    """
+    Two-tier cache of LLM diagnoses: a per-process LRU in front of an optional
+    SQLite file that survives restarts and is shared by the uvicorn workers on
+    one host (WAL mode, so readers never block the writer).
+    """
+
+    def __init__(self, version: str, maxsize: int = 1024, ttl: float = 86400, db_path: str = None,
+                 stale_after: float = 86400):
+        self.version = version
+        self.ttl = ttl if ttl and ttl > 0 else None
+        # Rows of other versions are kept this long, for processes of another
+        # release still using the same file (e.g. during a rolling restart)
+        self.stale_after = stale_after
+        self.memory = LRUCache(maxsize=maxsize, ttl=self.ttl)
+        self.db_path = db_path or None
+        self.db_hits = 0
+        self._db = None
+        self._lock = threading.Lock()
+        if self.db_path:
+            self._open_db()
+
+    def _open_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            primary_key = [row[1] for row in self._db.execute("PRAGMA table_info(diagnosis_cache)") if row[5]]
+            if primary_key == ["key"]:
+                # Written before rows were keyed per version; one version's
+                # row would replace another's
+                self._db.execute("DROP TABLE diagnosis_cache")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS diagnosis_cache ("
+                "key TEXT NOT NULL, version TEXT NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (key, version))"
+            )
+            # Other versions are never read here but left to whoever still
+            # serves them; everything only expires by age
+            now = time.time()
+            self._db.execute(
+                "DELETE FROM diagnosis_cache WHERE created_at < ? OR (version != ? AND created_at < ?)",
+                (now - self.ttl if self.ttl else 0, self.version, now - self.stale_after)
+            )
+
+    def reopen(self):
+        """
+        Open a new connection to the SQLite tier, e.g. in a worker forked
+        after the cache was created: a connection must not be used by two
+        processes.
+        """
+        if self.db_path:
+            with self._lock:
+                self._open_db()
+
+    def key_for(self, symptoms, followup_answers, extra_input="", age=None, gender=None, country=None) -> str:
+        return request_hash(canonical_request(symptoms, followup_answers, extra_input, age, gender, country))
+
+    def get(self, key: str):
+        response = self.memory.get(key)
+        if response is not None or self._db is None:
+            return response
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM diagnosis_cache WHERE key = ? AND version = ?",
+                (key, self.version)
+            ).fetchone()
+        if row is None or (self.ttl and row[1] < time.time() - self.ttl):
+            return None
+        self.db_hits += 1
+        self.memory.set(key, row[0])
+        return row[0]
+
+    def set(self, key: str, response: str):
+        self.memory.set(key, response)
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO diagnosis_cache (key, version, response, created_at) VALUES (?, ?, ?, ?)",
+                (key, self.version, response, time.time())
+            )
+            self._db.commit()
+
+    def clear(self):
+        self.memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM diagnosis_cache WHERE version = ?", (self.version,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        stats = {"version": self.version, "memory": self.memory.stats(), "sqlite": None}
+        if self._db is not None:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT COUNT(*) FROM diagnosis_cache WHERE version = ?", (self.version,)
+                ).fetchone()[0]
+            stats["sqlite"] = {"path": self.db_path, "rows": rows, "hits": self.db_hits}
+        return stats
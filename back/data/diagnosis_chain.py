@@ -0,0 +1,134 @@
+# back/data/diagnosis_chain.py
+
+from typing import List, Optional, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+try:
+    from .lru_cache import LRUCache
+    from .retrieval import SymptomAwareRetriever
+except ImportError:
+    from lru_cache import LRUCache
+    from retrieval import SymptomAwareRetriever
+
+# Same wording as the "stuff" prompt ConversationalRetrievalChain used, plus an
+# optional slot for the last few turns of the caller's own session
+DIAGNOSIS_SYSTEM_TEMPLATE = (
+    "Use the following pieces of context to answer the user's question. "
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer."
+    "\n----------------\n{context}{history}"
+)
+
+
+def format_docs(docs) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def format_history(turns: Optional[List[Tuple[str, str]]]) -> str:
+    if not turns:
+        return ""
+    lines = ["\n----------------\nEarlier in this session:"]
+    for question, answer in turns:
+        lines.append(f"Patient: {question}\nAssistant: {answer}")
+    return "\n".join(lines)
+
+
+def build_diagnosis_chain(llm, retriever, max_docs: int = 4, budget=None):
+    """
+    Stateless retrieve-then-answer chain. Every call retrieves for its own
+    `retrieval_query` and prompts with at most `max_docs` documents and the
+    `history` turns passed in, so the prompt size does not depend on how many
+    requests the process has served. A SymptomAwareRetriever also receives the
+    request's `symptoms` to narrow its search.
+
+    With a PromptBudget, inputs that carry `prompt_parts` have their question
+    rendered from them and trimmed, together with the documents, to the token
+    budget; the budget report is returned under "budget".
+
+    Input:  {"question": str, "retrieval_query": str, "symptoms": [str],
+             "history": [(question, answer), ...], "prompt_parts": PromptParts}
+    Output: the input plus "source_documents", "budget" and "answer"
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", DIAGNOSIS_SYSTEM_TEMPLATE),
+        ("human", "{question}"),
+    ])
+    def retrieval_kwargs(x):
+        if isinstance(retriever, SymptomAwareRetriever):
+            return {"symptoms": x.get("symptoms")}
+        return {}
+
+    def _retrieve(x, config):
+        return retriever.invoke(x["retrieval_query"], config, **retrieval_kwargs(x))[:max_docs]
+
+    async def _aretrieve(x, config):
+        return (await retriever.ainvoke(x["retrieval_query"], config, **retrieval_kwargs(x)))[:max_docs]
+
+    def fit_budget(x):
+        if budget is None or x.get("prompt_parts") is None:
+            return dict(x, budget=None)
+        wrapper = DIAGNOSIS_SYSTEM_TEMPLATE.format(context="", history=format_history(x.get("history")))
+        fitted = budget.fit(x["prompt_parts"], x["source_documents"], extra_tokens=budget.counter.count(wrapper))
+        return dict(x, question=fitted.question, source_documents=fitted.docs, budget=fitted.report)
+
+    retrieve = RunnableLambda(_retrieve, afunc=_aretrieve)
+    prompt_inputs = RunnableLambda(lambda x: {
+        "question": x["question"],
+        "context": format_docs(x["source_documents"]),
+        "history": format_history(x.get("history")),
+    })
+    return (
+        RunnablePassthrough.assign(source_documents=retrieve)
+        | RunnableLambda(fit_budget)
+        | RunnablePassthrough.assign(answer=prompt_inputs | prompt | llm | StrOutputParser())
+    )
+
+
+async def astream_answer(chain, inputs, config=None):
+    """
+    Run a diagnosis chain with astream. Yields ("token", text) for each piece
+    of the answer as the LLM writes it, then ("done", {"answer", "budget"}).
+    """
+    pieces, budget = [], None
+    async for chunk in chain.astream(inputs, config=config):
+        if "budget" in chunk:
+            budget = chunk["budget"]
+        text = chunk.get("answer")
+        if text:
+            pieces.append(text)
+            yield "token", text
+    yield "done", {"answer": "".join(pieces), "budget": budget}
+
+
+class SessionHistory:
+    """
+    Last `max_turns` diagnosis turns per session id, each clipped to
+    `max_chars`, in a bounded LRU/TTL cache. This is the only conversation
+    state of the diagnosis chain; requests without a session id have none.
+    """
+
+    def __init__(self, max_turns: int = 3, max_sessions: int = 1024, ttl: float = 3600, max_chars: int = 600):
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=ttl)
+
+    def turns(self, session_id: Optional[str]) -> List[Tuple[str, str]]:
+        if not session_id or self.max_turns <= 0:
+            return []
+        return list(self._sessions.get(session_id, ()))
+
+    def append(self, session_id: Optional[str], question: str, answer: str):
+        if not session_id or self.max_turns <= 0:
+            return
+        turn = (question[:self.max_chars], answer[:self.max_chars])
+        # Stored as an immutable tuple so readers never see a half-updated list
+        turns = tuple(self._sessions.get(session_id, ()))[-(self.max_turns - 1):] if self.max_turns > 1 else ()
+        self._sessions.set(session_id, turns + (turn,))
+
+    def clear(self, session_id: str):
+        self._sessions.pop(session_id)
+
+    def stats(self) -> dict:
+        return dict(self._sessions.stats(), max_turns=self.max_turns, max_chars=self.max_chars)
@@ -0,0 +1,24 @@
+# back/data/diagnosis_parser.py
+
+import re
+from typing import Dict, List
+
+# One numbered entry per match: "1. [Condition Name:] name [Reason: ...]",
+# with the reason either on the same line or on the next non-blank line.
+_CONDITION_RE = re.compile(
+    r"^[ \t]*\d+\.[ \t]*(?:Condition Name:[ \t]*)?(?P<name>[^\n]+?)"
+    r"(?:[ \t]*Reason:[ \t]*(?P<inline>[^\n]*?))?[ \t]*$"
+    r"(?:\n\s*Reason:[ \t]*(?P<reason>[^\n]*?)[ \t]*$)?",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def parse_conditions(response: str) -> List[Dict[str, str]]:
+    """
+    [{"name", "reason"}] for each numbered "Condition Name: ... / Reason: ..."
+    entry of a diagnosis, in a single pass over the text
+    """
+    return [
+        {"name": m.group("name").strip(), "reason": (m.group("inline") or m.group("reason") or "").strip()}
+        for m in _CONDITION_RE.finditer(response.replace("**", ""))
+    ]
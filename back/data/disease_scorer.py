@@ -0,0 +1,128 @@
+# back/data/disease_scorer.py
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class DiseaseScorer:
+    """
+    BM25 ranking of knowledge-base diseases for a set of canonical symptoms.
+
+    The disease x symptom incidence matrix is stored column-wise (one posting
+    array of disease rows and BM25 weights per symptom), so scoring a request
+    only touches the columns of the symptoms it mentions.
+    """
+
+    def __init__(self, df, synonym_map: Dict[str, str] = None, matcher=None, k1: float = 1.2, b: float = 0.75):
+        synonym_map = synonym_map or {}
+        self.diseases = []
+        self.rows = []
+        self.symptoms = []
+        index = {}
+        for row_idx, (disease, symptom_text) in enumerate(zip(df["Disease"], df["Symptoms"])):
+            if not isinstance(disease, str) or not isinstance(symptom_text, str):
+                continue
+            name = disease.strip().lower()
+            terms = {
+                synonym_map.get(term.strip().lower(), term.strip().lower())
+                for term in symptom_text.split(",") if term.strip()
+            }
+            if matcher is not None:
+                # Also pick up symptoms buried in free-text entries such as
+                # "Sometimes accompanied by a runny nose"
+                terms |= matcher.match(symptom_text.lower())
+            if name in index:
+                i = index[name]
+                self.symptoms[i] |= terms
+                self.rows[i].append(row_idx)
+            else:
+                index[name] = len(self.diseases)
+                self.diseases.append(name)
+                self.symptoms.append(terms)
+                self.rows.append([row_idx])
+        self._index = index
+
+        n = len(self.diseases)
+        doc_freq = {}
+        for terms in self.symptoms:
+            for term in terms:
+                doc_freq[term] = doc_freq.get(term, 0) + 1
+        avg_len = sum(len(terms) for terms in self.symptoms) / n if n else 0.0
+
+        postings = {}
+        for i, terms in enumerate(self.symptoms):
+            norm = k1 * (1 - b + b * len(terms) / avg_len) if avg_len else k1
+            for term in terms:
+                idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(i)
+                postings[term][1].append(idf * (k1 + 1) / (1 + norm))
+        self._postings = {
+            term: (np.array(rows, dtype=np.int32), np.array(weights, dtype=np.float32))
+            for term, (rows, weights) in postings.items()
+        }
+
+    def _query_terms(self, symptoms) -> List[str]:
+        terms = {s.strip().lower() for s in symptoms or [] if s and s.strip()}
+        return [term for term in terms if term in self._postings]
+
+    def scores(self, symptoms) -> np.ndarray:
+        scores = np.zeros(len(self.diseases), dtype=np.float32)
+        for term in self._query_terms(symptoms):
+            rows, weights = self._postings[term]
+            scores[rows] += weights
+        return scores
+
+    def rank(self, symptoms, k: int = 5) -> List[Tuple[str, float, List[str]]]:
+        """
+        Top-k (disease, score, matched symptoms) with a positive score
+        """
+        terms = self._query_terms(symptoms)
+        scores = self.scores(terms)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (self.diseases[i], float(scores[i]), sorted(t for t in terms if t in self.symptoms[i]))
+            for i in top if scores[i] > 0
+        ]
+
+    def rows_of(self, disease: str) -> List[int]:
+        """
+        CSV row indices of a disease (several when the CSV repeats its name)
+        """
+        return self.rows[self._index[disease]]
+
+    def candidate_diseases(self, symptoms) -> List[str]:
+        """
+        Every disease that lists at least one of the symptoms
+        """
+        rows = set()
+        for term in self._query_terms(symptoms):
+            rows.update(self._postings[term][0].tolist())
+        return [self.diseases[i] for i in sorted(rows)]
+
+    def confident_top2(self, symptoms, lead_margin: float = 0.15, third_margin: float = 0.3,
+                       min_matches: int = 2) -> Optional[List[Tuple[str, float, List[str]]]]:
+        """
+        The top-2 diseases if they clearly stand out, otherwise None:
+        - the leader explains at least `min_matches` symptoms,
+        - the leader beats the runner-up by at least `lead_margin` of its own
+          score, so the order of the two is not a coin toss,
+        - the runner-up beats the third-ranked disease by at least
+          `third_margin` of its own score, so the pair is not one of many.
+        """
+        ranked = self.rank(symptoms, k=3)
+        if len(ranked) < 2 or len(ranked[0][2]) < min_matches:
+            return None
+        first, second = ranked[0][1], ranked[1][1]
+        third = ranked[2][1] if len(ranked) > 2 else 0.0
+        if first <= 0 or second <= 0:
+            return None
+        if (first - second) / first < lead_margin or (second - third) / second < third_margin:
+            return None
+        return ranked[:2]
@@ -0,0 +1,102 @@
+# back/data/embedding_backend.py
+
+import os
+
+from langchain_core.embeddings import Embeddings
+
+# torch: sentence-transformers on PyTorch, full precision (the original setup)
+# onnx: the model's ONNX export on ONNX Runtime, same weights, float32
+# onnx-int8: dynamically quantized int8 ONNX export, smaller and faster on CPU
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Read when the model is loaded, like llm_backend, so a .env loaded by the
+# importing module still applies; worker processes inherit them too.
+#   EMBEDDING_BACKEND            one of EMBEDDING_BACKENDS (default torch)
+#   EMBEDDING_ONNX_FILE          export to load for onnx-int8, relative to the
+#                                model repo (default onnx/model_quint8_avx2.onnx,
+#                                which runs on any AVX2 CPU; use
+#                                onnx/model_qint8_arm64.onnx on ARM)
+#   EMBEDDING_INTRA_OP_THREADS   threads used inside one operator (0 = library default)
+#   EMBEDDING_INTER_OP_THREADS   operators run in parallel (0 = library default)
+DEFAULT_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def embedding_backend() -> str:
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"❌ EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}, got '{backend}'.")
+    return backend
+
+
+def embedding_id(model: str) -> str:
+    """
+    Identifies the vector space a backend produces. The float32 ONNX export
+    matches PyTorch, so indexes built with either stay valid; int8 vectors
+    differ slightly and are kept apart in indexes and caches.
+    """
+    return f"{model}+int8" if embedding_backend() == "onnx-int8" else model
+
+
+def _thread_settings():
+    return (
+        int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0")),
+        int(os.getenv("EMBEDDING_INTER_OP_THREADS", "0")),
+    )
+
+
+def _onnx_session_options(intra: int, inter: int):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if intra:
+        options.intra_op_num_threads = intra
+    if inter:
+        options.inter_op_num_threads = inter
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    return options
+
+
+def apply_thread_settings():
+    """
+    Apply the configured PyTorch thread counts to this process, e.g. in a
+    worker forked after the model was loaded. The ONNX backends take theirs
+    from the session options when the model is created.
+    """
+    if embedding_backend() == "torch":
+        _set_torch_threads(*_thread_settings())
+
+
+def _set_torch_threads(intra: int, inter: int):
+    import torch
+    if intra:
+        torch.set_num_threads(intra)
+    if inter:
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError:
+            # Only allowed before the first parallel operation in the process
+            print(f"⚠️ Could not set {inter} inter-op threads; PyTorch has already started its pool")
+
+
+def create_embeddings(model: str) -> Embeddings:
+    """
+    Sentence-transformers embeddings for `model` on the configured
+    EMBEDDING_BACKEND and thread settings. The ONNX backends need
+    `sentence-transformers[onnx]`; the exports are fetched from the model's
+    Hugging Face repo.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    backend = embedding_backend()
+    intra, inter = _thread_settings()
+    if backend == "torch":
+        _set_torch_threads(intra, inter)
+        return HuggingFaceEmbeddings(model_name=model)
+
+    onnx_kwargs = {
+        "provider": "CPUExecutionProvider",
+        "session_options": _onnx_session_options(intra, inter),
+    }
+    if backend == "onnx-int8":
+        onnx_kwargs["file_name"] = os.getenv("EMBEDDING_ONNX_FILE", DEFAULT_INT8_FILE)
+    print(f"⚙️ Using the {backend} embedding backend (threads: intra {intra or 'auto'}, inter {inter or 'auto'})")
+    return HuggingFaceEmbeddings(model_name=model, model_kwargs={"backend": "onnx", "model_kwargs": onnx_kwargs})
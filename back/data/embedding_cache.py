@@ -0,0 +1,228 @@
+# back/data/embedding_cache.py
+
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Hex SHA-1 of the model name and text, stored next to each vector
+_KEY_DTYPE = "S40"
+
+
+def saved_seconds(hits: int, misses: int, miss_seconds: float, hit_seconds: float) -> float:
+    """
+    Time a cache saved: every hit would otherwise have cost an average miss
+    """
+    if not misses:
+        return 0.0
+    return max(0.0, hits * miss_seconds / misses - hit_seconds)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that keeps vectors keyed by a hash of the text in a
+    memory-mapped .npy file, so they survive restarts and cost no heap.
+
+    The file holds `capacity` float32 slots; a second .npy holds the key of
+    each slot and a third when it was last used. All three are shared by
+    every process using the same path (e.g. the workers forked from a
+    preloading master): a vector one worker stores is a hit in the others.
+    Slots are allocated under an exclusive lock on `<path>.lock`, empty slots
+    first, then the least recently used one. The key is re-checked around
+    every read, so a slot reused by another process while it was read is
+    treated as a miss.
+    """
+
+    def __init__(self, inner: Embeddings, path: str, capacity: int = 4096, namespace: str = ""):
+        self.inner = inner
+        self.path = path
+        self.capacity = capacity
+        self.namespace = namespace
+        base = os.path.splitext(path)[0]
+        self._keys_path = base + ".keys.npy"
+        self._used_path = base + ".used.npy"
+        self._lock_path = path + ".lock"
+        self._vectors = None
+        self._keys = None
+        self._used = None
+        # Last known slot of each key; only a hint, the keys file decides
+        self._slots = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        if capacity > 0 and os.path.exists(path):
+            with self._lock, self._file_lock():
+                self._open()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.namespace}\x00{text}".encode("utf-8")).hexdigest().encode("ascii")
+
+    @contextmanager
+    def _file_lock(self):
+        # Opened per call: a descriptor inherited across fork would share
+        # its lock with the parent instead of excluding it
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open(self, dim: int = None) -> bool:
+        """
+        Map the cache files, (re)creating them for vectors of `dim` when they
+        are missing or sized for another capacity or model. Called under the
+        file lock.
+        """
+        paths = (self.path, self._keys_path, self._used_path)
+        if all(os.path.exists(p) for p in paths):
+            vectors, keys, used = (np.load(p, mmap_mode="r+") for p in paths)
+            if (len(vectors) == len(keys) == len(used) == self.capacity
+                    and (dim is None or vectors.shape[1] == dim)):
+                self._vectors, self._keys, self._used = vectors, keys, used
+                self._slots.clear()
+                return True
+            dim = dim or vectors.shape[1]
+        if dim is None:
+            return False
+        # Written aside and swapped in, so processes still mapping the old
+        # files never see them truncated
+        for path, dtype, shape in (
+            (self.path, np.float32, (self.capacity, dim)),
+            (self._keys_path, _KEY_DTYPE, (self.capacity,)),
+            (self._used_path, np.float64, (self.capacity,)),
+        ):
+            np.lib.format.open_memmap(path + ".tmp.npy", mode="w+", dtype=dtype, shape=shape).flush()
+            os.replace(path + ".tmp.npy", path)
+        return self._open()
+
+    def _find(self, key: bytes) -> Optional[int]:
+        slot = self._slots.get(key)
+        if slot is not None and self._keys[slot] == key:
+            return slot
+        # Not stored by this process, or moved: another one may have it
+        matches = np.flatnonzero(self._keys == key)
+        if len(matches):
+            self._slots[key] = slot = int(matches[0])
+            return slot
+        self._slots.pop(key, None)
+        return None
+
+    def _lookup(self, keys: List[bytes]) -> List[Optional[List[float]]]:
+        found = []
+        with self._lock:
+            if self._keys is None:
+                return [None] * len(keys)
+            now = time.time()
+            for key in keys:
+                slot = self._find(key)
+                vector = self._vectors[slot].tolist() if slot is not None else None
+                if vector is None or self._keys[slot] != key:
+                    found.append(None)
+                    continue
+                self._used[slot] = now
+                found.append(vector)
+        return found
+
+    def _store(self, keys: List[bytes], vectors: List[List[float]]):
+        with self._lock, self._file_lock():
+            if self._vectors is None or self._vectors.shape[1] != len(vectors[0]):
+                self._open(len(vectors[0]))
+            now = time.time()
+            for key, vector in zip(keys, vectors):
+                slot = self._find(key)
+                if slot is None:
+                    free = np.flatnonzero(self._keys == b"")
+                    if len(free):
+                        slot = int(free[0])
+                    else:
+                        slot = int(np.argmin(self._used))
+                        self._slots.pop(bytes(self._keys[slot]), None)
+                        self.evictions += 1
+                # Vector first, so a reader never sees the key with stale data
+                self._keys[slot] = b""
+                self._vectors[slot] = vector
+                self._keys[slot] = key
+                self._used[slot] = now
+                self._slots[key] = slot
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.capacity <= 0:
+            return self.inner.embed_documents(texts)
+        start = time.perf_counter()
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(keys)
+        pending = [i for i, vector in enumerate(vectors) if vector is None]
+        hit_time = time.perf_counter() - start
+        if pending:
+            start = time.perf_counter()
+            computed = self.inner.embed_documents([texts[i] for i in pending])
+            self._store([keys[i] for i in pending], computed)
+            for i, vector in zip(pending, computed):
+                vectors[i] = vector
+            miss_time = time.perf_counter() - start
+        else:
+            miss_time = 0.0
+        with self._lock:
+            self.hits += len(texts) - len(pending)
+            self.misses += len(pending)
+            self.hit_seconds += hit_time
+            self.miss_seconds += miss_time
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.capacity <= 0:
+            return self.inner.embed_query(text)
+        start = time.perf_counter()
+        key = self._key(text)
+        vector = self._lookup([key])[0]
+        if vector is not None:
+            with self._lock:
+                self.hits += 1
+                self.hit_seconds += time.perf_counter() - start
+            return vector
+        start = time.perf_counter()
+        vector = self.inner.embed_query(text)
+        self._store([key], [vector])
+        with self._lock:
+            self.misses += 1
+            self.miss_seconds += time.perf_counter() - start
+        return vector
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._keys.flush()
+                self._used.flush()
+
+    def clear(self):
+        with self._lock, self._file_lock():
+            self._slots.clear()
+            if self._keys is not None:
+                self._keys[:] = b""
+                self._used[:] = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "size": int(np.count_nonzero(self._keys != b"")) if self._keys is not None else 0,
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_s": round(saved_seconds(self.hits, self.misses, self.miss_seconds, self.hit_seconds), 3),
+            }
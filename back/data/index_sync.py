@@ -0,0 +1,209 @@
+# back/data/index_sync.py
+#
+# Keeps a Chroma index in step with medical_knowledge_clean.csv. Every CSV
+# row is stored under an ID derived from a hash of its text, so a sync only
+# embeds rows that are new or changed, deletes the vectors of rows that are
+# gone, and just rewrites the `row` metadata of rows that moved.
+#
+#   python index_sync.py                  # the backend's index (CHROMA_INDEX_DIR)
+#   python index_sync.py --dry-run        # report what would change
+#   python index_sync.py --index /srv/rag_index --workers 4 --batch-size 32
+
+import argparse
+import hashlib
+import os
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from langchain_community.document_loaders import CSVLoader
+
+try:
+    from .embedding_backend import create_embeddings, embedding_id
+except ImportError:
+    from embedding_backend import create_embeddings, embedding_id
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "medical_knowledge_clean.csv")
+# The index the backend serves from; built locally and not kept in git
+INDEX_DIR = os.getenv("CHROMA_INDEX_DIR", os.path.join(BASE_DIR, "cache", "rag_index"))
+EMBED_MODEL = "all-MiniLM-L6-v2"
+# Name langchain_chroma gives the collection when none is passed
+COLLECTION_NAME = "langchain"
+
+SyncPlan = namedtuple("SyncPlan", ["embed", "reuse", "move", "delete", "unchanged"])
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_rows(csv_path: str):
+    """
+    CSV rows as (id, text, metadata), formatted exactly like CSVLoader does.
+    Identical rows get "-1", "-2", ... suffixes so every row keeps its own ID.
+    """
+    seen = Counter()
+    rows = []
+    for doc in CSVLoader(file_path=csv_path).load():
+        digest = content_hash(doc.page_content)
+        doc_id = f"{digest}-{seen[digest]}" if seen[digest] else digest
+        seen[digest] += 1
+        metadata = {"source": os.path.basename(csv_path), "row": doc.metadata["row"], "content_hash": digest}
+        rows.append((doc_id, doc.page_content, metadata))
+    return rows
+
+
+def plan_sync(collection, rows, tag: str) -> SyncPlan:
+    """
+    Compare the CSV rows with what the collection holds. `tag` is the
+    embedding_id of the current model and backend; vectors with another tag
+    are re-embedded. Vectors stored under another ID (older UUID-keyed
+    indexes) are reused when their text is identical and the tag matches;
+    entries without an `embedding` field predate this tool and were built
+    with EMBED_MODEL on PyTorch.
+    """
+    stored = collection.get(include=["metadatas", "documents"])
+    existing = {}
+    reusable = {}
+    for doc_id, metadata, text in zip(stored["ids"], stored["metadatas"], stored["documents"]):
+        metadata = metadata or {}
+        existing[doc_id] = metadata
+        if metadata.get("embedding", EMBED_MODEL) == tag:
+            reusable.setdefault(content_hash(text or ""), doc_id)
+
+    embed, reuse, move, unchanged = [], [], [], []
+    wanted = set()
+    for doc_id, text, metadata in rows:
+        wanted.add(doc_id)
+        current = existing.get(doc_id)
+        if current is not None and current.get("embedding") == tag:
+            if current.get("row") == metadata["row"] and current.get("source") == metadata["source"]:
+                unchanged.append(doc_id)
+            else:
+                move.append((doc_id, metadata))
+        elif metadata["content_hash"] in reusable:
+            reuse.append((doc_id, text, metadata, reusable[metadata["content_hash"]]))
+        else:
+            embed.append((doc_id, text, metadata))
+    delete = [doc_id for doc_id in existing if doc_id not in wanted]
+    return SyncPlan(embed, reuse, move, delete, unchanged)
+
+
+_worker_embeddings = None
+
+
+def _init_worker(model: str):
+    global _worker_embeddings
+    _worker_embeddings = create_embeddings(model)
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+def _batches(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def embed_texts(texts: List[str], model: str, embeddings=None, workers: int = 1, batch_size: int = 64):
+    """
+    Embed `texts` in batches, spread over `workers` processes that each load
+    the model once on the configured EMBEDDING_BACKEND. An `embeddings`
+    object is used in-process instead.
+    """
+    batches = _batches(texts, batch_size)
+    if embeddings is not None or workers <= 1 or len(batches) <= 1:
+        if embeddings is None:
+            _init_worker(model)
+            embeddings = _worker_embeddings
+        return [vector for batch in batches for vector in embeddings.embed_documents(batch)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model,)) as pool:
+        return [vector for result in pool.map(_embed_batch, batches) for vector in result]
+
+
+def sync_index(collection, csv_path: str = DATA_PATH, model: str = EMBED_MODEL, embeddings=None,
+               workers: int = 1, batch_size: int = 64, dry_run: bool = False) -> dict:
+    """
+    Bring `collection` (a chromadb Collection) in line with `csv_path`.
+    Returns how many rows were embedded, reused, moved, deleted and left as is.
+    """
+    start = time.perf_counter()
+    rows = load_rows(csv_path)
+    tag = embedding_id(model)
+    plan = plan_sync(collection, rows, tag)
+    report = {
+        "rows": len(rows),
+        "embedded": len(plan.embed),
+        "reused": len(plan.reuse),
+        "moved": len(plan.move),
+        "deleted": len(plan.delete),
+        "unchanged": len(plan.unchanged),
+    }
+    if dry_run:
+        return report
+
+    if plan.reuse:
+        source_ids = sorted({old_id for _, _, _, old_id in plan.reuse})
+        stored = collection.get(ids=source_ids, include=["embeddings"])
+        vectors = dict(zip(stored["ids"], stored["embeddings"]))
+        for batch in _batches(plan.reuse, batch_size):
+            collection.upsert(
+                ids=[doc_id for doc_id, _, _, _ in batch],
+                embeddings=[vectors[old_id] for _, _, _, old_id in batch],
+                documents=[text for _, text, _, _ in batch],
+                metadatas=[dict(metadata, embedding=tag) for _, _, metadata, _ in batch],
+            )
+
+    if plan.embed:
+        vectors = embed_texts([text for _, text, _ in plan.embed], model, embeddings, workers, batch_size)
+        for batch in _batches(list(zip(plan.embed, vectors)), batch_size):
+            collection.upsert(
+                ids=[doc_id for (doc_id, _, _), _ in batch],
+                embeddings=[vector for _, vector in batch],
+                documents=[text for (_, text, _), _ in batch],
+                metadatas=[dict(metadata, embedding=tag) for (_, _, metadata), _ in batch],
+            )
+
+    for batch in _batches(plan.move, batch_size):
+        collection.update(
+            ids=[doc_id for doc_id, _ in batch],
+            metadatas=[dict(metadata, embedding=tag) for _, metadata in batch],
+        )
+
+    # Last, so a sync that fails halfway never leaves rows without a vector
+    for batch in _batches(plan.delete, batch_size):
+        collection.delete(ids=batch)
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def open_collection(persist_dir: str):
+    import chromadb
+    client = chromadb.PersistentClient(path=persist_dir)
+    return client.get_or_create_collection(COLLECTION_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync the Chroma RAG index with the knowledge CSV")
+    parser.add_argument("--index", action="append", help="Chroma directory (repeatable); default: CHROMA_INDEX_DIR")
+    parser.add_argument("--csv", default=DATA_PATH)
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    for persist_dir in args.index or [INDEX_DIR]:
+        persist_dir = os.path.normpath(persist_dir)
+        report = sync_index(
+            open_collection(persist_dir), args.csv, args.model,
+            workers=args.workers, batch_size=args.batch_size, dry_run=args.dry_run
+        )
+        print(f"{'🔍' if args.dry_run else '✅'} {persist_dir}: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# back/data/llm_backend.py
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# gemini: Google Gemini through langchain-google-genai (needs GOOGLE_API_KEY)
+# fake: deterministic local stand-in for offline load and latency testing
+LLM_BACKENDS = ("gemini", "fake")
+
+# The settings are read when a model is created rather than at import, so a
+# .env loaded by the importing module still applies.
+#   LLM_BACKEND          one of LLM_BACKENDS (default gemini)
+#   FAKE_LLM_LATENCY     fixed | uniform (mean +/- jitter) | lognormal (median mean,
+#                        jitter as spread), for the time before the first token
+#   FAKE_LLM_LATENCY_MS, FAKE_LLM_JITTER_MS, FAKE_LLM_TOKEN_MS (delay per streamed token)
+#   FAKE_LLM_ERROR_RATE  share of calls that raise, to exercise retries and fallbacks
+
+
+def llm_backend() -> str:
+    backend = os.getenv("LLM_BACKEND", "gemini")
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"❌ LLM_BACKEND must be one of {LLM_BACKENDS}, got '{backend}'.")
+    return backend
+
+
+_DISEASE_RE = re.compile(r"^Disease:\s*(.+)$", re.MULTILINE)
+_DEFAULT_CONDITIONS = ["common cold", "influenza"]
+_TOKEN_RE = re.compile(r"\S+\s*")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model with Gemini-like timing. Answers are a pure function of
+    the prompt: diagnosis prompts get a "Condition Name / Reason" pair built
+    from the retrieved "Disease:" lines, anything else a short canned reply.
+    The latency of a call is drawn from the configured distribution, seeded
+    with the prompt, so runs are reproducible.
+    """
+
+    latency: str = "lognormal"
+    latency_ms: float = 800.0
+    jitter_ms: float = 300.0
+    token_ms: float = 15.0
+    error_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _prompt(self, messages: List[BaseMessage]) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _rng(self, prompt: str) -> random.Random:
+        return random.Random(hashlib.sha1(prompt.encode("utf-8")).hexdigest())
+
+    def _delay(self, rng: random.Random) -> float:
+        if self.latency == "fixed":
+            ms = self.latency_ms
+        elif self.latency == "uniform":
+            ms = rng.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+        else:
+            sigma = self.jitter_ms / self.latency_ms if self.latency_ms else 0.0
+            ms = self.latency_ms * rng.lognormvariate(0, sigma)
+        return max(0.0, ms) / 1000
+
+    def _answer(self, prompt: str, rng: random.Random) -> str:
+        # Not seeded, so a retry of the same prompt can succeed
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Fake LLM error (FAKE_LLM_ERROR_RATE)")
+        if "Condition Name" not in prompt:
+            return "Thanks for the details. Rest, stay hydrated and see a doctor if your symptoms get worse."
+        conditions = []
+        for name in _DISEASE_RE.findall(prompt) + _DEFAULT_CONDITIONS:
+            name = name.strip().lower()
+            if name not in conditions:
+                conditions.append(name)
+        return "\n".join(
+            f"{i}. Condition Name: {name}\nReason: The reported symptoms are typical of {name}."
+            for i, name in enumerate(conditions[:2], 1)
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        rng = self._rng(prompt)
+        time.sleep(self._delay(rng))
+        answer = self._answer(prompt, rng)
+        time.sleep(self.token_ms / 1000 * len(_TOKEN_RE.findall(answer)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        rng = self._rng(prompt)
+        await asyncio.sleep(self._delay(rng))
+        answer = self._answer(prompt, rng)
+        await asyncio.sleep(self.token_ms / 1000 * len(_TOKEN_RE.findall(answer)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        rng = self._rng(prompt)
+        time.sleep(self._delay(rng))
+        for token in _TOKEN_RE.findall(self._answer(prompt, rng)):
+            time.sleep(self.token_ms / 1000)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        rng = self._rng(prompt)
+        await asyncio.sleep(self._delay(rng))
+        for token in _TOKEN_RE.findall(self._answer(prompt, rng)):
+            await asyncio.sleep(self.token_ms / 1000)
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def create_chat_model(model: str, timeout: float = None, max_retries: int = 0) -> BaseChatModel:
+    """
+    Chat model of the configured LLM_BACKEND. Only the gemini backend needs
+    GOOGLE_API_KEY.
+    """
+    if llm_backend() == "fake":
+        fake = FakeChatModel(
+            latency=os.getenv("FAKE_LLM_LATENCY", "lognormal"),
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "800")),
+            jitter_ms=float(os.getenv("FAKE_LLM_JITTER_MS", "300")),
+            token_ms=float(os.getenv("FAKE_LLM_TOKEN_MS", "15")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+        )
+        print(f"🧪 Using the fake LLM backend ({fake.latency}, ~{fake.latency_ms:g} ms per call)")
+        return fake
+
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        raise ValueError("❌ Please set your GOOGLE_API_KEY environment variable in a .env file.")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, google_api_key=google_api_key, timeout=timeout, max_retries=max_retries)
@@ -0,0 +1,279 @@
+# back/data/numpy_store.py
+
+import fcntl
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+_VECTORS_FILE = "vectors.npy"
+_RECORDS_FILE = "records.json"
+_LOCK_FILE = ".lock"
+
+_COMPARISONS = {
+    "$eq": lambda column, value: column == value,
+    "$ne": lambda column, value: column != value,
+    "$gt": lambda column, value: column > value,
+    "$gte": lambda column, value: column >= value,
+    "$lt": lambda column, value: column < value,
+    "$lte": lambda column, value: column <= value,
+    "$in": lambda column, value: np.isin(column, list(value)),
+    "$nin": lambda column, value: ~np.isin(column, list(value)),
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine-similarity search over an in-process matrix, for knowledge
+    bases small enough that one matrix-vector product beats an ANN index.
+
+    Normalized embeddings live in `persist_dir/vectors.npy`, opened
+    memory-mapped, and ids, texts and metadata in `records.json`. Filters
+    use Chroma's syntax ({"row": {"$in": [...]}}, $eq/$ne/$gt/$gte/$lt/$lte/
+    $in/$nin, $and/$or) and are evaluated on per-key metadata columns.
+
+    get/upsert/update/delete mirror the chromadb Collection calls that
+    index_sync uses, so the same sync keeps either backend up to date.
+    Writes rewrite both files, which is fine at a few thousand rows. Several
+    processes may share `persist_dir` (e.g. uvicorn workers that each run
+    the startup sync): saves and loads hold an flock on `persist_dir/.lock`,
+    so the two files are always written and read as a pair.
+    """
+
+    def __init__(self, persist_dir: str, embedding: Embeddings):
+        self.persist_dir = persist_dir
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # -------------------- Storage --------------------
+    @contextmanager
+    def _file_lock(self):
+        # Opened per call: a descriptor inherited across fork would share
+        # its lock with the parent instead of excluding it
+        os.makedirs(self.persist_dir, exist_ok=True)
+        with open(os.path.join(self.persist_dir, _LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        vectors_path = os.path.join(self.persist_dir, _VECTORS_FILE)
+        records_path = os.path.join(self.persist_dir, _RECORDS_FILE)
+        if not (os.path.exists(vectors_path) and os.path.exists(records_path)):
+            return
+        with self._file_lock():
+            with open(records_path, encoding="utf-8") as f:
+                records = json.load(f)
+            vectors = np.load(vectors_path, mmap_mode="r")
+        self._set(records["ids"], records["texts"], records["metadatas"], vectors)
+
+    def _set(self, ids, texts, metadatas, vectors):
+        self._ids, self._texts, self._metadatas, self._vectors = list(ids), list(texts), list(metadatas), vectors
+        self._positions = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        self._columns = {}
+
+    def _save(self, ids, texts, metadatas, vectors):
+        """
+        Write both files and re-open the matrix memory-mapped. Each file is
+        replaced atomically; readers holding the old mapping keep a consistent
+        view until they re-open.
+        """
+        vectors_path = os.path.join(self.persist_dir, _VECTORS_FILE)
+        records_path = os.path.join(self.persist_dir, _RECORDS_FILE)
+        with self._file_lock():
+            np.save(vectors_path + ".tmp.npy", np.asarray(vectors, dtype=np.float32))
+            os.replace(vectors_path + ".tmp.npy", vectors_path)
+            with open(records_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": list(ids), "texts": list(texts), "metadatas": list(metadatas)}, f, ensure_ascii=False)
+            os.replace(records_path + ".tmp", records_path)
+            mapped = np.load(vectors_path, mmap_mode="r")
+        self._set(ids, texts, metadatas, mapped)
+
+    def __len__(self):
+        return len(self._ids)
+
+    # -------------------- Filters --------------------
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            values = [metadata.get(key) for metadata in self._metadatas]
+            if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                column = np.asarray(values, dtype=np.float64)
+            else:
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+            self._columns[key] = column
+        return column
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._mask(clause)
+            elif key == "$or":
+                either = np.zeros(len(self._ids), dtype=bool)
+                for clause in condition:
+                    either |= self._mask(clause)
+                mask &= either
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    if op not in _COMPARISONS:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+                    mask &= _COMPARISONS[op](self._column(key), value)
+            else:
+                mask &= self._column(key) == condition
+        return mask
+
+    # -------------------- Search --------------------
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        # Writes swap in new lists and a new matrix rather than mutating them,
+        # so the product itself runs outside the lock
+        with self._lock:
+            vectors, ids, texts, metadatas = self._vectors, self._ids, self._texts, self._metadatas
+            candidates = np.flatnonzero(self._mask(filter)) if filter and ids else None
+        if not ids or k <= 0:
+            return []
+        query = _normalize(np.asarray([embedding], dtype=np.float32))[0]
+        scores = vectors[candidates] @ query if candidates is not None else vectors @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = candidates[top] if candidates is not None else top
+        return [
+            (Document(id=ids[i], page_content=texts[i], metadata=dict(metadatas[i])), float(scores[j]))
+            for i, j in zip(positions.tolist(), top.tolist())
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity of normalized vectors, mapped from [-1, 1] to [0, 1]
+        return lambda score: min(1.0, max(0.0, (score + 1.0) / 2.0))
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            positions = [self._positions[i] for i in ids if i in self._positions]
+            return [
+                Document(id=self._ids[i], page_content=self._texts[i], metadata=dict(self._metadatas[i]))
+                for i in positions
+            ]
+
+    # -------------------- Writes --------------------
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]):
+        with self._lock:
+            all_ids, texts, all_metadatas = list(self._ids), list(self._texts), list(self._metadatas)
+            new = _normalize(np.asarray(embeddings, dtype=np.float32))
+            rows = [np.asarray(self._vectors)] if len(self._ids) else []
+            appended = []
+            replaced = {}
+            for doc_id, vector, text, metadata in zip(ids, new, documents, metadatas):
+                i = self._positions.get(doc_id)
+                if i is None:
+                    all_ids.append(doc_id)
+                    texts.append(text)
+                    all_metadatas.append(dict(metadata or {}))
+                    appended.append(vector)
+                else:
+                    texts[i] = text
+                    all_metadatas[i] = dict(metadata or {})
+                    replaced[i] = vector
+            if appended:
+                rows.append(np.asarray(appended, dtype=np.float32))
+            vectors = np.concatenate(rows) if rows else np.zeros((0, new.shape[1]), dtype=np.float32)
+            if replaced:
+                vectors = np.array(vectors)
+                for i, vector in replaced.items():
+                    vectors[i] = vector
+            self._save(all_ids, texts, all_metadatas, vectors)
+
+    def update(self, ids: List[str], metadatas: List[dict]):
+        with self._lock:
+            all_metadatas = list(self._metadatas)
+            for doc_id, metadata in zip(ids, metadatas):
+                i = self._positions.get(doc_id)
+                if i is not None:
+                    all_metadatas[i] = dict(metadata)
+            self._save(self._ids, self._texts, all_metadatas, self._vectors)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            drop = {self._positions[i] for i in ids or [] if i in self._positions}
+            if not drop:
+                return True
+            keep = [i for i in range(len(self._ids)) if i not in drop]
+            self._save(
+                [self._ids[i] for i in keep],
+                [self._texts[i] for i in keep],
+                [self._metadatas[i] for i in keep],
+                np.asarray(self._vectors)[keep],
+            )
+            return True
+
+    def get(self, ids: Optional[List[str]] = None, include: Sequence[str] = ("metadatas", "documents")) -> dict:
+        with self._lock:
+            positions = range(len(self._ids)) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+            result = {"ids": [self._ids[i] for i in positions]}
+            if "documents" in include:
+                result["documents"] = [self._texts[i] for i in positions]
+            if "metadatas" in include:
+                result["metadatas"] = [dict(self._metadatas[i]) for i in positions]
+            if "embeddings" in include:
+                result["embeddings"] = [self._vectors[i].tolist() for i in positions]
+            return result
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.upsert(ids, self._embedding.embed_documents(texts), texts, metadatas)
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, persist_dir: str = "numpy_index", **kwargs: Any
+                   ) -> "NumpyVectorStore":
+        store = cls(persist_dir, embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -0,0 +1,217 @@
+# back/data/resilience.py
+
+import asyncio
+import random
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The upstream is considered down; the call was not attempted"""
+
+
+class DeadlineExceeded(Exception):
+    """No time left within the caller's deadline"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` failures in
+    a row the circuit opens and calls are refused for `reset_timeout` seconds;
+    then a single trial call is let through (half-open) and its outcome closes
+    or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.successes_total = 0
+        self.failures_total = 0
+        self.rejected_total = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_running = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected_total += 1
+            return False
+
+    def release(self):
+        """
+        The call was abandoned (e.g. the client went away) without an outcome
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.successes_total += 1
+            self.failures = 0
+            self.state = CLOSED
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures_total += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial_running = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_in": retry_in,
+                "successes": self.successes_total,
+                "failures": self.failures_total,
+                "rejected": self.rejected_total,
+                "times_opened": self.times_opened,
+            }
+
+
+class Resilience:
+    """
+    Deadline, bounded retries with full jitter and a circuit breaker around
+    one upstream. `deadline` bounds the whole call including retries; every
+    failed or timed-out attempt counts against the breaker.
+    """
+
+    def __init__(self, name: str, deadline: float = 20.0, retries: int = 1, backoff: float = 0.5,
+                 max_backoff: float = 4.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.timeouts = 0
+        self.retried = 0
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def acall(self, fn, *args, **kwargs):
+        """
+        Await `fn(*args, **kwargs)`. Raises CircuitOpenError without calling
+        when the circuit is open, otherwise the last error once the retries or
+        the deadline are used up.
+        """
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            remaining = end - time.monotonic()
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout=remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.breaker.record_failure()
+                raise DeadlineExceeded(f"{self.name} exceeded its {self.deadline:g}s deadline")
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                delay = self._delay(attempt)
+                if attempt == self.retries or time.monotonic() + delay >= end:
+                    raise
+                self.retried += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Blocking version of acall. A running attempt cannot be interrupted, so
+        the deadline is only enforced between attempts; give the client its
+        own request timeout as well.
+        """
+        end = time.monotonic() + self.deadline
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                self.breaker.record_failure()
+                delay = self._delay(attempt)
+                if attempt == self.retries or time.monotonic() + delay >= end:
+                    raise
+                self.retried += 1
+                time.sleep(delay)
+                continue
+            if time.monotonic() > end:
+                # Too late to be useful; still count it as a slow upstream
+                self.timeouts += 1
+                self.breaker.record_failure()
+                raise DeadlineExceeded(f"{self.name} exceeded its {self.deadline:g}s deadline")
+            self.breaker.record_success()
+            return result
+
+    async def astream(self, agen):
+        """
+        Re-yield an async iterator, with the deadline applied to the whole
+        stream. There are no retries once items have been produced.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        end = time.monotonic() + self.deadline
+        iterator = agen.__aiter__()
+        finished = False
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), timeout=end - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                yield item
+            finished = True
+        except asyncio.TimeoutError:
+            finished = True
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise DeadlineExceeded(f"{self.name} exceeded its {self.deadline:g}s deadline")
+        except Exception:
+            finished = True
+            self.breaker.record_failure()
+            raise
+        finally:
+            if not finished:
+                # The consumer stopped reading or was cancelled
+                self.breaker.release()
+        self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return dict(
+            self.breaker.stats(),
+            deadline=self.deadline,
+            retries=self.retries,
+            retried=self.retried,
+            timeouts=self.timeouts,
+        )
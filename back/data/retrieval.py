@@ -0,0 +1,190 @@
+# back/data/retrieval.py
+
+import threading
+import time
+from typing import Any, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+try:
+    from .embedding_cache import saved_seconds
+    from .lru_cache import LRUCache
+except ImportError:
+    from embedding_cache import saved_seconds
+    from lru_cache import LRUCache
+
+# Knowledge-base columns the diagnosis prompt actually uses; treatments and
+# risk factors are looked up from condition_database after the diagnosis
+DEFAULT_FIELDS = ("Disease", "Symptoms", "Description")
+
+
+def trim_fields(doc: Document, fields: Sequence[str]) -> Document:
+    """
+    Keep only the "Field: value" lines of a CSVLoader document named in `fields`
+    """
+    if not fields:
+        return doc
+    wanted = tuple(f"{field}:" for field in fields)
+    lines = [line for line in doc.page_content.split("\n") if line.startswith(wanted)]
+    return Document(page_content="\n".join(lines), metadata=doc.metadata)
+
+
+def canonical_symptoms(symptoms) -> tuple:
+    """
+    Lower-cased, de-duplicated and sorted symptom names
+    """
+    return tuple(sorted({s.strip().lower() for s in symptoms or [] if s.strip()}))
+
+
+def symptom_query(symptoms) -> str:
+    """
+    Retrieval query for a symptom set: the canonical symptoms joined, so the
+    same set always embeds and ranks the same way whatever else the request
+    says. Empty when there are no symptoms.
+    """
+    return ", ".join(canonical_symptoms(symptoms))
+
+
+class TopKCache:
+    """
+    Top-k document IDs per canonical symptom set, so a repeated search skips
+    both the query embedding and the vector search. Only valid for searches
+    on symptom_query(symptoms); the retriever skips the cache for any other
+    query. Keeps the time spent on hits and misses to report what it saves.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        self.stale = 0
+
+    @staticmethod
+    def key_for(symptoms, k: int):
+        canonical = canonical_symptoms(symptoms)
+        return (canonical, k) if canonical else None
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, ids):
+        self._cache.set(key, tuple(ids))
+
+    def invalidate(self, key):
+        """
+        Cached IDs no longer all exist, e.g. after the index was rebuilt
+        """
+        self._cache.pop(key)
+        with self._lock:
+            self.stale += 1
+
+    def observe(self, hit: bool, seconds: float):
+        with self._lock:
+            if hit:
+                self.hit_seconds += seconds
+            else:
+                self.miss_seconds += seconds
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        with self._lock:
+            stats["stale"] = self.stale
+            stats["saved_s"] = round(
+                saved_seconds(stats["hits"], stats["misses"], self.miss_seconds, self.hit_seconds), 3
+            )
+        return stats
+
+
+def _in_order(docs: List[Document], ids) -> List[Document]:
+    by_id = {doc.id: doc for doc in docs}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+class SymptomAwareRetriever(BaseRetriever):
+    """
+    Vector search restricted to the knowledge-base rows of diseases that share
+    a symptom with the request.
+
+    The disease scorer's postings (symptom -> diseases) pick the `candidates`
+    best-matching diseases; the vector store is then searched only among their
+    CSV rows through a metadata filter on `row`. Requests whose symptoms match
+    no disease fall back to an unfiltered search. Returned documents carry only
+    `fields`, which keeps the prompt small.
+
+    With a `cache` the result for the same symptom set is reused by ID, as
+    long as the query is symptom_query(symptoms).
+    """
+
+    vectorstore: Any
+    scorer: Any
+    k: int = 4
+    candidates: int = 20
+    fields: List[str] = list(DEFAULT_FIELDS)
+    cache: Any = None
+
+    def candidate_rows(self, symptoms) -> List[int]:
+        rows = []
+        for disease, _, _ in self.scorer.rank(symptoms or [], k=self.candidates):
+            rows.extend(self.scorer.rows_of(disease))
+        return sorted(rows)
+
+    def _search_kwargs(self, symptoms) -> dict:
+        rows = self.candidate_rows(symptoms) if symptoms else []
+        if not rows:
+            return {"k": self.k}
+        return {"k": min(self.k, len(rows)), "filter": {"row": {"$in": rows}}}
+
+    def _cache_key(self, symptoms, query: str):
+        if self.cache is None or not symptoms or query != symptom_query(symptoms):
+            return None
+        return self.cache.key_for(symptoms, self.k)
+
+    def _cached(self, key, ids, docs) -> Optional[List[Document]]:
+        docs = _in_order(docs, ids)
+        if len(docs) == len(ids):
+            return docs
+        self.cache.invalidate(key)
+        return None
+
+    def _store(self, key, docs, start):
+        if key is None:
+            return
+        self.cache.observe(False, time.perf_counter() - start)
+        if all(doc.id for doc in docs):
+            self.cache.set(key, [doc.id for doc in docs])
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, symptoms: Optional[List[str]] = None
+    ) -> List[Document]:
+        key = self._cache_key(symptoms, query)
+        start = time.perf_counter()
+        ids = self.cache.get(key) if key is not None else None
+        docs = self._cached(key, ids, self.vectorstore.get_by_ids(list(ids))) if ids else None
+        if docs is not None:
+            self.cache.observe(True, time.perf_counter() - start)
+        else:
+            start = time.perf_counter()
+            docs = self.vectorstore.similarity_search(query, **self._search_kwargs(symptoms))
+            self._store(key, docs, start)
+        return [trim_fields(doc, self.fields) for doc in docs]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, symptoms: Optional[List[str]] = None
+    ) -> List[Document]:
+        key = self._cache_key(symptoms, query)
+        start = time.perf_counter()
+        ids = self.cache.get(key) if key is not None else None
+        docs = self._cached(key, ids, await self.vectorstore.aget_by_ids(list(ids))) if ids else None
+        if docs is not None:
+            self.cache.observe(True, time.perf_counter() - start)
+        else:
+            start = time.perf_counter()
+            docs = await self.vectorstore.asimilarity_search(query, **self._search_kwargs(symptoms))
+            self._store(key, docs, start)
+        return [trim_fields(doc, self.fields) for doc in docs]
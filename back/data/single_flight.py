@@ -0,0 +1,72 @@
+# back/data/single_flight.py
+
+import asyncio
+import threading
+
+try:
+    from .stage_timing import span
+except ImportError:
+    from stage_timing import span
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for `key` is in flight,
+    further calls with the same key wait for it and get its result (or its
+    exception) instead of starting their own.
+
+    The shared call runs as its own task and is shielded, so a client that
+    disconnects does not cancel it for the others still waiting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters = {}
+
+    async def run(self, key, fn, *args, **kwargs):
+        """
+        Await `fn(*args, **kwargs)`, or the identical call already in flight
+        """
+        with self._lock:
+            task = self._inflight.get(key)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(fn(*args, **kwargs))
+                self._inflight[key] = task
+                self._waiters[key] = 1
+                self.calls += 1
+                task.add_done_callback(lambda t, key=key: self._done(key, t))
+            else:
+                self.coalesced += 1
+                self._waiters[key] += 1
+                self.max_waiters = max(self.max_waiters, self._waiters[key])
+
+        if leader:
+            return await asyncio.shield(task)
+        with span(f"{self.name}.coalesced"):
+            return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+                del self._waiters[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.calls + self.coalesced
+            return {
+                "calls": self.calls,
+                "calls_saved": self.coalesced,
+                "saved_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+                "in_flight": len(self._inflight),
+                "max_waiters": self.max_waiters,
+            }
@@ -0,0 +1,157 @@
+# back/data/stage_timing.py
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Stages recorded today: extract_symptoms, extract.lexicon, extract.ner,
+# generate_diagnosis, diagnosis.cache, diagnosis.local, diagnosis.rag_chain,
+# rag.retrieval and rag.llm (StageTimingCallback), diagnosis.fallback and
+# <name>.coalesced (SingleFlight). The diagnosis chain keeps no memory, so
+# there are no memory load/save stages.
+
+# Spans recorded for the current request, or None when nobody is collecting.
+# A ContextVar follows the request across the threadpool and async tasks.
+_current_spans: ContextVar = ContextVar("stage_timing_spans", default=None)
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class StageHistogram:
+    """
+    In-process latency histogram per stage name
+    """
+
+    def __init__(self, buckets_ms=BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(self.buckets_ms) + 1)}
+                self._stages[name] = stage
+            stage["count"] += 1
+            stage["total_ms"] += ms
+            stage["max_ms"] = max(stage["max_ms"], ms)
+            for i, bound in enumerate(self.buckets_ms):
+                if ms <= bound:
+                    stage["buckets"][i] += 1
+                    break
+            else:
+                stage["buckets"][-1] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        labels = [f"<={bound}ms" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        with self._lock:
+            return {
+                name: {
+                    "count": stage["count"],
+                    "mean_ms": round(stage["total_ms"] / stage["count"], 3),
+                    "max_ms": round(stage["max_ms"], 3),
+                    "buckets": dict(zip(labels, stage["buckets"])),
+                }
+                for name, stage in self._stages.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+stage_histogram = StageHistogram()
+
+
+def record(name: str, seconds: float):
+    stage_histogram.observe(name, seconds)
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time the enclosed block as stage `name`
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_spans():
+    """
+    Collect every span recorded inside the block (including in threads and
+    tasks started from it) into the yielded list of (name, seconds)
+    """
+    spans = []
+    token = _current_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_spans.reset(token)
+
+
+def summarize_spans(spans: List[Tuple[str, float]]) -> Dict[str, float]:
+    """
+    Total milliseconds per stage, in the order stages first appeared
+    """
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds * 1000
+    return {name: round(ms, 3) for name, ms in totals.items()}
+
+
+def server_timing_header(spans: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in summarize_spans(spans).items())
+
+
+class StageTimingCallback(BaseCallbackHandler):
+    """
+    LangChain callback that reports retriever and LLM calls made inside a
+    chain as `rag.retrieval` and `rag.llm` spans
+    """
+
+    def __init__(self, prefix: str = "rag"):
+        self.prefix = prefix
+        self._started = {}
+
+    def _start(self, run_id):
+        self._started[run_id] = time.perf_counter()
+
+    def _end(self, run_id, stage):
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            record(f"{self.prefix}.{stage}", time.perf_counter() - start)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, "retrieval")
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "retrieval")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, "llm")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "llm")
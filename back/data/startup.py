@@ -0,0 +1,124 @@
+# back/data/startup.py
+
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class StartupManager:
+    """
+    Loads startup components (models, indexes, clients) on a small thread
+    pool and records how long each one took.
+
+    `submit` starts a slow load in the background and `result` joins it
+    where the value is first needed, so independent loads overlap; `timed`
+    records a step that runs inline. Once everything, including the warm-up,
+    is done the owner calls `mark_ready`, which /readyz reports.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.started_at = time.monotonic()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startup")
+        self._futures = {}
+        self._components = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.ready_after = None
+        self.error = None
+
+    def _record(self, name: str, **fields):
+        with self._lock:
+            self._components.setdefault(name, {"status": PENDING, "seconds": None})
+            self._components[name].update(fields)
+
+    def _run(self, name: str, fn, args, kwargs):
+        self._record(name, status=LOADING)
+        start = time.perf_counter()
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            self._record(name, status=FAILED, seconds=round(time.perf_counter() - start, 3), error=repr(e))
+            raise
+        self._record(name, status=READY, seconds=round(time.perf_counter() - start, 3))
+        return value
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Future:
+        """
+        Start loading component `name` in the background
+        """
+        self._record(name)
+        future = self._pool.submit(self._run, name, fn, args, kwargs)
+        with self._lock:
+            self._futures[name] = future
+        return future
+
+    def result(self, name: str, timeout: float = None):
+        """
+        Value of a submitted component, waiting for it if still loading.
+        Re-raises the error the load failed with.
+        """
+        with self._lock:
+            future = self._futures[name]
+        return future.result(timeout)
+
+    @contextmanager
+    def timed(self, name: str):
+        """
+        Record an inline startup step as component `name`
+        """
+        self._record(name, status=LOADING)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self._record(name, status=FAILED, seconds=round(time.perf_counter() - start, 3), error=repr(e))
+            raise
+        self._record(name, status=READY, seconds=round(time.perf_counter() - start, 3))
+
+    def mark_ready(self):
+        self.ready_after = round(time.monotonic() - self.started_at, 3)
+        self._ready.set()
+
+    def close(self):
+        """
+        Wait for the background loads and stop the pool threads, e.g. before
+        forking workers. Results stay available through `result`.
+        """
+        self._pool.shutdown(wait=True)
+
+    def mark_failed(self, error: BaseException):
+        self.error = "".join(traceback.format_exception_only(type(error), error)).strip()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def report(self) -> dict:
+        with self._lock:
+            components = {name: dict(info) for name, info in self._components.items()}
+        return {
+            "ready": self.ready,
+            "ready_after_s": self.ready_after,
+            "uptime_s": round(time.monotonic() - self.started_at, 3),
+            "error": self.error,
+            "components": components,
+        }
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [
+                f"{name} {info['seconds']:.2f}s" if info["seconds"] is not None else f"{name} {info['status']}"
+                for name, info in self._components.items()
+            ]
+        return ", ".join(parts)
+
+
+# Shared by every module that loads something at startup
+startup = StartupManager()
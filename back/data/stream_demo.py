@@ -0,0 +1,47 @@
+import asyncio
+import json
+import time
+from langchain_core.documents import Document
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from diagnosis_chain import build_diagnosis_chain, astream_answer
+from diagnosis_parser import parse_conditions
+
+# Offline walk-through of what /diagnose/stream sends: the diagnosis chain is
+# built around a fake streaming chat model and a static retriever, and its
+# output is printed as the same Server-Sent Events the endpoint emits.
+
+FAKE_ANSWER = (
+    "1. Condition Name: influenza\nReason: fever, cough and body aches.\n"
+    "2. Condition Name: common cold\nReason: runny nose and sore throat."
+)
+
+retriever = RunnableLambda(lambda query: [
+    Document(page_content="Disease: influenza\nSymptoms: fever, cough, body aches"),
+    Document(page_content="Disease: common cold\nSymptoms: runny nose, sore throat, cough"),
+])
+llm = GenericFakeChatModel(messages=iter([AIMessage(content=FAKE_ANSWER)]))
+chain = build_diagnosis_chain(llm, retriever)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def main():
+    inputs = {
+        "question": "Identify the two most likely conditions.",
+        "retrieval_query": "fever, cough, runny nose",
+        "history": [],
+    }
+    start = time.perf_counter()
+    first_token = None
+    async for kind, value in astream_answer(chain, inputs):
+        if kind == "token":
+            first_token = first_token or time.perf_counter() - start
+            print(sse_event("token", {"text": value}), end="")
+        else:
+            print(sse_event("result", {"diagnosis": value["answer"], "conditions": parse_conditions(value["answer"])}), end="")
+    total = time.perf_counter() - start
+    print(f"⏱ first token after {first_token * 1000:.1f} ms, full result after {total * 1000:.1f} ms")
+
+asyncio.run(main())
@@ -0,0 +1,184 @@
+# back/data/symptom_matcher.py
+
+import hashlib
+import json
+import re
+from collections import deque, namedtuple
+from typing import Dict, Iterable, List, Set
+
+try:
+    from .symspell_index import DeletionIndex
+except ImportError:
+    from symspell_index import DeletionIndex
+
+# A lexicon entry found in the input text. `term` is the matched entry itself,
+# `symptom` its canonical form, and `start`/`end` the matched span in the text.
+LexiconHit = namedtuple("LexiconHit", ["term", "symptom", "start", "end"])
+
+
+def lexicon_fingerprint(synonym_map: Dict[str, str]) -> str:
+    """
+    Stable hash of the lexicon, used to tell when a compiled matcher is stale
+    """
+    payload = json.dumps(sorted(synonym_map.items()), ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:['’-][a-z0-9]+)*")
+
+
+class SymptomMatcher:
+    """
+    Lexicon compiled once into an Aho-Corasick automaton so every exact
+    occurrence of every entry is found in a single pass over the text.
+
+    Misspellings are resolved afterwards with a SymSpell-style deletion index
+    over the lexicon plus the knowledge-base symptom vocabulary: each word
+    n-gram of the text that no exact hit already explains is looked up in
+    near-constant time, longest n-grams first.
+    """
+
+    def __init__(self, synonym_map: Dict[str, str], vocab: Iterable[str] = (),
+                 max_edit_distance: int = 2, max_ngram: int = 4):
+        self.synonym_map = dict(synonym_map)
+        self.terms = sorted(set(self.synonym_map) | set(self.synonym_map.values()))
+        self.max_edit_distance = max_edit_distance
+        self.max_ngram = max_ngram
+
+        typo_terms = set(self.terms)
+        typo_terms.update(term.strip().lower() for term in vocab if term and term.strip())
+        typo_terms = {term for term in typo_terms if len(_TOKEN_RE.findall(term)) <= max_ngram}
+        self.typo_index = DeletionIndex(typo_terms, max_edit_distance=max_edit_distance)
+        # Character-length range of the indexed terms for each word count, so
+        # n-grams that cannot be within max_edit_distance of any term are skipped
+        self._ngram_lengths = {}
+        for term in typo_terms:
+            size = len(_TOKEN_RE.findall(term))
+            low, high = self._ngram_lengths.get(size, (len(term), len(term)))
+            self._ngram_lengths[size] = (min(low, len(term)), max(high, len(term)))
+        self._ngram_sizes = sorted(self._ngram_lengths, reverse=True)
+
+        settings = f"{lexicon_fingerprint(self.synonym_map)}|{sorted(typo_terms)}|{max_edit_distance}|{max_ngram}"
+        self.fingerprint = hashlib.sha1(settings.encode("utf-8")).hexdigest()
+        self._build_automaton()
+
+    # -------------------- Compilation --------------------
+    def _build_automaton(self):
+        goto = [{}]
+        outputs = [[]]
+        for idx, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(idx)
+
+        # Fold the failure links into a full transition table so the scan is
+        # a single dict lookup per character
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+        self._delta = delta
+        self._outputs = outputs
+
+    # -------------------- Matching --------------------
+    def _exact_hits(self, text: str) -> List[LexiconHit]:
+        delta, outputs = self._delta, self._outputs
+        found = {}
+        state = 0
+        for pos, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            for idx in outputs[state]:
+                if idx not in found:
+                    found[idx] = pos + 1
+
+        hits = []
+        for idx, end in found.items():
+            term = self.terms[idx]
+            hits.append(LexiconHit(term, self.synonym_map.get(term, term), end - len(term), end))
+        return hits
+
+    def _typo_hits(self, text: str, exact: List[LexiconHit], max_edit_distance) -> List[LexiconHit]:
+        tokens = [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+        # Words already explained by an exact hit are not re-interpreted
+        covered = bytearray(len(text))
+        for hit in exact:
+            covered[hit.start:hit.end] = b"\x01" * (hit.end - hit.start)
+        used = [1 in covered[start:end] for _, start, end in tokens]
+        # Length of the n-gram tokens[i:j] once joined by single spaces is
+        # offsets[j] - offsets[i] - 1, so n-grams too long or too short for
+        # any term are skipped without building the string
+        words = [token for token, _, _ in tokens]
+        offsets = [0]
+        for word in words:
+            offsets.append(offsets[-1] + len(word) + 1)
+        # Every n-gram starting at word i is a prefix of the longest one, so
+        # all of them that reach the index's prefix length share its
+        # candidates: when there are none, none of them can match
+        longest = [" ".join(words[i:i + self.max_ngram]) for i in range(len(words))]
+        prefix_length = self.typo_index.prefix_length
+
+        slack = self.max_edit_distance if max_edit_distance is None else max_edit_distance
+        possible = [self.typo_index.has_candidates(ngram, slack) for ngram in longest]
+        hits = []
+        for size in self._ngram_sizes:
+            low, high = self._ngram_lengths[size]
+            low, high = low - slack, high + slack
+            for i in range(len(tokens) - size + 1):
+                length = offsets[i + size] - offsets[i] - 1
+                if not low <= length <= high or (length >= prefix_length and not possible[i]):
+                    continue
+                if any(used[i:i + size]):
+                    continue
+                found = self.typo_index.lookup(longest[i][:length], max_edit_distance)
+                if found is None:
+                    continue
+                term = found[0]
+                hits.append(LexiconHit(term, self.synonym_map.get(term, term), tokens[i][1], tokens[i + size - 1][2]))
+                for j in range(i, i + size):
+                    used[j] = True
+        return hits
+
+    def find(self, text: str, max_edit_distance: int = None) -> List[LexiconHit]:
+        """
+        Return the lexicon entries found verbatim in `text`, plus the lexicon or
+        vocabulary terms that its remaining word n-grams are misspellings of.
+        `text` is expected to be lower-cased already.
+        """
+        if not text:
+            return []
+        exact = self._exact_hits(text)
+        return exact + self._typo_hits(text, exact, max_edit_distance)
+
+    def find_many(self, texts: List[str], max_edit_distance: int = None) -> List[List[LexiconHit]]:
+        """
+        Batch version of `find`, results in input order
+        """
+        return [self.find(text, max_edit_distance) for text in texts]
+
+    def match(self, text: str, max_edit_distance: int = None) -> Set[str]:
+        """
+        Canonical symptoms found in `text`
+        """
+        return {hit.symptom for hit in self.find(text, max_edit_distance)}
+
+    def match_many(self, texts: List[str], max_edit_distance: int = None) -> List[Set[str]]:
+        """
+        Canonical symptoms found in each of `texts`, in input order
+        """
+        return [{hit.symptom for hit in hits} for hits in self.find_many(texts, max_edit_distance)]
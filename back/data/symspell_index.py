@@ -0,0 +1,118 @@
+# back/data/symspell_index.py
+
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from rapidfuzz.distance import OSA
+
+# Bound on DeletionIndex's per-prefix candidate cache
+_MAX_CACHED_PREFIXES = 65536
+
+
+@lru_cache(maxsize=65536)
+def _delete_variants(word: str, max_edit_distance: int) -> FrozenSet[str]:
+    """
+    All strings obtained by deleting up to `max_edit_distance` characters.
+    Memoized because the same few word prefixes come up in almost every input.
+    """
+    variants = {word}
+    frontier = [word]
+    for _ in range(max_edit_distance):
+        next_frontier = []
+        for item in frontier:
+            for i in range(len(item)):
+                deleted = item[:i] + item[i + 1:]
+                if deleted not in variants:
+                    variants.add(deleted)
+                    next_frontier.append(deleted)
+        frontier = next_frontier
+    return frozenset(variants)
+
+
+class DeletionIndex:
+    """
+    SymSpell-style typo index. Every term is stored under all the strings
+    obtained by deleting up to `max_edit_distance` characters from its first
+    `prefix_length` characters, so a lookup only has to generate the deletes
+    of the query instead of comparing it with every term.
+    """
+
+    def __init__(self, terms: Iterable[str], max_edit_distance: int = 2, prefix_length: int = 7):
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.terms = set()
+        self._deletes = {}
+        # The same keys as a set: intersecting two sets walks the smaller one
+        self._delete_keys = set()
+        # Candidate terms per (query prefix, edit limit); n-grams starting
+        # with the same word, and common words across inputs, share them
+        self._candidates = {}
+        for term in terms:
+            self.add(term)
+
+    def add(self, term: str):
+        if not term or term in self.terms:
+            return
+        self.terms.add(term)
+        self._candidates.clear()
+        for variant in _delete_variants(term[:self.prefix_length], self.max_edit_distance):
+            self._deletes.setdefault(variant, []).append(term)
+            self._delete_keys.add(variant)
+
+    def allowed_distance(self, word: str) -> int:
+        """
+        Edits tolerated for a word of this length: short words must match
+        exactly, otherwise one edit per ~4 characters up to the configured max.
+        """
+        if len(word) < 5:
+            return 0
+        if len(word) < 9:
+            return min(1, self.max_edit_distance)
+        return self.max_edit_distance
+
+    def lookup(self, word: str, max_edit_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """
+        Closest indexed term within the allowed edit distance (optimal string
+        alignment, so a swap of two adjacent letters counts as one edit).
+        Returns (term, distance) or None.
+        """
+        if word in self.terms:
+            return word, 0
+        limit = self.allowed_distance(word)
+        if max_edit_distance is not None:
+            limit = min(limit, max_edit_distance)
+        if limit == 0:
+            return None
+
+        best = None
+        for term in self._candidates_for(word[:self.prefix_length], limit):
+            if abs(len(term) - len(word)) > limit:
+                continue
+            distance = OSA.distance(word, term, score_cutoff=limit)
+            if distance <= limit and (best is None or (distance, term) < best[::-1]):
+                best = (term, distance)
+        return best
+
+    def has_candidates(self, word: str, limit: int) -> bool:
+        """
+        False when no word sharing the first `prefix_length` characters of
+        `word` can be within `limit` edits of an indexed term, not even an
+        exact match. Lets callers skip every such word at once.
+        """
+        return bool(self._candidates_for(word[:self.prefix_length], limit))
+
+    def _candidates_for(self, prefix: str, limit: int) -> Tuple[str, ...]:
+        key = (prefix, limit)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            # Intersecting with the index keys runs in C; most prefixes share
+            # no delete with any term and get an empty tuple
+            candidates = tuple({
+                term
+                for variant in _delete_variants(prefix, limit) & self._delete_keys
+                for term in self._deletes[variant]
+            })
+            if len(self._candidates) >= _MAX_CACHED_PREFIXES:
+                self._candidates.clear()
+            self._candidates[key] = candidates
+        return candidates
@@ -2,6 +2,7 @@ import pandas as pd
 import time
 from sklearn.metrics import precision_score, recall_score, f1_score
 from diagnosis_assistant import extract_symptoms, follow_up_map
+from stage_timing import collect_spans, summarize_spans
 from rapidfuzz import fuzz
 from collections import Counter
 
@@ -17,6 +18,7 @@ def normalize(sym_str):
 # Initialize logs
 extracted_results = []
 latency_logs = []
+stage_logs = []
 followup_accuracy = []
 symptom_stats = []
 
@@ -32,11 +34,13 @@ for idx, row in df.iterrows():
 
     # --- Symptom Extraction ---
     start = time.time()
-    extracted = set(extract_symptoms(input_text))
+    with collect_spans() as spans:
+        extracted = set(extract_symptoms(input_text))
     end = time.time()
 
     extracted_results.append(list(extracted))
     latency_logs.append(round(end - start, 2))
+    stage_logs.append(summarize_spans(spans))
 
     # --- Follow-up Evaluation ---
     actual_followups = []
@@ -94,8 +98,9 @@ print(f"Recall:    {rec:.2f}")
 print(f"F1 Score:  {f1:.2f}")
 
 print("\n==== ⏱ Latency per Sample (seconds) ====")
-for i, t in enumerate(latency_logs):
-    print(f"Case {i+1}: {t} sec")
+for i, (t, stages) in enumerate(zip(latency_logs, stage_logs)):
+    breakdown = ", ".join(f"{name} {ms:.1f} ms" for name, ms in stages.items())
+    print(f"Case {i+1}: {t} sec | {breakdown}")
 
 print("\n==== 🔍 Follow-up Match Accuracy ====")
 for r in followup_accuracy:
@@ -0,0 +1,172 @@
+# back/data/token_budget.py
+
+import re
+from collections import namedtuple
+from typing import List, Sequence
+
+# Pieces of the diagnosis prompt that vary per request
+PromptParts = namedtuple("PromptParts", ["symptom_str", "demographics", "answers", "notes"])
+
+BudgetResult = namedtuple("BudgetResult", ["question", "docs", "report"])
+
+# Word pieces and single punctuation marks; close to what a WordPiece/BPE
+# tokenizer produces for English text
+_FALLBACK_TOKEN_RE = re.compile(r"\w{1,6}|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Counts tokens offline with the Hugging Face tokenizer of `model_name`
+    (the embedding model, so nothing new is downloaded). Falls back to a regex
+    approximation when transformers or the tokenizer files are unavailable.
+    """
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name
+        self._tokenizer = None
+        self._loaded = False
+
+    @property
+    def backend(self) -> str:
+        self._load()
+        return self.model_name if self._tokenizer is not None else "regex"
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.model_name:
+            return
+        try:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        except Exception as e:
+            print(f"⚠️ Tokenizer '{self.model_name}' unavailable ({e}); counting tokens approximately.")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        self._load()
+        if self._tokenizer is not None:
+            return len(self._tokenizer.tokenize(text))
+        return len(_FALLBACK_TOKEN_RE.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cut `text` at a word boundary so that it has at most `max_tokens` tokens
+        """
+        if max_tokens <= 0:
+            return ""
+        words = text.split()
+        lo, hi = 0, len(words)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count(" ".join(words[:mid])) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return " ".join(words[:lo]) + (" …" if lo < len(words) else "")
+
+
+def render_context(parts: PromptParts) -> str:
+    items = ([parts.demographics] if parts.demographics else []) + list(parts.answers)
+    if parts.notes:
+        items.append(f"Additional Notes: {parts.notes}")
+    return ". ".join(items) if items else "No additional context provided."
+
+
+def _dedupe(answers: Sequence[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for answer in answers:
+        key = " ".join(answer.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(answer)
+    return unique
+
+
+class PromptBudget:
+    """
+    Keeps the diagnosis prompt (instructions, patient context and retrieved
+    documents) under `max_tokens`. When a request is over budget the least
+    valuable parts go first:
+
+    1. duplicate follow-up answers
+    2. the lowest-ranked retrieved documents, keeping at least `min_docs`
+    3. verbose free text: the longest of the notes and answers is shortened
+       first, down to `min_item_tokens` each
+    """
+
+    def __init__(self, counter: TokenCounter, template: str, max_tokens: int = 1500,
+                 min_docs: int = 1, min_item_tokens: int = 8):
+        self.counter = counter
+        self.template = template
+        self.max_tokens = max_tokens
+        self.min_docs = min_docs
+        self.min_item_tokens = min_item_tokens
+
+    def render(self, parts: PromptParts) -> str:
+        return self.template.format(symptom_str=parts.symptom_str, context=render_context(parts))
+
+    def fit(self, parts: PromptParts, docs: Sequence, extra_tokens: int = 0) -> BudgetResult:
+        """
+        `extra_tokens` covers whatever else goes into the prompt (system
+        wrapper, session history). Returns the question, the kept documents
+        and a report of what was trimmed.
+        """
+        docs = list(docs)
+        doc_tokens = [self.counter.count(doc.page_content) for doc in docs]
+
+        def total(parts, n_docs):
+            return self.counter.count(self.render(parts)) + sum(doc_tokens[:n_docs]) + extra_tokens
+
+        before = total(parts, len(docs))
+        report = {
+            "budget": self.max_tokens,
+            "before": before,
+            "after": before,
+            "duplicates_removed": 0,
+            "docs_dropped": 0,
+            "items_shortened": 0,
+            "over_budget": False,
+        }
+        if before <= self.max_tokens or self.max_tokens <= 0:
+            return BudgetResult(self.render(parts), docs, report)
+
+        # 1. Duplicate answers (the same answer given to several follow-ups)
+        unique = _dedupe(parts.answers)
+        report["duplicates_removed"] = len(parts.answers) - len(unique)
+        parts = parts._replace(answers=unique)
+        used = total(parts, len(docs))
+
+        # 2. Low-ranked documents, from the bottom of the ranking
+        n_docs = len(docs)
+        while used > self.max_tokens and n_docs > self.min_docs:
+            n_docs -= 1
+            used -= doc_tokens[n_docs]
+        report["docs_dropped"] = len(docs) - n_docs
+        docs = docs[:n_docs]
+
+        # 3. Verbose notes and answers, longest first
+        shortened = set()
+        while used > self.max_tokens:
+            items = list(parts.answers) + [parts.notes or ""]
+            lengths = [self.counter.count(item) for item in items]
+            longest = max(range(len(items)), key=lengths.__getitem__)
+            if lengths[longest] <= self.min_item_tokens:
+                break
+            keep = max(self.min_item_tokens, lengths[longest] - (used - self.max_tokens))
+            # One token is left for the ellipsis that marks the cut
+            cut = self.counter.truncate(items[longest], keep - 1)
+            if self.counter.count(cut) >= lengths[longest]:
+                break
+            items[longest] = cut
+            shortened.add(longest)
+            parts = parts._replace(answers=items[:-1], notes=items[-1])
+            used = total(parts, n_docs)
+
+        report["items_shortened"] = len(shortened)
+        report["after"] = used
+        report["over_budget"] = used > self.max_tokens
+        return BudgetResult(self.render(parts), docs, report)
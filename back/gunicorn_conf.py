@@ -0,0 +1,31 @@
+# gunicorn_conf.py
+#
+# Multi-worker serving with the models loaded once:
+#
+#   WEB_CONCURRENCY=4 gunicorn -c gunicorn_conf.py main:app
+#
+# The master imports main with PRELOAD_MODELS=1, which loads spaCy, the
+# embedding model, the knowledge base and the vector index and then freezes
+# the garbage collector. Each worker is forked from it and shares those pages
+# copy-on-write; post_fork re-creates the few clients (LLM, Chroma, SQLite,
+# ONNX sessions) that cannot cross a fork and warms the worker up.
+
+import multiprocessing
+import os
+
+os.environ.setdefault("PRELOAD_MODELS", "1")
+# The tokenizers disable their own parallelism after a fork anyway; this
+# only silences the warning each worker would print
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = os.getenv("BIND", "0.0.0.0:10000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Loading the models before the first fork takes a while
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    import main
+    main.reopen_after_fork()
@@ -0,0 +1,124 @@
+# load_test.py
+#
+# Closed-loop HTTP load test for the backend, standard library only. Start the
+# app offline with the fake LLM first, e.g.
+#
+#   LLM_BACKEND=fake FAKE_LLM_LATENCY_MS=800 uvicorn main:app --port 10000
+#   python load_test.py --endpoint diagnose --concurrency 50 --requests 1000
+#
+# Each worker thread sends its next request as soon as the previous one is
+# answered. Payloads are built from data/testing_v2.csv.
+
+import argparse
+import csv
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CASES_PATH = os.path.join(BASE_DIR, "data", "testing_v2.csv")
+
+
+def load_inputs():
+    with open(CASES_PATH, newline="", encoding="utf-8") as f:
+        return [row["Input"] for row in csv.DictReader(f) if row.get("Input")]
+
+
+def build_request(endpoint, text, rng):
+    if endpoint == "extract":
+        return "/extract_symptoms", {"text": text}
+    if endpoint == "chat":
+        return "/chat_llm", {
+            "session_id": f"load-{rng.randrange(1000)}",
+            "messages": [{"role": "user", "content": text}],
+        }
+    payload = {
+        "symptoms": text,
+        "followup_answers": {},
+        "extra_input": "",
+        "age": rng.choice([None, 8, 25, 47, 70]),
+        "gender": rng.choice([None, "female", "male"]),
+        "country": None,
+    }
+    return ("/diagnose/stream" if endpoint == "stream" else "/diagnose"), payload
+
+
+def send(url, payload, timeout):
+    """
+    POST one request. Returns (status, seconds to first byte, total seconds)
+    """
+    data = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read(1)
+            first_byte = time.perf_counter() - start
+            response.read()
+            return response.status, first_byte, time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return e.code, None, time.perf_counter() - start
+    except Exception as e:
+        return type(e).__name__, None, time.perf_counter() - start
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop HTTP load test for the backend")
+    parser.add_argument("--url", default="http://127.0.0.1:10000")
+    parser.add_argument("--endpoint", choices=["diagnose", "stream", "chat", "extract"], default="diagnose")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    inputs = load_inputs()
+    rng = random.Random(args.seed)
+    jobs = [build_request(args.endpoint, rng.choice(inputs), rng) for _ in range(args.requests)]
+
+    statuses = Counter()
+    latencies, first_bytes = [], []
+    lock = threading.Lock()
+
+    def run(job):
+        path, payload = job
+        status, first_byte, total = send(args.url + path, payload, args.timeout)
+        with lock:
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(total)
+                first_bytes.append(first_byte)
+
+    print(f"🚀 {args.requests} x POST {args.endpoint} with {args.concurrency} concurrent clients against {args.url}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, jobs))
+    elapsed = time.perf_counter() - start
+
+    print(f"\n==== 📊 Results ({elapsed:.1f} s) ====")
+    print(f"Throughput:    {args.requests / elapsed:.1f} req/s")
+    print(f"Status codes:  {dict(statuses)}")
+    for name, values in (("Latency", latencies), ("First byte", first_bytes)):
+        print(
+            f"{name + ':':<14} p50 {percentile(values, 0.50) * 1000:8.1f} ms | "
+            f"p95 {percentile(values, 0.95) * 1000:8.1f} ms | "
+            f"p99 {percentile(values, 0.99) * 1000:8.1f} ms | "
+            f"max {max(values, default=float('nan')) * 1000:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
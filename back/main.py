@@ -1,37 +1,141 @@
 # main.py
 
+import gc
+import importlib
+import json
+import os
+import threading
+import traceback
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-from data.diagnosis_assistant import extract_symptoms, generate_diagnosis, follow_up_map
-from models import DiagnosisRequest
-from data.condition_info_loader import condition_database
+from fastapi.concurrency import run_in_threadpool
+from models import DiagnosisRequest, DiagnosisResponse
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.exception_handlers import request_validation_exception_handler
-from chatbot import query_gemini_from_messages, reset_session_memory
+from data.diagnosis_parser import parse_conditions
+from data.stage_timing import collect_spans, server_timing_header, stage_histogram
+from data.startup import startup
+
+# Run each local model once before reporting ready (STARTUP_WARMUP=0 skips it)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+# Load everything while this module is imported rather than in the
+# background. Set by gunicorn_conf.py, so the models are loaded once in the
+# master and shared copy-on-write by the workers it forks.
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+# -------------------- Startup --------------------
+# The diagnosis assistant, chatbot and condition database are imported by
+# load_components() on a background thread, so /healthz answers at once and
+# the slow loads overlap; until they are done every other endpoint is a 503.
+assistant = None
+chatbot = None
+condition_loader = None
+
+def load_components(warm_up: bool = STARTUP_WARMUP):
+    global assistant, chatbot, condition_loader
+    try:
+        chatbot_future = startup.submit("chatbot", importlib.import_module, "chatbot")
+        conditions_future = startup.submit("condition_info", importlib.import_module, "data.condition_info_loader")
+        with startup.timed("diagnosis_assistant"):
+            assistant = importlib.import_module("data.diagnosis_assistant")
+        chatbot = chatbot_future.result()
+        condition_loader = conditions_future.result()
+        if warm_up:
+            assistant.warm_up()
+        startup.mark_ready()
+        print(f"✅ Ready after {startup.ready_after:.1f}s: {startup.summary()}")
+    except Exception as e:
+        startup.mark_failed(e)
+        traceback.print_exc()
+        print(f"❌ Startup failed: {e}")
+
+def preload_components():
+    """
+    Load the components in this process before workers are forked from it.
+    The warm-up is left to each worker (reopen_after_fork): thread pools
+    started by the models here would not exist in the children.
+    """
+    load_components(warm_up=False)
+    if startup.error:
+        raise RuntimeError(f"Startup failed: {startup.error}")
+    startup.close()
+    # Everything loaded so far is long-lived. Freezing it keeps the workers'
+    # garbage collections from writing to (and so copying) the shared pages
+    gc.collect()
+    gc.freeze()
+
+def reopen_after_fork():
+    """
+    Called in each forked worker before it serves requests
+    """
+    assistant.reopen_after_fork()
+    chatbot.reopen_after_fork()
+    if STARTUP_WARMUP:
+        assistant.warm_up()
+
+if PRELOAD_MODELS:
+    preload_components()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not startup.ready:
+        threading.Thread(target=load_components, name="startup-loader", daemon=True).start()
+    yield
 
 
 # -------------------- App Setup --------------------
 app = FastAPI(
     title="Smart AI Medical Assistant Backend",
     description="FastAPI backend to extract symptoms and generate diagnosis using RAG + LLM",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Served while the models are still loading
+STARTUP_EXEMPT_PATHS = {"/", "/healthz", "/readyz", "/routes", "/timings", "/docs", "/openapi.json"}
+
+# Registered before CORS so that CORS stays the outer middleware and the 503
+# still carries its headers
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    if not startup.ready and request.url.path not in STARTUP_EXEMPT_PATHS:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "The assistant is still starting up, please retry shortly."},
+            headers={"Retry-After": "5"}
+        )
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-stage durations of a request are returned in a Server-Timing header when
+# the client asks for them with an "X-Stage-Timing: 1" request header
+@app.middleware("http")
+async def stage_timing_middleware(request: Request, call_next):
+    with collect_spans() as spans:
+        response = await call_next(request)
+    if request.headers.get("x-stage-timing") == "1" and spans:
+        response.headers["Server-Timing"] = server_timing_header(spans)
+    return response
+
 # -------------------- Request Schemas --------------------
 class SymptomInput(BaseModel):
     text: str
 
+class SymptomBatchInput(BaseModel):
+    texts: List[str]
+
 class ConditionQuery(BaseModel):
     conditions: List[str]
 
@@ -49,74 +153,144 @@ class FollowUpRequest(BaseModel):
 
 
 # -------------------- Endpoints --------------------
+# Endpoints are async so that LLM round trips are awaited on the event loop
+# instead of each one holding a threadpool worker. CPU-bound symptom
+# extraction (spaCy, lexicon matching) is explicitly run in the threadpool.
 @app.get("/")
-def root():
+async def root():
     return {"message": "Smart AI Medical Assistant backend is running."}
 
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is up; only a failed startup makes it unhealthy
+    if startup.error:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup.error})
+    return {"status": "ok", "uptime_s": startup.report()["uptime_s"]}
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness, with how long each startup component took
+    report = startup.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 @app.post("/extract_symptoms")
-def extract(payload: SymptomInput):
-    extracted = extract_symptoms(payload.text)
+async def extract(payload: SymptomInput):
+    extracted = await run_in_threadpool(assistant.extract_symptoms, payload.text)
+    return {"extracted_symptoms": extracted}
+
+@app.post("/extract_symptoms/batch")
+async def extract_batch(payload: SymptomBatchInput):
+    # One list of symptoms per input text, in the same order as payload.texts
+    extracted = await run_in_threadpool(assistant.extract_symptoms_batch, payload.texts)
     return {"extracted_symptoms": extracted}
 
 
 @app.post("/get_followups")
-def get_followups(request: FollowUpRequest):
+async def get_followups(request: FollowUpRequest):
     result = {}
     for symptom in request.symptoms:
-        qs = follow_up_map.get(symptom.lower(), [])
+        qs = assistant.follow_up_map.get(symptom.lower(), [])
         result[symptom] = [q for q in qs if isinstance(q, str) and q.strip()]
     return result
 
-@app.post("/diagnose")
-def diagnose(payload: DiagnosisRequest):
+@app.post("/diagnose", response_model=DiagnosisResponse)
+async def diagnose(payload: DiagnosisRequest):
     print("🔍 Received diagnosis request:", payload)
-    extracted = payload.symptoms if isinstance(payload.symptoms, list) else extract_symptoms(payload.symptoms)
-    result = generate_diagnosis(
+    if isinstance(payload.symptoms, list):
+        extracted = payload.symptoms
+    else:
+        extracted = await run_in_threadpool(assistant.extract_symptoms, payload.symptoms)
+    result = await assistant.agenerate_diagnosis(
         extracted,
         payload.followup_answers,
         payload.extra_input,
         age=payload.age,
         gender=payload.gender,
-        country=payload.country
+        country=payload.country,
+        session_id=payload.session_id
+    )
+    return {"diagnosis": result, "conditions": condition_loader.enrich_conditions(parse_conditions(result))}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/diagnose/stream")
+async def diagnose_stream(payload: DiagnosisRequest):
+    """
+    Server-Sent Events version of /diagnose: "token" events carry the answer
+    as the LLM writes it, the final "result" event the same body as /diagnose
+    (use it instead of the concatenated tokens).
+    """
+    print("🔍 Received streaming diagnosis request:", payload)
+    if isinstance(payload.symptoms, list):
+        extracted = payload.symptoms
+    else:
+        extracted = await run_in_threadpool(assistant.extract_symptoms, payload.symptoms)
+
+    async def events():
+        async for kind, value in assistant.astream_diagnosis(
+            extracted,
+            payload.followup_answers,
+            payload.extra_input,
+            age=payload.age,
+            gender=payload.gender,
+            country=payload.country,
+            session_id=payload.session_id
+        ):
+            if kind == "token":
+                yield sse_event("token", {"text": value})
+            else:
+                yield sse_event("result", {"diagnosis": value, "conditions": condition_loader.enrich_conditions(parse_conditions(value))})
+
+    # no-cache / X-Accel-Buffering keep proxies from holding the events back
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    return {"diagnosis": result}
 
 @app.post("/condition_info")
-def get_condition_info(query: ConditionQuery):
-    results = []
-    for cond in query.conditions:
-        key = cond.lower().strip()
-        if key in condition_database:
-            data = condition_database[key]
-            results.append({
-                "name": cond,
-                "description": data.get("description", ""),
-                "symptoms": data.get("symptoms", []),
-                "treatments": data.get("treatments", []),
-                "risks": data.get("risks", []),
-            })
-        else:
-            results.append({
-                "name": cond,
-                "description": "No information available.",
-                "symptoms": [],
-                "treatments": ["Information not available."],
-                "risks": ["Information not available."]
-            })
-    return results
+async def get_condition_info(query: ConditionQuery):
+    return [condition_loader.condition_info(cond) for cond in query.conditions]
+
+@app.get("/cache_stats")
+async def cache_stats():
+    return {
+        "extraction": assistant.extraction_cache.stats(),
+        "diagnosis": assistant.diagnosis_cache.stats(),
+        "diagnosis_sessions": assistant.diagnosis_sessions.stats(),
+        "chat_sessions": chatbot.session_store.stats(),
+        "embeddings": assistant.embedding.stats(),
+        "retrieval": assistant.retriever.cache.stats() if assistant.retriever.cache is not None else None,
+    }
+
+@app.get("/coalescing")
+async def coalescing_stats():
+    # LLM calls saved by sharing in-flight identical requests
+    return {"diagnosis": assistant.diagnosis_flights.stats(), "chat": chatbot.chat_flights.stats()}
+
+@app.get("/breakers")
+async def breakers():
+    # Circuit breaker state of each LLM upstream: closed, open or half_open
+    return {"diagnosis": assistant.diagnosis_guard.stats(), "chat": chatbot.chat_guard.stats()}
+
+@app.get("/timings")
+async def timings():
+    # Aggregated latency histogram of every stage since startup
+    return stage_histogram.snapshot()
 
 @app.get("/routes")
-def list_routes():
+async def list_routes():
     return [route.path for route in app.routes]
 
 
 @app.post("/chat_llm")
-def chat_with_llm(chat: ChatRequest):
+async def chat_with_llm(chat: ChatRequest):
 
     print("📥 Incoming chat payload:", chat)
     try:
         messages = [{"role": msg.role, "content": msg.content} for msg in chat.messages]
-        reply_text = query_gemini_from_messages(messages, chat.session_id)
+        reply_text = await chatbot.aquery_gemini_from_messages(messages, chat.session_id)
         return {"reply": reply_text}
 
     except Exception as e:
@@ -129,7 +303,8 @@ def reset(chat: dict = Body(...)):
     session_id = chat.get("session_id")
     if not session_id:
         return JSONResponse(status_code=400, content={"error": "Missing session_id"})
-    reset_session_memory(session_id)
+    chatbot.reset_session_memory(session_id)
+    assistant.diagnosis_sessions.clear(session_id)
     return {"message": f"Session '{session_id}' reset successfully."}
 
  
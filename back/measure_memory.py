@@ -0,0 +1,189 @@
+# measure_memory.py
+#
+# Resident memory of a multi-worker deployment, standard library only (Linux,
+# reads /proc/<pid>/smaps_rollup). Starts the backend in one of two modes,
+# waits for /readyz, sends some traffic so the workers touch their pages, and
+# reports every process of the tree:
+#
+#   uvicorn   uvicorn --workers N: every worker loads its own models (today)
+#   preload   gunicorn -c gunicorn_conf.py: the master loads them once and
+#             forks the workers, which share them copy-on-write
+#
+#   LLM_BACKEND=fake python measure_memory.py --mode uvicorn --workers 4
+#   LLM_BACKEND=fake python measure_memory.py --mode preload --workers 4
+#   LLM_BACKEND=fake python measure_memory.py --mode both --workers 4
+#
+# RSS counts shared pages in full in every process, so it overstates the
+# total; PSS splits each shared page between the processes mapping it and
+# sums to what the deployment really uses.
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def command(mode, workers, port):
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers)]
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "main:app"]
+
+
+def descendants(root):
+    """
+    pids of `root` and every process below it
+    """
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the fields after it don't
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = [root], [root]
+    while frontier:
+        children = [pid for pid, ppid in parents.items() if ppid in frontier]
+        tree.extend(children)
+        frontier = children
+    return tree
+
+
+def memory(pid):
+    """
+    smaps_rollup fields of `pid` in MiB
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in FIELDS:
+                values[name] = int(rest.split()[0]) / 1024
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        values["cmd"] = " ".join(f.read().decode(errors="replace").replace("\0", " ").split())
+    return values
+
+
+def wait_ready(server, base_url, timeout):
+    """
+    Wait for /readyz to answer 200. Fails right away when the server exits or
+    reports a startup error (e.g. a model that could not be downloaded)
+    instead of waiting for the whole timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The backend exited with code {server.returncode} before it was ready")
+        try:
+            with urllib.request.urlopen(f"{base_url}/readyz", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except urllib.error.HTTPError as e:
+            try:
+                error = json.loads(e.read() or b"{}").get("error")
+            except ValueError:
+                error = None
+            if error:
+                raise RuntimeError(f"The backend failed to start: {error}") from None
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"The backend was not ready after {timeout:.0f}s")
+
+
+def send_traffic(base_url, requests):
+    texts = ["I have a fever and a dry cough", "Headache, nausea and blurred vision", "Chest pain when breathing"]
+    for i in range(requests):
+        data = json.dumps({"text": texts[i % len(texts)]}).encode("utf-8")
+        request = urllib.request.Request(
+            f"{base_url}/extract_symptoms", data=data, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+
+
+def measure(mode, workers, args):
+    """
+    Start the backend in `mode`, send traffic and return the seconds until it
+    was ready and the memory of every process of its tree
+    """
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}")
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(command(mode, workers, args.port), cwd=BASE_DIR, env=env)
+    try:
+        start = time.monotonic()
+        wait_ready(server, base_url, args.ready_timeout)
+        ready_s = time.monotonic() - start
+        send_traffic(base_url, args.requests)
+        time.sleep(args.settle)
+
+        rows = []
+        for pid in descendants(server.pid):
+            try:
+                rows.append((pid, memory(pid)))
+            except OSError:
+                continue
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return ready_s, rows
+
+
+def report(mode, workers, requests, ready_s, rows):
+    print(f"\n==== 🧮 {mode}, {workers} workers: ready after {ready_s:.1f}s, {requests} requests ====")
+    print(f"{'pid':>7} | {'RSS':>8} | {'PSS':>8} | {'shared':>8} | {'private':>8} | command (MiB)")
+    for pid, m in rows:
+        shared = m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0)
+        private = m.get("Private_Clean", 0) + m.get("Private_Dirty", 0)
+        print(f"{pid:>7} | {m.get('Rss', 0):8.1f} | {m.get('Pss', 0):8.1f} | {shared:8.1f} | {private:8.1f} | {m['cmd'][:60]}")
+    total_rss = sum(m.get("Rss", 0) for _, m in rows)
+    total_pss = sum(m.get("Pss", 0) for _, m in rows)
+    print(
+        f"total RSS {total_rss:.1f} MiB | total PSS {total_pss:.1f} MiB"
+        f" | PSS per worker {total_pss / max(1, workers):.1f} MiB (master and helpers included)"
+    )
+    return total_rss, total_pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker resident memory")
+    parser.add_argument("--mode", choices=["uvicorn", "preload", "both"], default="preload",
+                        help="both runs uvicorn, then preload, and compares the totals")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=10050)
+    parser.add_argument("--requests", type=int, default=200, help="requests sent after startup")
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to wait before measuring")
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    modes = ["uvicorn", "preload"] if args.mode == "both" else [args.mode]
+    totals = {}
+    for mode in modes:
+        ready_s, rows = measure(mode, args.workers, args)
+        totals[mode] = report(mode, args.workers, args.requests, ready_s, rows)
+
+    if len(totals) == 2:
+        (uvicorn_rss, uvicorn_pss), (preload_rss, preload_pss) = totals["uvicorn"], totals["preload"]
+        print(f"\n==== 🧮 preload vs uvicorn, {args.workers} workers ====")
+        print(f"total RSS {uvicorn_rss:.1f} -> {preload_rss:.1f} MiB ({preload_rss - uvicorn_rss:+.1f})")
+        print(
+            f"total PSS {uvicorn_pss:.1f} -> {preload_pss:.1f} MiB ({preload_pss - uvicorn_pss:+.1f}, "
+            f"{(1 - preload_pss / uvicorn_pss) * 100 if uvicorn_pss else 0:.0f}% saved)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,22 @@ class DiagnosisRequest(BaseModel):
     age: Optional[int] = None
     gender: Optional[str] = None
     country: Optional[str] = None
+    # Optional: earlier diagnoses of the same session are given to the LLM as context
+    session_id: Optional[str] = None
 
 
-class DiagnosisResponse(BaseModel):
-    disease: str
+class ConditionResult(BaseModel):
+    name: str
+    reason: str = ""
     description: str
-    treatment: str
-    risk_factors: str
+    symptoms: List[str] = []
+    treatments: List[str] = []
+    risks: List[str] = []
+
+
+class DiagnosisResponse(BaseModel):
+    # The LLM's answer as text, for clients that render it themselves
+    diagnosis: str
+    # Parsed from the answer and joined with condition_database, so no
+    # /condition_info call is needed afterwards
+    conditions: List[ConditionResult] = []
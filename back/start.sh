@@ -1,2 +1,7 @@
 #!/bin/bash
+# WEB_CONCURRENCY > 1 serves with that many workers sharing one copy of the
+# models (see gunicorn_conf.py); otherwise a single uvicorn process
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+    exec gunicorn -c gunicorn_conf.py main:app
+fi
 uvicorn main:app --host=0.0.0.0 --port=10000
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other by bare name when back/data is on the
+# path, the same way the scripts in back/data are run
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+sys.path.insert(0, DATA_DIR)
+
+
+class FakeClock:
+    """
+    Stands in for a module's `time` so TTLs can be tested without sleeping
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    time = perf_counter = monotonic
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import chat_sessions
+from chat_sessions import BoundedChatMessageHistory, ChatSessionStore, SQLiteChatSessionStore
+
+
+def turn(n):
+    return [HumanMessage(content=f"question {n}"), AIMessage(content=f"answer {n}")]
+
+
+@pytest.fixture
+def store(monkeypatch, clock):
+    monkeypatch.setattr(chat_sessions, "time", clock)
+    # No sweeper thread; tests call sweep() themselves
+    return ChatSessionStore(max_sessions=2, ttl=10, max_messages=4, sweep_interval=0)
+
+
+def test_history_keeps_the_last_messages_from_a_user_turn():
+    trimmed = []
+    history = BoundedChatMessageHistory(max_messages=3, on_trim=trimmed.append)
+    history.add_messages(turn(1) + turn(2))
+    # Keeping three would start at answer 1, so that is dropped too
+    assert [m.content for m in history.messages] == ["question 2", "answer 2"]
+    assert trimmed == [2]
+    assert history.size_bytes == len("question 2") + len("answer 2")
+
+
+def test_get_returns_the_same_history(store):
+    history = store.get("a")
+    history.add_messages(turn(1))
+    assert store.get("a") is history
+    assert store.stats()["created"] == 1
+
+
+def test_least_recently_used_session_is_evicted(store):
+    store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+    assert "a" in store and "c" in store and "b" not in store
+    assert store.evictions == 1
+
+
+def test_idle_session_expires_on_get(store, clock):
+    store.get("a").add_messages(turn(1))
+    clock.advance(11)
+    assert store.get("a").messages == []
+    assert store.expirations == 1
+
+
+def test_sweep_removes_only_expired_sessions(store, clock):
+    store.get("a")
+    clock.advance(6)
+    store.get("b")
+    clock.advance(6)
+    assert store.sweep() == 1
+    assert "a" not in store and "b" in store
+    assert store.stats()["sweeps"] == 1
+
+
+def test_delete(store):
+    store.get("a")
+    assert store.delete("a") is True
+    assert store.delete("a") is False
+    assert store.deleted == 1
+
+
+def test_stats_count_trimmed_messages(store):
+    history = store.get("a")
+    for n in range(3):
+        history.add_messages(turn(n))
+    stats = store.stats()
+    assert stats["messages"] == 4
+    assert stats["trimmed_messages"] == 2
+
+
+# -------------------- SQLite Backend --------------------
+@pytest.fixture
+def sqlite_store(monkeypatch, clock, tmp_path):
+    monkeypatch.setattr(chat_sessions, "time", clock)
+    # A flush interval long enough that only explicit flushes and forks write
+    return SQLiteChatSessionStore(str(tmp_path / "chat.db"), max_sessions=2, ttl=10, max_messages=4,
+                                  flush_interval=60, sweep_interval=0)
+
+
+def stored_messages(db_path, session_id):
+    with sqlite3.connect(db_path) as db:
+        return db.execute("SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+
+def contents(messages):
+    return [m.content for m in messages]
+
+
+def test_queued_writes_are_served_before_the_flush(sqlite_store):
+    sqlite_store.get("a").add_messages(turn(1))
+    assert stored_messages(sqlite_store.db_path, "a") == 0
+    assert contents(sqlite_store.get("a").messages) == ["question 1", "answer 1"]
+    assert sqlite_store.stats()["pending_writes"] == 2
+
+    assert sqlite_store.flush() == 2
+    assert stored_messages(sqlite_store.db_path, "a") == 2
+    assert contents(sqlite_store.get("a").messages) == ["question 1", "answer 1"]
+    assert sqlite_store.stats()["pending_writes"] == 0
+
+
+def test_history_spans_the_database_and_the_queue(sqlite_store):
+    history = sqlite_store.get("a")
+    history.add_messages(turn(1) + turn(2))
+    sqlite_store.flush()
+    history.add_messages(turn(3))
+    assert contents(history.messages) == ["question 2", "answer 2", "question 3", "answer 3"]
+    sqlite_store.flush()
+    assert stored_messages(sqlite_store.db_path, "a") == 4
+
+
+def test_zero_flush_interval_writes_through(clock, monkeypatch, tmp_path):
+    monkeypatch.setattr(chat_sessions, "time", clock)
+    store = SQLiteChatSessionStore(str(tmp_path / "chat.db"), flush_interval=0, sweep_interval=0)
+    store.add("a", turn(1))
+    assert stored_messages(store.db_path, "a") == 2
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_queued_writes_are_committed_before_fork(sqlite_store):
+    sqlite_store.add("a", turn(1))
+    pid = os.fork()
+    if pid == 0:
+        # Child: the parent's queue must already be in the database
+        try:
+            os._exit(0 if stored_messages(sqlite_store.db_path, "a") == 2 and not sqlite_store._queue else 1)
+        finally:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert sqlite_store.stats()["pending_writes"] == 0
+    assert contents(sqlite_store.messages("a")) == ["question 1", "answer 1"]
+
+
+def test_delete_counts_stored_and_queued_sessions_once(sqlite_store):
+    sqlite_store.add("stored", turn(1))
+    sqlite_store.flush()
+    sqlite_store.add("queued", turn(1))
+    assert sqlite_store.delete("stored") is True
+    assert sqlite_store.delete("queued") is True
+    assert sqlite_store.delete("stored") is False
+    assert sqlite_store.delete("unknown") is False
+    assert sqlite_store.deleted == 2
+    assert sqlite_store.messages("queued") == []
+    assert stored_messages(sqlite_store.db_path, "stored") == 0
+
+
+def test_expired_session_starts_over(sqlite_store, clock):
+    sqlite_store.add("a", turn(1))
+    sqlite_store.flush()
+    clock.advance(11)
+    assert sqlite_store.messages("a") == []
+    sqlite_store.add("a", turn(2))
+    sqlite_store.flush()
+    assert contents(sqlite_store.messages("a")) == ["question 2", "answer 2"]
+
+
+def test_sweep_expires_and_evicts(sqlite_store, clock):
+    for session_id in ("old", "b", "c", "d"):
+        sqlite_store.add(session_id, turn(1))
+        sqlite_store.flush()
+        clock.advance(3)
+    # "old" is idle for 12s; of the rest "b" is the least recently used
+    assert sqlite_store.sweep() == 2
+    assert sqlite_store.expirations == 1 and sqlite_store.evictions == 1
+    assert sqlite_store.stats()["sessions"] == 2
+    assert contents(sqlite_store.messages("d")) == ["question 1", "answer 1"]
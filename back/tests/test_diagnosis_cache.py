@@ -0,0 +1,66 @@
+import pytest
+
+import diagnosis_cache
+import lru_cache
+from diagnosis_cache import DiagnosisCache, age_bucket, canonical_request, request_hash
+
+
+@pytest.fixture
+def db_path(monkeypatch, clock, tmp_path):
+    monkeypatch.setattr(diagnosis_cache, "time", clock)
+    monkeypatch.setattr(lru_cache, "time", clock)
+    return str(tmp_path / "diagnoses.db")
+
+
+def test_equivalent_requests_share_a_key():
+    a = canonical_request(["Fever", " cough "], {"Fever": ["High ", ""]}, "  Since  Monday", age=34, gender="F")
+    b = canonical_request(["cough", "fever", "fever"], {"fever": ["high"]}, "since monday", age=30, gender="f")
+    assert request_hash(a) == request_hash(b)
+    assert request_hash(a) != request_hash(canonical_request(["cough", "fever"], {"fever": ["high"]}, age=70))
+
+
+@pytest.mark.parametrize("age, bucket", [(None, None), ("", None), (0, "infant"), ("12", "child"),
+                                         (17, "adolescent"), (39, "adult"), (64, "middle-aged"), (65, "senior")])
+def test_age_buckets(age, bucket):
+    assert age_bucket(age) == bucket
+
+
+def test_sqlite_tier_survives_a_restart(db_path):
+    DiagnosisCache("v1", db_path=db_path).set("key", "influenza")
+    cache = DiagnosisCache("v1", db_path=db_path)
+    assert cache.get("key") == "influenza"
+    assert cache.stats()["sqlite"] == {"path": db_path, "rows": 1, "hits": 1}
+
+
+def test_other_versions_are_not_served_and_not_deleted(db_path):
+    DiagnosisCache("v1", db_path=db_path, stale_after=100).set("key", "influenza")
+    v2 = DiagnosisCache("v2", db_path=db_path, stale_after=100)
+    assert v2.get("key") is None
+    v2.set("key", "common cold")
+    # Both versions keep their row while v1 processes may still be serving
+    assert DiagnosisCache("v1", db_path=db_path, stale_after=100).get("key") == "influenza"
+    assert DiagnosisCache("v2", db_path=db_path, stale_after=100).get("key") == "common cold"
+
+
+def test_stale_versions_are_removed_on_open(db_path, clock):
+    DiagnosisCache("v1", db_path=db_path, stale_after=100).set("key", "influenza")
+    clock.advance(101)
+    DiagnosisCache("v2", db_path=db_path, stale_after=100)
+    assert DiagnosisCache("v1", db_path=db_path, stale_after=100).get("key") is None
+
+
+def test_rows_expire_after_the_ttl(db_path, clock):
+    cache = DiagnosisCache("v1", ttl=10, db_path=db_path)
+    cache.set("key", "influenza")
+    clock.advance(11)
+    assert cache.get("key") is None
+    assert DiagnosisCache("v1", ttl=10, db_path=db_path).stats()["sqlite"]["rows"] == 0
+
+
+def test_clear_only_removes_this_version(db_path):
+    DiagnosisCache("v1", db_path=db_path).set("key", "influenza")
+    v2 = DiagnosisCache("v2", db_path=db_path)
+    v2.set("key", "common cold")
+    v2.clear()
+    assert v2.get("key") is None
+    assert DiagnosisCache("v1", db_path=db_path).get("key") == "influenza"
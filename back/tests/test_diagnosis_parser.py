@@ -0,0 +1,41 @@
+import pytest
+
+from diagnosis_parser import parse_conditions
+
+
+@pytest.mark.parametrize("response", [
+    # The format the diagnosis prompt asks for
+    "1. Condition Name: Influenza\nReason: fever, cough and body aches.\n"
+    "2. Condition Name: Common cold\nReason: runny nose and sore throat.",
+    # Markdown bold, blank lines and indentation
+    "Here is my assessment:\n\n1. **Condition Name:** Influenza\n\n   **Reason:** fever, cough and body aches.\n\n"
+    "2. **Condition Name:** Common cold\n   **Reason:** runny nose and sore throat.\n",
+    # Reason on the same line
+    "1. Condition Name: Influenza Reason: fever, cough and body aches.\n"
+    "2. Condition Name: Common cold Reason: runny nose and sore throat.",
+    # Without the "Condition Name:" label
+    "1. Influenza\nReason: fever, cough and body aches.\n2. Common cold\nReason: runny nose and sore throat.",
+])
+def test_conditions_and_reasons(response):
+    assert parse_conditions(response) == [
+        {"name": "Influenza", "reason": "fever, cough and body aches."},
+        {"name": "Common cold", "reason": "runny nose and sore throat."},
+    ]
+
+
+def test_labels_are_case_insensitive():
+    assert parse_conditions("1. condition name: Migraine\nreason: throbbing headache") == [
+        {"name": "Migraine", "reason": "throbbing headache"},
+    ]
+
+
+def test_missing_reason_is_empty():
+    assert parse_conditions("1. Condition Name: Migraine\n2. Condition Name: Tension headache") == [
+        {"name": "Migraine", "reason": ""},
+        {"name": "Tension headache", "reason": ""},
+    ]
+
+
+def test_text_without_numbered_entries():
+    assert parse_conditions("") == []
+    assert parse_conditions("Please see a doctor if the symptoms persist.") == []
@@ -0,0 +1,20 @@
+import pytest
+
+from embedding_backend import EMBEDDING_BACKENDS, embedding_backend, embedding_id
+
+
+def test_defaults_to_torch(monkeypatch):
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    assert embedding_backend() == "torch"
+
+
+@pytest.mark.parametrize("backend, tag", [("torch", "model"), ("onnx", "model"), ("onnx-int8", "model+int8")])
+def test_only_int8_vectors_get_their_own_tag(monkeypatch, backend, tag):
+    monkeypatch.setenv("EMBEDDING_BACKEND", backend)
+    assert embedding_id("model") == tag
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "tensorrt")
+    with pytest.raises(ValueError, match=", ".join(repr(b) for b in EMBEDDING_BACKENDS)):
+        embedding_backend()
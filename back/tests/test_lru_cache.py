@@ -0,0 +1,60 @@
+import lru_cache
+from lru_cache import LRUCache
+
+
+def test_evicts_the_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, clock):
+    monkeypatch.setattr(lru_cache, "time", clock)
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+    clock.advance(9)
+    assert cache.get("a") == 1
+    clock.advance(2)
+    assert "a" not in cache
+    assert cache.get("a", "gone") == "gone"
+    stats = cache.stats()
+    assert (stats["expirations"], stats["size"]) == (1, 0)
+
+
+def test_a_hit_does_not_extend_the_ttl(monkeypatch, clock):
+    monkeypatch.setattr(lru_cache, "time", clock)
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+    clock.advance(6)
+    cache.get("a")
+    clock.advance(6)
+    assert cache.get("a") is None
+
+
+def test_zero_maxsize_disables_caching():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert len(cache) == 0 and cache.get("a") is None
+
+
+def test_stats_count_hits_and_misses():
+    cache = LRUCache()
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_pop_and_clear():
+    cache = LRUCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.pop("a") == 1 and cache.pop("a", "none") == "none"
+    cache.clear()
+    assert len(cache) == 0
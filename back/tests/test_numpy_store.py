@@ -0,0 +1,109 @@
+import chromadb
+import numpy as np
+import pytest
+
+from numpy_store import NumpyVectorStore
+
+ROWS = 40
+DIM = 8
+
+FILTERS = [
+    {"row": 3},
+    {"row": {"$eq": 7}},
+    {"row": {"$ne": 7}},
+    {"row": {"$gt": 30}},
+    {"row": {"$gte": 30}},
+    {"row": {"$lt": 5}},
+    {"row": {"$lte": 5}},
+    {"row": {"$in": [1, 4, 9, 16, 25, 36]}},
+    {"row": {"$nin": [1, 4, 9, 16, 25, 36]}},
+    {"kind": "symptom"},
+    {"kind": {"$in": ["symptom", "treatment"]}},
+    {"$and": [{"kind": "symptom"}, {"row": {"$gte": 20}}]},
+    {"$or": [{"kind": "treatment"}, {"row": {"$lt": 3}}]},
+    {"$and": [{"$or": [{"kind": "symptom"}, {"kind": "cause"}]}, {"row": {"$nin": [0, 1, 2]}}]},
+    {"row": {"$in": [1000]}},
+]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = np.random.default_rng(0)
+    ids = [f"doc-{i}" for i in range(ROWS)]
+    embeddings = rng.standard_normal((ROWS, DIM)).astype(np.float32).tolist()
+    documents = [f"document {i}" for i in range(ROWS)]
+    metadatas = [{"row": i, "kind": ("symptom", "treatment", "cause")[i % 3]} for i in range(ROWS)]
+    return ids, embeddings, documents, metadatas
+
+
+@pytest.fixture(scope="module")
+def query():
+    return np.random.default_rng(1).standard_normal(DIM).astype(np.float32).tolist()
+
+
+@pytest.fixture(scope="module")
+def collection(rows):
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection("test_numpy_store", metadata={"hnsw:space": "cosine"},
+                                          embedding_function=None)
+    ids, embeddings, documents, metadatas = rows
+    collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+    return collection
+
+
+@pytest.fixture
+def store(rows, tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "index"), embedding=None)
+    store.upsert(*rows)
+    return store
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_filters_match_chroma(store, collection, query, where):
+    expected = collection.query(query_embeddings=[query], n_results=ROWS, where=where, include=["distances"])
+    results = store.similarity_search_with_score_by_vector(query, k=ROWS, filter=where)
+    assert [doc.id for doc, _ in results] == expected["ids"][0]
+    # Chroma reports cosine distance, the store cosine similarity
+    assert [score for _, score in results] == pytest.approx([1 - d for d in expected["distances"][0]], abs=1e-5)
+
+
+def test_top_k(store, collection, query):
+    expected = collection.query(query_embeddings=[query], n_results=5, include=[])
+    assert [doc.id for doc in store.similarity_search_by_vector(query, k=5)] == expected["ids"][0]
+
+
+def test_upsert_replaces_existing_rows(store, rows, query):
+    store.upsert(["doc-3", "doc-new"], [query, query], ["updated", "new"], [{"row": 3}, {"row": 100}])
+    assert len(store) == ROWS + 1
+    top = store.similarity_search_with_score_by_vector(query, k=2)
+    assert {doc.id for doc, _ in top} == {"doc-3", "doc-new"}
+    assert [score for _, score in top] == pytest.approx([1.0, 1.0])
+    assert store.get(["doc-3"])["documents"] == ["updated"]
+    assert store.get(["doc-3"])["metadatas"] == [{"row": 3}]
+
+
+def test_update_changes_metadata_and_filters(store, query):
+    store.update(["doc-0"], [{"row": 0, "kind": "cause"}])
+    assert store.get(["doc-0"])["metadatas"] == [{"row": 0, "kind": "cause"}]
+    symptoms = store.similarity_search_by_vector(query, k=ROWS, filter={"kind": "symptom"})
+    assert "doc-0" not in {doc.id for doc in symptoms}
+
+
+def test_delete(store):
+    store.delete(["doc-1", "doc-2", "missing"])
+    assert len(store) == ROWS - 2
+    assert store.get(["doc-1", "doc-2", "doc-3"])["ids"] == ["doc-3"]
+    assert store.get_by_ids(["doc-3"])[0].page_content == "document 3"
+
+
+def test_changes_persist(store, query):
+    store.delete(["doc-5"])
+    reopened = NumpyVectorStore(store.persist_dir, embedding=None)
+    assert reopened.get() == store.get()
+    assert [doc.id for doc in reopened.similarity_search_by_vector(query, k=3)] == \
+        [doc.id for doc in store.similarity_search_by_vector(query, k=3)]
+
+
+def test_unsupported_operator(store):
+    with pytest.raises(ValueError):
+        store.similarity_search_by_vector([1.0] * DIM, filter={"row": {"$contains": 1}})
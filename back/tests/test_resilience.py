@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, DeadlineExceeded, Resilience
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setattr(resilience, "time", clock)
+    return CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_a_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(9.9)
+    assert not breaker.allow()
+    clock.advance(0.1)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_a_successful_trial_closes_the_circuit(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_a_failed_trial_reopens_the_circuit(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_an_abandoned_trial_frees_the_slot(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_acall_retries_then_succeeds():
+    guard = Resilience("test", deadline=1, retries=2, backoff=0)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("down")
+        return "ok"
+
+    assert asyncio.run(guard.acall(flaky)) == "ok"
+    assert guard.retried == 2
+    assert guard.breaker.state == CLOSED
+
+
+def test_acall_enforces_the_deadline():
+    guard = Resilience("test", deadline=0.05, retries=0)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(guard.acall(slow))
+    assert guard.timeouts == 1 and guard.breaker.failures == 1
+
+
+def test_acall_fails_fast_while_open():
+    guard = Resilience("test", retries=0, failure_threshold=1, reset_timeout=60)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(guard.acall(failing))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.acall(failing))
+    assert len(calls) == 1
+
+
+def test_call_counts_a_late_answer_as_a_failure(monkeypatch, clock):
+    monkeypatch.setattr(resilience, "time", clock)
+    guard = Resilience("test", deadline=5, retries=0)
+
+    def slow():
+        clock.advance(6)
+        return "late"
+
+    with pytest.raises(DeadlineExceeded):
+        guard.call(slow)
+    assert guard.breaker.failures == 1
+
+
+def test_astream_yields_everything_and_records_success():
+    guard = Resilience("test", deadline=1)
+
+    async def tokens():
+        for token in ("a", "b", "c"):
+            yield token
+
+    async def main():
+        return [token async for token in guard.astream(tokens())]
+
+    assert asyncio.run(main()) == ["a", "b", "c"]
+    assert guard.breaker.stats()["successes"] == 1
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_identical_concurrent_calls_share_one_result():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*(flights.run("k", work, 21) for _ in range(5)))
+
+    assert asyncio.run(main()) == [42] * 5
+    assert calls == [21]
+    stats = flights.stats()
+    assert (stats["calls"], stats["calls_saved"], stats["in_flight"], stats["max_waiters"]) == (1, 4, 0, 5)
+
+
+def test_different_keys_run_separately():
+    flights = SingleFlight("test")
+
+    async def work(value):
+        await asyncio.sleep(0)
+        return value
+
+    async def main():
+        return await asyncio.gather(flights.run("a", work, 1), flights.run("b", work, 2))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert flights.stats()["calls"] == 2
+
+
+def test_a_finished_call_is_not_reused():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        return [await flights.run("k", work), await flights.run("k", work)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_waiters_get_the_exception():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flights.run("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    flights = SingleFlight("test")
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.02)
+        finished.append(True)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("k", work))
+        second = asyncio.ensure_future(flights.run("k", work))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+    assert finished == [True]
@@ -0,0 +1,118 @@
+import os
+
+import pandas as pd
+import pytest
+from rapidfuzz import fuzz, process
+
+from conftest import DATA_DIR
+from symptom_lexicon import build_symptom_vocab, synonym_map
+from symptom_matcher import SymptomMatcher
+
+CASES = [text.lower() for text in pd.read_csv(os.path.join(DATA_DIR, "testing_v2.csv"))["Input"]]
+
+# What the original brute-force scan finds in each testing_v2.csv input
+LEGACY_EXPECTED = [
+    {"headache", "nausea", "photophobia"},
+    {"fever", "rash"},
+    {"heartburn"},
+    {"runny nose", "sneezing", "throat pain"},
+    {"joint pain"},
+    {"dysuria"},
+    set(),
+    {"fatigue"},
+    {"joint pain", "redness"},
+    {"fever", "joint pain"},
+    set(),
+    {"nausea"},
+    set(),
+    {"cough"},
+    set(),
+    set(),
+    {"fever"},
+    {"fever", "muscle aches", "throat pain"},
+    {"chest pain"},
+    {"fever", "sneezing"},
+    {"fever", "rash"},
+    {"fatigue", "fever"},
+]
+
+# What SymptomMatcher finds: the legacy results plus knowledge-base vocabulary
+# terms the legacy scan does not know (blisters, stiffness, ...) and typos
+# resolved by the typo index ("hedache"). Every addition is one of the case's
+# Expected_Symptoms.
+MATCHER_EXPECTED = [
+    {"headache", "nausea", "photophobia"},
+    {"blisters", "fever", "rash"},
+    {"acid regurgitation", "heartburn"},
+    {"runny nose", "sneezing", "throat pain"},
+    {"joint pain", "stiffness"},
+    {"dysuria", "frequent urge"},
+    {"blackheads", "pimples"},
+    {"fatigue"},
+    {"joint pain", "redness", "swelling"},
+    {"fever", "joint pain"},
+    set(),
+    {"headache", "nausea"},
+    set(),
+    {"cough"},
+    set(),
+    set(),
+    {"fever"},
+    {"fever", "muscle aches", "throat pain"},
+    {"chest pain"},
+    {"fever", "sneezing"},
+    {"fever", "rash"},
+    {"fatigue", "fever"},
+]
+
+
+def legacy_lexicon_scan(text_lower, score_cutoff=93):
+    """
+    The lexicon step extract_symptoms used before SymptomMatcher: one
+    partial_ratio call per synonym_map key and value
+    """
+    extracted = set()
+    for symptom in set(synonym_map) | set(synonym_map.values()):
+        if process.extractOne(symptom, [text_lower], scorer=fuzz.partial_ratio, score_cutoff=score_cutoff):
+            extracted.add(synonym_map.get(symptom, symptom))
+    return extracted
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    vocab = build_symptom_vocab(pd.read_csv(os.path.join(DATA_DIR, "medical_knowledge_clean.csv")))
+    return SymptomMatcher(synonym_map, vocab)
+
+
+def test_cases_are_pinned():
+    assert len(CASES) == len(LEGACY_EXPECTED) == len(MATCHER_EXPECTED)
+
+
+@pytest.mark.parametrize("text, expected", list(zip(CASES, LEGACY_EXPECTED)))
+def test_legacy_scan(text, expected):
+    assert legacy_lexicon_scan(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", list(zip(CASES, LEGACY_EXPECTED)))
+def test_matcher_finds_what_the_legacy_scan_finds(matcher, text, expected):
+    assert expected <= matcher.match(text)
+
+
+def test_exact_hits_are_mapped_and_located(matcher):
+    hits = matcher.find("my head pain is back and i feel nauseous")
+    assert {(hit.term, hit.symptom) for hit in hits} >= {("head pain", "headache"), ("feel nauseous", "nausea")}
+    for hit in hits:
+        assert "my head pain is back and i feel nauseous"[hit.start:hit.end] == hit.term
+
+
+@pytest.mark.parametrize("text, expected", list(zip(CASES, MATCHER_EXPECTED)))
+def test_matcher_output(matcher, text, expected):
+    assert matcher.match(text) == expected
+
+
+def test_typos_resolve_to_the_canonical_symptom(matcher):
+    assert matcher.match("pounding hedache and diarhea") == {"headache", "diarrhea"}
+
+
+def test_typo_stage_can_be_turned_off(matcher):
+    assert matcher.match("pounding hedache", max_edit_distance=0) == set()
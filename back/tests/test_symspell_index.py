@@ -0,0 +1,46 @@
+from symspell_index import DeletionIndex
+
+
+def make_index():
+    return DeletionIndex(["headache", "diarrhea", "nausea", "rash", "sore throat", "abdominal pain"])
+
+
+def test_exact_term():
+    assert make_index().lookup("rash") == ("rash", 0)
+
+
+def test_short_words_must_match_exactly():
+    assert make_index().lookup("rahs") is None
+
+
+def test_one_edit_below_nine_characters():
+    index = make_index()
+    assert index.lookup("nausia") == ("nausea", 1)
+    assert index.lookup("nauzia") is None
+
+
+def test_two_edits_from_nine_characters():
+    assert make_index().lookup("abdominl pian") == ("abdominal pain", 2)
+
+
+def test_adjacent_swap_is_one_edit():
+    assert make_index().lookup("haedache") == ("headache", 1)
+
+
+def test_max_edit_distance_caps_the_lookup():
+    assert make_index().lookup("abdominl pian", max_edit_distance=1) is None
+
+
+def test_terms_added_later_are_found():
+    index = make_index()
+    index.lookup("fevers")
+    index.add("fever")
+    assert index.lookup("fevers") == ("fever", 1)
+
+
+def test_has_candidates_is_false_only_when_nothing_can_match():
+    index = make_index()
+    assert index.has_candidates("sore throat", 2)
+    assert index.has_candidates("sroe thraot", 2)
+    assert not index.has_candidates("yesterday", 2)
+    assert index.lookup("yesterday") is None
@@ -0,0 +1,98 @@
+import pytest
+from langchain_core.documents import Document
+
+from token_budget import PromptBudget, PromptParts, TokenCounter
+
+TEMPLATE = "Symptoms: {symptom_str}\nContext: {context}\nList the likely conditions."
+
+
+@pytest.fixture
+def counter():
+    # No model name: the regex approximation, nothing is downloaded
+    return TokenCounter()
+
+
+def words(n, word="word"):
+    return " ".join([word] * n)
+
+
+def docs(*sizes):
+    return [Document(page_content=words(size, f"doc{i}")) for i, size in enumerate(sizes)]
+
+
+def parts(answers=(), notes=""):
+    return PromptParts("fever, cough", "Age: 30", list(answers), notes)
+
+
+def test_regex_counter(counter):
+    assert counter.backend == "regex"
+    assert counter.count("") == 0
+    assert counter.count("Fever, cough.") == 4
+    # Long words are split into pieces of at most six characters
+    assert counter.count("photophobia") == 2
+
+
+def test_truncate_cuts_at_a_word_boundary(counter):
+    assert counter.truncate("one two three four", 2) == "one two …"
+    assert counter.truncate("one two", 5) == "one two"
+    assert counter.truncate("one two", 0) == ""
+
+
+def test_within_budget_is_untouched(counter):
+    budget = PromptBudget(counter, TEMPLATE, max_tokens=1000)
+    result = budget.fit(parts(["a cough", "a cough"]), docs(10, 10))
+    assert len(result.docs) == 2
+    assert result.question.count("a cough") == 2
+    assert result.report["before"] == result.report["after"]
+    assert not result.report["over_budget"]
+
+
+def test_duplicate_answers_go_first(counter):
+    budget = PromptBudget(counter, TEMPLATE)
+    answers = [words(20, "dry"), words(20, "Dry"), words(5, "wet")]
+    budget.max_tokens = budget.fit(parts(answers), docs(10)).report["before"] - 10
+    result = budget.fit(parts(answers), docs(10))
+    assert result.report["duplicates_removed"] == 1
+    assert result.report["docs_dropped"] == 0
+    assert result.report["items_shortened"] == 0
+    assert len(result.docs) == 1
+
+
+def test_lowest_ranked_docs_go_next(counter):
+    budget = PromptBudget(counter, TEMPLATE)
+    ranked = docs(30, 30, 30)
+    budget.max_tokens = budget.fit(parts(["short answer"]), ranked).report["before"] - 40
+    result = budget.fit(parts(["short answer"]), ranked)
+    assert result.docs == ranked[:1]
+    assert result.report["docs_dropped"] == 2
+    assert result.report["items_shortened"] == 0
+    assert result.report["after"] <= budget.max_tokens
+
+
+def test_min_docs_are_kept_and_the_longest_item_is_shortened(counter):
+    budget = PromptBudget(counter, TEMPLATE, min_docs=1, min_item_tokens=8)
+    ranked = docs(30, 30)
+    answers = [words(10, "short"), words(60, "long")]
+    budget.max_tokens = budget.fit(parts(answers), ranked).report["before"] - 60
+    result = budget.fit(parts(answers), ranked)
+    assert result.docs == ranked[:1]
+    assert result.report["items_shortened"] == 1
+    assert words(10, "short") in result.question
+    assert words(60, "long") not in result.question and "long …" in result.question
+    assert result.report["after"] <= budget.max_tokens
+
+
+def test_over_budget_when_nothing_is_left_to_trim(counter):
+    budget = PromptBudget(counter, TEMPLATE, max_tokens=10, min_docs=1)
+    result = budget.fit(parts(["tiny"]), docs(50, 50))
+    assert len(result.docs) == 1
+    assert result.report["over_budget"]
+    assert result.report["after"] > 10
+
+
+def test_extra_tokens_count_against_the_budget(counter):
+    budget = PromptBudget(counter, TEMPLATE)
+    before = budget.fit(parts(), docs(10, 10)).report["before"]
+    budget.max_tokens = before
+    assert budget.fit(parts(), docs(10, 10)).report["docs_dropped"] == 0
+    assert budget.fit(parts(), docs(10, 10), extra_tokens=5).report["docs_dropped"] == 1
@@ -24,6 +24,7 @@ export default function DiagnosisResult({
   extraNotes,
 }) {
   const [diagnosis, setDiagnosis] = useState("");
+  const [conditions, setConditions] = useState([]);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
@@ -48,6 +49,7 @@ export default function DiagnosisResult({
 
         const response = await axios.post(`${API_URL}/diagnose`, payload);
         setDiagnosis(response.data.diagnosis);
+        setConditions(response.data.conditions || []);
         toast.success("Diagnosis ready!", { id: "diag" });
       } catch (error) {
         console.error("Diagnosis API failed:", error);
@@ -61,11 +63,20 @@ export default function DiagnosisResult({
     handleDiagnosisSubmit();
   }, [symptomText, followUpAnswers, extraNotes]);
 
-  const parsedDiagnosis = parseDiagnosis(diagnosis);
+  // The backend already parses the answer and attaches the condition details;
+  // parsing the text is only a fallback for older backends.
+  const parsedDiagnosis = conditions.length
+    ? conditions
+    : parseDiagnosis(diagnosis);
 
   const handleSeeNextSteps = () => {
     const conditionNames = parsedDiagnosis.map((c) => c.name);
-    navigate("/condition-info", { state: { conditions: conditionNames } });
+    navigate("/condition-info", {
+      state: {
+        conditions: conditionNames,
+        details: conditions.length ? conditions : null,
+      },
+    });
   };
 
   return (
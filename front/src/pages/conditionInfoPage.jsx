@@ -13,6 +13,7 @@ export default function ConditionInfoPage() {
   const [infoList, setInfoList] = useState([]);
 
   const conditions = location.state?.conditions || [];
+  const details = location.state?.details;
 
   useEffect(() => {
     const fetchConditionInfo = async () => {
@@ -21,6 +22,12 @@ export default function ConditionInfoPage() {
         return;
       }
 
+      // /diagnose already sent the details along with the diagnosis
+      if (details?.length) {
+        setInfoList(details);
+        return;
+      }
+
       try {
         const response = await axios.post(`${API_URL}/condition_info`, {
           conditions,
@@ -33,7 +40,7 @@ export default function ConditionInfoPage() {
     };
 
     fetchConditionInfo();
-  }, [conditions]);
+  }, [conditions, details]);
 
   const handleRestart = () => {
     navigate("/");